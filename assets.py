@@ -0,0 +1,115 @@
+"""This file is responsible for loading images and fonts once, so that every sprite can share the same surfaces."""
+
+import collections
+import os
+
+import pygame as pyg
+
+SPRITES_DIRECTORY: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sprites")
+
+# Tile sizes are rounded down to a multiple of this, so that resizing the window only needs new surfaces each time
+# the board crosses into another tier, rather than on every pixel.
+TIER_STEP: int = 5
+
+# The number of size tiers kept. The least recently used tier is dropped when another is needed.
+MAX_SIZE_TIERS: int = 4
+
+# Caches. Surfaces handed out by this module are shared between sprites, so they must not be drawn on.
+_fonts: dict[tuple[str, int], pyg.font.Font] = {}
+_piece_images: dict[str, pyg.Surface] = {}  # The decoded, unscaled piece images. Kept so they are only read once.
+
+# The surfaces made for each tile size, keyed by size and then by what the surface shows, least recently used first.
+_size_tiers: collections.OrderedDict[int, dict[tuple, pyg.Surface]] = collections.OrderedDict()
+
+
+def size_tier(size: int) -> int:
+    """Returns the size tier a tile of 'size' pixels is drawn at."""
+
+    return max(TIER_STEP, size - size % TIER_STEP)
+
+
+def _get_tier(size: int) -> dict[tuple, pyg.Surface]:
+    """Returns the cache of surfaces for one size, marking it as the most recently used."""
+
+    if size in _size_tiers:
+        _size_tiers.move_to_end(size)
+    else:
+        _size_tiers[size] = {}
+        if len(_size_tiers) > MAX_SIZE_TIERS:
+            _size_tiers.popitem(last=False)  # Sprites still using its surfaces keep them until they are resized.
+
+    return _size_tiers[size]
+
+
+def get_font(name: str, size: int) -> pyg.font.Font:
+    """Returns the system font with the given name and size, only searching the system fonts once for each."""
+
+    key: tuple[str, int] = (name, size)
+    if key not in _fonts:
+        if not pyg.font.get_init():
+            pyg.font.init()
+        _fonts[key] = pyg.font.SysFont(name, size)
+
+    return _fonts[key]
+
+
+def get_piece_image(piece: str, size: int) -> pyg.Surface:
+    """Returns the image for a piece such as 'P' or 'q', scaled to the given size.
+    Each image is only read from disk once, and only scaled once for each size while that size is cached."""
+
+    tier: dict[tuple, pyg.Surface] = _get_tier(size)
+    key: tuple[str, str] = ("piece", piece)
+    if key not in tier:
+        if piece not in _piece_images:
+            team: str = "w" if piece.isupper() else "b"
+            path: str = os.path.join(SPRITES_DIRECTORY, f"{team}{piece}.png")
+            _piece_images[piece] = pyg.image.load(path).convert_alpha()
+
+        tier[key] = pyg.transform.scale(_piece_images[piece], (size, size))
+
+    return tier[key]
+
+
+def get_tile_image(size: int, colour: tuple[int, int, int], label: str = "") -> pyg.Surface:
+    """Returns a square tile of the given size and colour, with its label (such as 'a1') in the bottom left corner.
+    Pass an empty label for a tile without one."""
+
+    tier: dict[tuple, pyg.Surface] = _get_tier(size)
+    key: tuple[str, tuple[int, int, int], str] = ("tile", colour, label)
+    if key not in tier:
+        # Creates a square.
+        image: pyg.Surface = pyg.Surface((size, size))
+        image.fill(colour)
+
+        if label:
+            # Adds the tile ID to the tile.
+            text_surf: pyg.Surface = get_font('Arial', 20).render(label, True, (0, 0, 0))
+            text_rect: pyg.Rect = text_surf.get_rect(center=(10, size - 10))
+            image.blit(text_surf, text_rect)
+
+        tier[key] = image
+
+    return tier[key]
+
+
+def get_highlight_image(size: int) -> pyg.Surface:
+    """Returns a see-through tile of the given size with a dot in the middle, drawn over the squares a held piece can
+    move to."""
+
+    tier: dict[tuple, pyg.Surface] = _get_tier(size)
+    key: tuple[str] = ("highlight",)
+    if key not in tier:
+        image: pyg.Surface = pyg.Surface((size, size), pyg.SRCALPHA)
+        pyg.draw.circle(image, (20, 20, 20, 90), (size // 2, size // 2), size // 6)
+        tier[key] = image
+
+    return tier[key]
+
+
+def clear() -> None:
+    """Empties every cache. Should be called if pygame is quit and initialised again, as the cached surfaces and
+    fonts belong to the old display."""
+
+    _fonts.clear()
+    _piece_images.clear()
+    _size_tiers.clear()
@@ -0,0 +1,6 @@
+"""Benchmarks for the move generator, the pygame board, the database and the game server, runnable without a display.
+
+Run them with:
+    python -m benchmarks [--suites perft,rendering,database,server] [--db-sizes 1000,100000,1000000]
+                         [--server-players 100] [--server-idle-players 1000]
+                         [--output results.json] [--compare old_results.json]"""
@@ -0,0 +1,93 @@
+"""Runs the benchmarks and writes the results as JSON."""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+SUITES: list[str] = ["perft", "rendering", "database", "server"]
+
+
+def get_commit() -> str | None:
+    """Returns the git commit being benchmarked, if there is one."""
+
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    """Turns nested results into {"suite.test.metric": value}, for comparing two runs."""
+
+    flat: dict[str, float] = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(old_results: dict, new_results: dict) -> None:
+    """Prints how much each timing has changed between two runs."""
+
+    old_flat: dict[str, float] = flatten(old_results)
+    for key, new_value in flatten(new_results).items():
+        old_value: float | None = old_flat.get(key)
+        if old_value:
+            print(f"{key}: {old_value:.4g} -> {new_value:.4g} ({(new_value - old_value) / old_value:+.1%})")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Run the benchmarks.")
+    parser.add_argument("--suites", default=",".join(SUITES),
+                        help=f"Comma separated suites to run, from {', '.join(SUITES)}.")
+    parser.add_argument("--db-sizes", default="1000,100000,1000000",
+                        help="Comma separated numbers of games to test the database with.")
+    parser.add_argument("--server-players", type=int, default=100,
+                        help="The number of players making moves at once in the server load test.")
+    parser.add_argument("--server-idle-players", type=int, default=1000,
+                        help="The number of players connected to the server that never move.")
+    parser.add_argument("--output", help="The file to write the results to. Printed if not given.")
+    parser.add_argument("--compare", help="Results from an earlier run, to print the change in each timing.")
+    args = parser.parse_args(argv)
+
+    suites: list[str] = args.suites.split(",")
+    for suite in suites:
+        if suite not in SUITES:
+            parser.error(f"Unknown suite {suite}")
+
+    report: dict = {"commit": get_commit(), "timestamp": time.time(), "python": platform.python_version(),
+                    "platform": platform.platform(), "results": {}}
+
+    # Each suite is only imported if it is run, so that, for example, the perft suite does not need pygame.
+    if "perft" in suites:
+        from benchmarks import perft
+        report["results"]["perft"] = perft.run()
+    if "rendering" in suites:
+        from benchmarks import rendering
+        report["results"]["rendering"] = rendering.run()
+    if "database" in suites:
+        from benchmarks import database
+        report["results"]["database"] = database.run([int(size) for size in args.db_sizes.split(",")])
+    if "server" in suites:
+        from benchmarks import server
+        report["results"]["server"] = server.run(args.server_players, args.server_idle_players)
+
+    output: str = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as compare_file:
+            compare(json.load(compare_file)["results"], report["results"])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
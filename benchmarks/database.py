@@ -0,0 +1,98 @@
+"""Times inserting and looking up games in databases of different sizes."""
+
+import os
+import random
+import tempfile
+import time
+
+import chess
+
+import dbmanager
+import movecodec
+import positionindex
+from dbmanager import ChessDatabase, GameFilter
+
+# The number of different games the database is filled with. They are repeated to reach the size being tested.
+SAMPLE_GAMES: int = 200
+PLIES_PER_GAME: int = 20
+
+# Games are loaded into the database in batches of this size.
+LOAD_BATCH_SIZE: int = 10000
+
+# The number of times each operation is timed.
+SINGLE_INSERTS: int = 100
+LOOKUPS: int = 1000
+
+
+def make_sample_games() -> list[tuple]:
+    """Returns random legal games as rows for 'ChessDatabase.add_entries', with their position keys worked out."""
+
+    generator: random.Random = random.Random(0)
+    games: list[tuple] = []
+    for game_number in range(SAMPLE_GAMES):
+        board: chess.Board = chess.Board()
+        while board.ply() < PLIES_PER_GAME and not board.is_game_over():
+            board.push(generator.choice(list(board.legal_moves)))
+
+        games.append((f"White {game_number}", "1000", f"Black {game_number}", "1000", "Stalemate",
+                      movecodec.encode_moves(board.move_stack), positionindex.game_position_keys(board.move_stack)))
+
+    return games
+
+
+def timed(function, repeats: int) -> dict:
+    """Calls 'function' with each number in range(repeats), returning the mean time and calls per second."""
+
+    start_time: float = time.perf_counter()
+    for i in range(repeats):
+        function(i)
+    seconds: float = time.perf_counter() - start_time
+    return {"mean_ms": seconds / repeats * 1000, "per_second": repeats / seconds}
+
+
+def run(sizes: list[int]) -> dict:
+    sample_games: list[tuple] = make_sample_games()
+    sample_boards: list[chess.Board] = []
+    for game in sample_games:
+        board: chess.Board = chess.Board()
+        for move in movecodec.decode_moves(game[5])[:PLIES_PER_GAME // 2]:
+            board.push(move)
+        sample_boards.append(board)
+
+    results: dict = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            db: ChessDatabase = ChessDatabase(os.path.join(directory, "benchmark.db"))
+
+            # Loading the database, in batched transactions.
+            start_time: float = time.perf_counter()
+            for batch_start in range(0, size, LOAD_BATCH_SIZE):
+                batch_size: int = min(LOAD_BATCH_SIZE, size - batch_start)
+                db.add_entries(sample_games[i % SAMPLE_GAMES] for i in range(batch_start, batch_start + batch_size))
+            load_seconds: float = time.perf_counter() - start_time
+
+            generator: random.Random = random.Random(size)
+            random_ids: list[int] = [generator.randint(1, size) for _ in range(LOOKUPS)]
+
+            def insert_one(i: int) -> None:
+                db.add_entry(*sample_games[i % SAMPLE_GAMES])
+                db.save()
+
+            size_results: dict = {
+                "bulk_load": {"seconds": load_seconds, "per_second": size / load_seconds},
+                "single_insert": timed(insert_one, SINGLE_INSERTS),
+                "get_entry": timed(lambda i: db.get_entry(random_ids[i]), LOOKUPS),
+                "get_page": timed(lambda i: db.get_page(random_ids[i], 100), LOOKUPS),
+                "find_position": timed(lambda i: db.find_position(sample_boards[i % SAMPLE_GAMES], 100), LOOKUPS),
+                "find_games_by_name": timed(lambda i: db.find_games(GameFilter(name=f"black {i % SAMPLE_GAMES}"),
+                                                                    random_ids[i], 100), LOOKUPS),
+                "find_games_by_elo": timed(lambda i: db.find_games(GameFilter(min_elo=900, max_elo=1100),
+                                                                   random_ids[i], 100), LOOKUPS),
+                "file_bytes": os.path.getsize(os.path.join(directory, "benchmark.db")),
+            }
+            results[str(size)] = size_results
+
+            db.close()
+            dbmanager.close_all()  # The temporary database must be closed before it can be deleted.
+
+    return results
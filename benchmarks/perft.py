@@ -0,0 +1,58 @@
+"""Counts the positions reachable from standard test positions, checking the move generator is correct and timing it."""
+
+import time
+
+import chess
+
+# (name, FEN, the known number of positions at each depth starting from 1).
+PERFT_POSITIONS: list[tuple[str, str, list[int]]] = [
+    ("start", chess.STARTING_FEN, [20, 400, 8902, 197281]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862]),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238]),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467]),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379]),
+]
+
+
+def python_chess_perft(board: chess.Board, depth: int) -> int:
+    """Counts the positions 'depth' plies from 'board', using python-chess's move generator."""
+
+    if depth == 1:
+        return board.legal_moves.count()
+
+    nodes: int = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += python_chess_perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+# Every move generator to check, by name. Each takes a python-chess board and a depth, and returns the node count.
+# The search engine generates its moves with python-chess, so that is currently the only one.
+MOVE_GENERATORS: dict = {
+    "python-chess": python_chess_perft,
+}
+
+
+def run() -> dict:
+    """Runs perft on every position with every move generator. Raises AssertionError if a count is wrong."""
+
+    results: dict = {}
+    for generator_name, perft in MOVE_GENERATORS.items():
+        generator_results: dict = {}
+        for name, fen, expected_counts in PERFT_POSITIONS:
+            depth: int = len(expected_counts)
+            start_time: float = time.perf_counter()
+            nodes: int = perft(chess.Board(fen), depth)
+            seconds: float = time.perf_counter() - start_time
+
+            assert nodes == expected_counts[-1], f"{generator_name} perft({name}, {depth}) gave {nodes}, " \
+                                                 f"expected {expected_counts[-1]}"
+
+            generator_results[name] = {"depth": depth, "nodes": nodes, "seconds": seconds,
+                                       "nodes_per_second": nodes / seconds}
+
+        results[generator_name] = generator_results
+
+    return results
@@ -0,0 +1,109 @@
+"""Drives the pygame board with scripted mouse events, without a display, timing frames and moves."""
+
+import os
+
+# Must be set before pygame is imported, so that no window is needed.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import statistics
+import time
+
+import chess
+import pygame as pyg
+
+import assets
+from chessengine import Chess
+
+# The moves of the "Opera game" (Morphy v Duke Karl / Count Isouard, 1858), played by dragging each piece.
+SCRIPTED_MOVES: list[str] = ("e2e4 e7e5 g1f3 d7d6 d2d4 c8g4 d4e5 g4f3 d1f3 d6e5 f1c4 g8f6 f3b3 d8e7 b1c3 c7c6 "
+                             "c1g5 b7b5 c3b5 c6b5 c4b5 b8d7 e1c1 a8d8 d1d7 d8d7 h1d1 e7e6 b5d7 f6d7 b3b8 d7b8 "
+                             "d1d8").split()
+
+# The number of mouse movements, and frames drawn, while dragging each piece.
+DRAG_STEPS: int = 10
+
+# The number of times the slower whole-board operations are repeated.
+REPEATS: int = 50
+
+
+def summarise(seconds: list[float]) -> dict:
+    """Returns the mean, 95th percentile and worst of a list of timings, in milliseconds."""
+
+    milliseconds: list[float] = sorted(second * 1000 for second in seconds)
+    return {"mean_ms": statistics.fmean(milliseconds),
+            "p95_ms": milliseconds[min(len(milliseconds) - 1, int(len(milliseconds) * 0.95))],
+            "max_ms": milliseconds[-1]}
+
+
+def run() -> dict:
+    game: Chess = Chess()
+    game.display_users("White", "1000", "Black", "1000")
+    game.update_pieces()
+    game.is_playing = True
+
+    def draw() -> None:
+        game.update_screen((0, 0, 0), *game.sprite_groups)
+
+    draw()
+
+    # Rebuilding every piece sprite from the board, as is done to resync.
+    rebuild_times: list[float] = []
+    for _ in range(REPEATS):
+        start_time: float = time.perf_counter()
+        game.update_pieces()
+        rebuild_times.append(time.perf_counter() - start_time)
+        draw()
+
+    # Drawing the whole screen.
+    full_frame_times: list[float] = []
+    for _ in range(REPEATS):
+        game.full_redraw = True
+        start_time = time.perf_counter()
+        draw()
+        full_frame_times.append(time.perf_counter() - start_time)
+
+    # Playing a game by dragging pieces. Each drag frame handles a mouse movement and draws, and the move latency is
+    # the time from releasing the mouse to the move being drawn.
+    drag_frame_times: list[float] = []
+    move_times: list[float] = []
+    idle_frame_times: list[float] = []
+    for uci in SCRIPTED_MOVES:
+        move: chess.Move = chess.Move.from_uci(uci)
+        from_pos: tuple[int, int] = game.tile_dictionary[chess.square_name(move.from_square)].rect.center
+        to_pos: tuple[int, int] = game.tile_dictionary[chess.square_name(move.to_square)].rect.center
+
+        game.event_handler(pyg.event.Event(pyg.MOUSEBUTTONDOWN, button=1, pos=from_pos))
+        draw()
+        for step in range(1, DRAG_STEPS + 1):
+            pos: tuple[int, int] = (from_pos[0] + (to_pos[0] - from_pos[0]) * step // DRAG_STEPS,
+                                    from_pos[1] + (to_pos[1] - from_pos[1]) * step // DRAG_STEPS)
+            start_time = time.perf_counter()
+            game.event_handler(pyg.event.Event(pyg.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(1, 0, 0)))
+            draw()
+            drag_frame_times.append(time.perf_counter() - start_time)
+
+        plies: int = game.board.ply()
+        start_time = time.perf_counter()
+        game.event_handler(pyg.event.Event(pyg.MOUSEBUTTONUP, button=1, pos=to_pos))
+        draw()
+        move_times.append(time.perf_counter() - start_time)
+        assert game.board.ply() == plies + 1, f"The scripted move {uci} was not made"
+
+        # A frame where nothing has changed.
+        start_time = time.perf_counter()
+        draw()
+        idle_frame_times.append(time.perf_counter() - start_time)
+
+    pyg.quit()
+    assets.clear()
+
+    return {
+        "sprites": len(game.tile_group) + len(game.piece_group) + len(game.other_sprites_group),
+        "update_pieces": summarise(rebuild_times),
+        "full_frame": summarise(full_frame_times),
+        "drag_frame": summarise(drag_frame_times),
+        "drag_frames_per_second": len(drag_frame_times) / sum(drag_frame_times),
+        "move_latency": summarise(move_times),
+        "idle_frame": summarise(idle_frame_times),
+    }
@@ -0,0 +1,157 @@
+"""Load-tests the game server. The server is started in a separate process and filled with idle games, then many
+players play random games on it at once, timing how long each move takes to come back from the server."""
+
+import asyncio
+import os
+import random
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import chess
+
+import gameprotocol
+from gameserver import raise_open_file_limit
+
+# Players are connected this many at a time, so that the server's backlog of new connections does not overflow.
+CONNECT_BATCH_SIZE: int = 200
+
+
+def percentiles(seconds: list[float]) -> dict:
+    """Returns the mean, median, 90th, 99th percentile and worst of a list of timings, in milliseconds."""
+
+    if not seconds:
+        return {}
+
+    milliseconds: list[float] = sorted(second * 1000 for second in seconds)
+    return {"mean_ms": sum(milliseconds) / len(milliseconds),
+            **{f"p{percent}_ms": milliseconds[min(len(milliseconds) - 1, len(milliseconds) * percent // 100)]
+               for percent in (50, 90, 99)},
+            "max_ms": milliseconds[-1]}
+
+
+def server_memory(pid: int) -> int | None:
+    """Returns how many bytes of memory the process is using, or None if it cannot be read on this system."""
+
+    try:
+        with open(f"/proc/{pid}/status") as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+async def connect(port: int) -> tuple[asyncio.StreamReader, asyncio.StreamWriter, dict]:
+    """Connects a player and joins a game, returning the connection and the server's "joined" message."""
+
+    reader, writer = await asyncio.open_connection(gameprotocol.DEFAULT_HOST, port)
+    writer.write(gameprotocol.encode_message({"type": "play", "name": "Load test", "elo": "1000"}))
+    return reader, writer, gameprotocol.decode_message(await reader.readline())
+
+
+async def play(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, colour: chess.Color, max_plies: int,
+               generator: random.Random, latencies: list[float], results: dict) -> None:
+    """Plays random moves for one side until the game ends, or the game has reached 'max_plies' and this player
+    leaves. Records the time from sending each move to the server sending it back."""
+
+    board: chess.Board = chess.Board()
+    sent_time: float = 0.0
+
+    def move_if_turn() -> None:
+        nonlocal sent_time
+        # A position with no legal moves is left for the server to end the game.
+        moves: list[chess.Move] = list(board.legal_moves)
+        if board.turn == colour and board.ply() < max_plies and moves:
+            sent_time = time.perf_counter()
+            move: chess.Move = generator.choice(moves)
+            writer.write(gameprotocol.encode_message({"type": "move", "ply": board.ply(), "move": move.uci()}))
+
+    while line := await reader.readline():
+        message: dict = gameprotocol.decode_message(line)
+        if message["type"] == "start":
+            move_if_turn()
+        elif message["type"] == "move":
+            if board.turn == colour:
+                latencies.append(time.perf_counter() - sent_time)
+            board.push(chess.Move.from_uci(message["move"]))
+            if board.ply() >= max_plies:
+                break
+            move_if_turn()
+        elif message["type"] == "refused":
+            results["refused"] += 1
+            break
+        elif message["type"] == "end":
+            results["finished"] += colour == chess.WHITE  # Each game is counted once.
+            break
+        elif message["type"] == "left":
+            break
+
+    writer.close()
+
+
+async def load(port: int, server_pid: int, players: int, idle_players: int, max_plies: int) -> dict:
+    """Connects the idle players and then the active players, and plays the active players' games to the end."""
+
+    # Players are paired in the order they connect, so an odd number would leave a player waiting for ever.
+    players -= players % 2
+    idle_players -= idle_players % 2
+
+    results: dict = {"refused": 0, "finished": 0}
+    memory_before: int | None = server_memory(server_pid)
+
+    # Idle players join games and never move, so the server holds their games and connections throughout.
+    idle_connections: list[tuple] = []
+    for batch_start in range(0, idle_players, CONNECT_BATCH_SIZE):
+        idle_connections += await asyncio.gather(*(connect(port) for _ in
+                                                   range(min(CONNECT_BATCH_SIZE, idle_players - batch_start))))
+    memory_idle: int | None = server_memory(server_pid)
+
+    # The active players are connected one at a time, so that each pair of players shares a game.
+    active_connections: list[tuple] = [await connect(port) for _ in range(players)]
+
+    latencies: list[float] = []
+    start_time: float = time.perf_counter()
+    await asyncio.gather(*(play(reader, writer, joined["colour"] == "White", max_plies, random.Random(i), latencies,
+                                results)
+                           for i, (reader, writer, joined) in enumerate(active_connections)))
+    seconds: float = time.perf_counter() - start_time
+
+    for reader, writer, joined in idle_connections:
+        writer.close()
+
+    if memory_before is not None and memory_idle is not None and idle_players:
+        results["idle_bytes_per_player"] = (memory_idle - memory_before) / idle_players
+    results["moves"] = len(latencies)
+    results["moves_per_second"] = len(latencies) / seconds
+    results["latency"] = percentiles(latencies)
+    return results
+
+
+def run(players: int = 100, idle_players: int = 1000, max_plies: int = 200) -> dict:
+    """Plays 'players' / 2 games at once, each for up to 'max_plies' plies, on a server that is also holding
+    'idle_players' / 2 idle games."""
+
+    raise_open_file_limit()
+    with tempfile.TemporaryDirectory() as directory:
+        db_path: str = os.path.join(directory, "server.db")
+        server: subprocess.Popen = subprocess.Popen(
+            [sys.executable, "-m", "gameserver", "--port", "0", "--db", db_path], stdout=subprocess.PIPE, text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        try:
+            port: int = int(server.stdout.readline().rsplit(":", 1)[1])
+            results: dict = asyncio.run(load(port, server.pid, players, idle_players, max_plies))
+        finally:
+            # Interrupting the server makes it store the games that have finished but not been written yet.
+            server.send_signal(signal.SIGINT)
+            server.wait()
+
+        con: sqlite3.Connection = sqlite3.connect(db_path)
+        results["games_stored"] = con.execute("SELECT count(*) FROM games;").fetchone()[0]
+        con.close()
+
+    return results
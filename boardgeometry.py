@@ -0,0 +1,55 @@
+"""This file is responsible for converting between positions on the screen and squares on the board."""
+
+import chess
+
+
+class BoardGeometry:
+    """Maps pixel coordinates to squares, and squares to pixel coordinates, in constant time."""
+
+    def __init__(self, tile_size: int, y_offset: int, x_offset: int = 0, flipped: bool = False):
+        self.tile_size: int = tile_size
+        self.x_offset: int = x_offset  # Distance from the left of the screen to the left of the board.
+        self.y_offset: int = y_offset  # Distance from the top of the screen to the top of the board.
+        self.flipped: bool = flipped  # If True, black's pieces are at the bottom of the screen.
+
+    def square_at(self, pos: tuple[int, int]) -> int | None:
+        """Returns the square under the pixel position 'pos', or None if it is not on the board."""
+
+        # Floor division rounds towards negative infinity, so positions above or left of the board become negative.
+        column: int = (pos[0] - self.x_offset) // self.tile_size
+        row: int = (pos[1] - self.y_offset) // self.tile_size
+        if not (0 <= column < 8 and 0 <= row < 8):
+            return None
+
+        if self.flipped:
+            return chess.square(7 - column, row)
+        return chess.square(column, 7 - row)
+
+    def screen_position(self, square: int) -> tuple[int, int]:
+        """Returns the column and row, counting from the top left of the screen, that 'square' is drawn in."""
+
+        if self.flipped:
+            return 7 - chess.square_file(square), chess.square_rank(square)
+        return chess.square_file(square), 7 - chess.square_rank(square)
+
+    def tile_topleft(self, square: int) -> tuple[int, int]:
+        """Returns the pixel position of the top left corner of 'square'."""
+
+        column, row = self.screen_position(square)
+        return self.x_offset + column * self.tile_size, self.y_offset + row * self.tile_size
+
+    def tile_center(self, square: int) -> tuple[int, int]:
+        """Returns the pixel position of the centre of the tile for 'square'."""
+
+        left, top = self.tile_topleft(square)
+        return left + self.tile_size // 2, top + self.tile_size // 2
+
+    def board_top_center(self) -> tuple[int, int]:
+        """Returns the pixel position of the middle of the top edge of the board."""
+
+        return self.x_offset + 4 * self.tile_size, self.y_offset
+
+    def board_bottom_center(self) -> tuple[int, int]:
+        """Returns the pixel position of the middle of the bottom edge of the board."""
+
+        return self.x_offset + 4 * self.tile_size, self.y_offset + 8 * self.tile_size
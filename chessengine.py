@@ -1,37 +1,131 @@
 """This file is responsible for handling pygame and displaying the board to the user."""
 
+import time
+
 import pygame as pyg
+import assets
 import chesssprites as spr
 import chess
-from dbmanager import ChessDatabase
+import movejournal
+import openingbook
+import startupprofile
+from boardgeometry import BoardGeometry
+from gamestate import GameState
+from movediff import MoveDiff, get_move_diff
+from moveindex import LegalMoveIndex
+from replay import GameReplay
+from engineservice import DONE, EngineService
+from gameclient import GameClient
+from frameprofiler import FrameProfiler
+from searchengine import SearchResult
 
 a_to_h: list[str] = list("abcdefgh")
 eight_to_one: list[str] = list("87654321")
 
+# The size of the window when the game starts.
+DEFAULT_RESOLUTION: tuple[int, int] = (600, 713)
 
-class Chess:
-    def __init__(self):
-        """Creates the necessary variables to run the game."""
+# The height, in pixels, of the bar along the bottom of the screen when replaying a game.
+REPLAY_BAR_HEIGHT: int = 8
+
+# How many plies Page Up and Page Down move through a replayed game.
+REPLAY_PAGE: int = 10
+
+# How many of the stored games that reached the position on the board are listed in the title of the window.
+POSITION_SEARCH_SHOWN: int = 5
+
+# The longest the mainloop sleeps while waiting for the other player's move from the server, in milliseconds. Moves
+# from the server are not pygame events, so they do not wake the loop the way a click does.
+NETWORK_POLL_MS: int = 10
 
-        # Initialising pygame variables.
-        pyg.init()
-        #self.SCREEN_RESOLUTION: tuple[int, int] = (800, 950)
-        self.SCREEN_RESOLUTION: tuple[int, int] = (600, 713)
-        self.screen: pyg.display = pyg.display.set_mode(self.SCREEN_RESOLUTION)  # Sets the resolution of the window.
+# How much of the window's height the board takes up. The rest is split between the players' details above and
+# below it.
+BOARD_HEIGHT_FRACTION: float = 600 / 713
+
+
+class Chess:
+    def __init__(self, fps: int = 60, idle_fps: int = 10, dirty_rendering: bool = True, flipped: bool = False,
+                 computer_colour: chess.Color | None = None, computer_think_time: float = 2.0,
+                 opening_book: str | None = openingbook.DEFAULT_PATH, resizable: bool = False,
+                 journal_path: str | None = movejournal.DEFAULT_PATH,
+                 profile: bool = False, profile_overlay: bool = False, profile_output: str = "frame_profile.json",
+                 client: GameClient | None = None):
+        """Creates the necessary variables to run the game.
+        'fps' caps the frame rate while something is changing on the board, and 'idle_fps' is how often the
+        mainloop wakes up when nothing is happening. 'dirty_rendering' only repaints the parts of the screen that
+        have changed, instead of the whole screen every frame. 'flipped' draws the board from black's side.
+        'computer_colour' is the side played by the computer (chess.WHITE or chess.BLACK), or None for two human
+        players, and 'computer_think_time' is how many seconds it searches for each move. The computer searches in
+        a separate process, so the window keeps responding while it thinks. It plays from the Polyglot book at
+        'opening_book' while the position is in it (see openingbook.py), if the book exists.
+        'profile' times each stage of every frame, and writes the timings to 'profile_output' (CSV if it ends in
+        '.csv', otherwise JSON) when the window is closed. 'profile_overlay' also shows them on the screen.
+        'resizable' lets the window be resized, with the board laid out again to fit it.
+        Each move is recorded in the journal at 'journal_path' as it is made, so the game can be resumed if the
+        window is closed before it ends. Pass None to not keep a journal.
+        'client' is a connection to a game server (see gameserver.py) to play against someone on another window. The
+        server checks and stores the game, so only the side the server gives this window can be moved, and the game
+        is not journalled or stored here."""
+
+        # Initialising pygame variables. Only the display is started, as sound and joysticks are not used and can
+        # be slow to start. Fonts are started by 'assets' when the first one is needed.
+        pyg.display.init()
+        self.SCREEN_RESOLUTION: tuple[int, int] = DEFAULT_RESOLUTION
+        # Sets the resolution of the window.
+        self.screen: pyg.display = pyg.display.set_mode(self.SCREEN_RESOLUTION, pyg.RESIZABLE if resizable else 0)
+        startupprofile.mark("game window opened")
+        self.pending_resize: tuple[int, int] | None = None  # The newest window size, until the board is laid out.
+
+        # Frame pacing.
+        self.clock: pyg.time.Clock = pyg.time.Clock()
+        self.fps: int = fps
+        self.idle_fps: int = idle_fps
+
+        # Dirty rectangle rendering. The areas in 'dirty_rects' are repainted on the next frame, or the whole
+        # screen if 'full_redraw' is set.
+        self.dirty_rendering: bool = dirty_rendering
+        self.dirty_rects: list[pyg.Rect] = []
+        self.full_redraw: bool = True
+
+        # Profiling.
+        self.profiler: FrameProfiler = FrameProfiler(profile or profile_overlay)
+        self.profile_output: str = profile_output
+        self.profiler_overlay: spr.ProfilerOverlay | None = None
+        self.show_profiler_overlay: bool = profile_overlay
+        self.last_overlay_update: float = 0.0  # The time, in seconds, the overlay was last redrawn.
 
         # Initialising variables for the game.
         self.board = chess.Board()
+        self.game_state: GameState = GameState(self.board)  # Caches whether the game has ended.
+        self.move_index: LegalMoveIndex = LegalMoveIndex(self.board)  # Caches the legal moves from each square.
 
         self.tile_group: pyg.sprite.Group = pyg.sprite.Group()
+        self.highlight_group: pyg.sprite.Group = pyg.sprite.Group()
         self.piece_group: pyg.sprite.Group = pyg.sprite.Group()
         self.other_sprites_group: pyg.sprite.Group = pyg.sprite.Group()
 
-        self.sprite_groups: list[pyg.sprite.Group] = [self.tile_group, self. piece_group, self.other_sprites_group]
+        # Groups are drawn in this order, so highlights are drawn over the tiles but under the pieces.
+        self.sprite_groups: list[pyg.sprite.Group] = [self.tile_group, self.highlight_group, self.piece_group,
+                                                      self.other_sprites_group]
 
         # Dictionary that holds the tile ID as the key and the tile sprite object as the value.
         self.tile_dictionary: dict[str, spr.Tile] = {}
         self.piece_dictionary: dict[str, spr.Piece] = {}
 
+        self.flipped: bool = flipped
+        self.geometry: BoardGeometry | None = None  # Converts mouse positions to squares. Made in 'create_board'.
+        self.dragged_piece: spr.Piece | None = None  # The piece currently held by the mouse.
+
+        # Shown when a pawn is dropped on the last rank, until the player picks the piece it promotes to.
+        self.promotion_picker: spr.PromotionPicker | None = None
+        self.promoting_piece: spr.Piece | None = None
+        self.promotion_moves: list[chess.Move] = []
+
+        # The computer opponent.
+        self.computer_colour: chess.Color | None = computer_colour
+        self.computer_think_time: float = computer_think_time
+        self.engine_service: EngineService | None = EngineService(book_path=opening_book) if computer_colour is not None else None
+
         self.is_running: bool = False
         self.is_playing: bool = False
 
@@ -40,6 +134,21 @@ class Chess:
         self.b_name = "Black"
         self.b_elo = "900"
 
+        # The connection to the game server, when playing someone on another window.
+        self.client: GameClient | None = client
+
+        # The journal of the game's moves. Created when the game starts, unless a journal is being resumed.
+        self.journal_path: str | None = journal_path
+        self.journal: movejournal.MoveJournal | None = None
+
+        # Replaying a stored game. Set by 'load_replay'.
+        self.replay: GameReplay | None = None
+        self.replay_bar: spr.ReplayBar | None = None
+
+        # Sprites that are made again, rather than resized, when the window is resized.
+        self.player_info_sprites: list[spr.PlayerInfo] = []
+        self.end_screen: spr.EndScreen | None = None
+
         self.create_board()
 
     def create_board(self) -> None:
@@ -47,46 +156,111 @@ class Chess:
 
         # (255, 192, 203) (118, 150, 86)
         tile_colours: list[tuple] = [(118, 150, 86), (238, 238, 210)]
-        tile_size: int = round(self.SCREEN_RESOLUTION[0] / 8)  # Calculates the size the tiles must be.
+        self.geometry = self.calculate_geometry()
+        tile_size: int = self.geometry.tile_size
+        self.tile_size: int = tile_size
+
+        for square in chess.SQUARES:
+            # Determines if the tile will show its ID or not.
+            show_id: bool = self.is_tile_labelled(square)
 
-        # Calculates how far from the top of the screen it must start creating the tiles for it to be centered.
-        y_offset: int = round((self.SCREEN_RESOLUTION[1] - self.SCREEN_RESOLUTION[0]) / 2)
+            tile_id: str = chess.square_name(square)
+
+            # Adds the sprite to it's group with its proper colour and ID.
+            if (chess.square_file(square) + chess.square_rank(square)) % 2 == 1:
+                tile = spr.Tile(tile_size, self.geometry.tile_topleft(square), tile_colours[1], tile_id, show_id)
+            else:
+                tile = spr.Tile(tile_size, self.geometry.tile_topleft(square), tile_colours[0], tile_id, show_id)
 
-        # Holds the variables that decide where the tiles get drawn.
-        x_pos: int
-        y_pos: int = y_offset - tile_size
+            self.add_sprite(tile)
+            self.tile_dictionary[tile_id] = tile
 
-        for y_row in range(8):
-            x_pos = 0 - tile_size  # Resets the x position, so that it creates the sprites from the left.
-            y_pos += tile_size  # Increments the y position down by 1 every time the x row has been completed.
-            for x_row in range(8):
-                x_pos += tile_size  # Increments the x position to the right by 1.
+    def is_tile_labelled(self, square: int) -> bool:
+        """Returns whether the tile on 'square' shows its ID. Only the bottom row and left column are labelled, so
+        which tiles are labelled depends on which way round the board is drawn."""
 
-                # Determines if the tile will show its ID or not.
-                show_id: bool = False
-                if y_row == 7 or x_row == 0:
-                    show_id = True
+        column, row = self.geometry.screen_position(square)
+        return row == 7 or column == 0
 
-                tile_id: str = str(a_to_h[x_row] + eight_to_one[y_row])
+    def calculate_geometry(self) -> BoardGeometry:
+        """Responsible for working out the size and position of the board for the current size of the window."""
 
-                # Adds the sprite to it's group with its proper colour and ID.
-                if ((x_row % 2) + (y_row % 2)) % 2 == 0:
-                    tile = spr.Tile(tile_size, (x_pos, y_pos), tile_colours[1], tile_id, show_id)
-                else:
-                    tile = spr.Tile(tile_size, (x_pos, y_pos), tile_colours[0], tile_id, show_id)
+        width, height = self.SCREEN_RESOLUTION
 
-                self.add_sprite(tile)
-                self.tile_dictionary[tile_id] = tile
+        # Calculates the size the tiles must be, rounded down to a size the images are cached at.
+        board_size: int = min(width, round(height * BOARD_HEIGHT_FRACTION))
+        tile_size: int = assets.size_tier(board_size // 8)
+
+        # Calculates how far from the top left of the screen it must start creating the tiles for it to be centered.
+        x_offset: int = (width - 8 * tile_size) // 2
+        y_offset: int = round((height - 8 * tile_size) / 2)
+
+        return BoardGeometry(tile_size, y_offset, x_offset, flipped=self.flipped)
+
+    def resize(self, resolution: tuple[int, int]) -> None:
+        """Responsible for laying the board out again after the window has been resized. The existing sprites are
+        moved and given surfaces of the new size, so nothing is loaded from disk or rebuilt from the board."""
+
+        self.SCREEN_RESOLUTION = resolution
+        self.screen = pyg.display.get_surface()
+        self.full_redraw = True
+
+        self.geometry = self.calculate_geometry()
+        self.tile_size = self.geometry.tile_size
+
+        # The labels are worked out again too, as the board may have been flipped since it was created.
+        for tile_id, tile in self.tile_dictionary.items():
+            square: int = chess.parse_square(tile_id)
+            tile.show_id = self.is_tile_labelled(square)
+            tile.resize(self.tile_size, self.geometry.tile_topleft(square))
+
+        for tile_id, piece in self.piece_dictionary.items():
+            if piece is not None:
+                piece.resize(self.tile_size, self.geometry.tile_topleft(chess.parse_square(tile_id)))
+
+        # Highlights are made again for the new tile positions.
+        self.remove_sprite(*self.highlight_group)
+        if self.dragged_piece is not None:
+            self.dragged_piece.rect.center = pyg.mouse.get_pos()
+            self.highlight_moves(chess.parse_square(self.dragged_piece.tile))
+
+        if self.promotion_picker is not None:
+            square: int = self.promotion_moves[0].to_square
+            self.promoting_piece.rect.topleft = self.geometry.tile_topleft(square)
+            self.remove_sprite(self.promotion_picker)
+            self.open_promotion_picker(square)
+
+        if self.player_info_sprites:
+            self.remove_sprite(*self.player_info_sprites)
+            self.create_player_info()
+
+        if self.end_screen is not None:
+            self.remove_sprite(self.end_screen)
+            self.create_end_screen()
+
+        if self.profiler_overlay is not None:
+            self.remove_sprite(self.profiler_overlay)
+            self.profiler_overlay = spr.ProfilerOverlay(self.SCREEN_RESOLUTION[0], (0, 0))
+            self.add_sprite(self.profiler_overlay)
+            self.last_overlay_update = 0.0
+
+        if self.replay_bar is not None:
+            self.remove_sprite(self.replay_bar)
+            self.create_replay_bar()
 
     def update_pieces(self) -> None:
-        """Responsible for creating pieces on the screen in the correct position and builds the piece dictionary."""
+        """Responsible for creating pieces on the screen in the correct position and builds the piece dictionary.
+        This rebuilds every piece, so it is only used to resync the sprites with the board. Moves made during the
+        game are applied with 'update_pieces_for_move'."""
 
-        piece_size: int = round(self.SCREEN_RESOLUTION[0] / 8)  # The same calculation used to find the tile size.
+        piece_size: int = self.tile_size
 
         # Empties the piece sprite group.
         for sprite in self.piece_group:
             sprite.kill()
 
+        self.full_redraw = True  # Every piece is being recreated, so the whole board must be repainted.
+
         # Empties the piece dictionary.
         self.piece_dictionary = {tile: None for tile in self.piece_dictionary}
 
@@ -114,28 +288,194 @@ class Chess:
             if pos[0] >= 8:
                 pos[0] = 0
 
+    def update_pieces_for_move(self, diff: MoveDiff) -> None:
+        """Responsible for updating only the piece sprites that a move has affected."""
+
+        # Removes captured pieces, and pawns that have been promoted.
+        for tile, _ in diff.removed:
+            sprite: spr.Piece = self.piece_dictionary[tile]
+            self.mark_dirty(sprite.rect)
+            sprite.kill()
+            self.piece_dictionary[tile] = None
+
+        # Every moving sprite is taken off its tile before any are placed, so that they cannot overwrite each other.
+        moving_sprites: list[tuple[spr.Piece, str]] = [(self.piece_dictionary[from_tile], to_tile)
+                                                       for from_tile, to_tile in diff.moved]
+        for from_tile, _ in diff.moved:
+            self.piece_dictionary[from_tile] = None
+
+        for sprite, to_tile in moving_sprites:
+            self.mark_dirty(sprite.rect)
+            sprite.rect.topleft = self.tile_dictionary[to_tile].rect.topleft
+            sprite.tile = to_tile
+            self.piece_dictionary[to_tile] = sprite
+            self.mark_dirty(sprite.rect)
+
+        # Creates pieces that have been promoted to.
+        for tile, piece in diff.added:
+            spr_piece: spr.Piece = spr.Piece(piece, tile, self.tile_dictionary[tile].rect.topleft, self.tile_size)
+            self.add_sprite(spr_piece)
+            self.piece_dictionary[tile] = spr_piece
+
+    def push_move(self, move: chess.Move) -> None:
+        """Responsible for making a legal move on the board and updating everything that depends on it."""
+
+        diff: MoveDiff = get_move_diff(self.board, move)  # Must be worked out before the move is made.
+        self.board.push(move)
+        with self.profiler.stage("termination"):
+            self.game_state.refresh()  # Only re-checks for the end of the game after a move.
+            self.move_index.refresh()  # The legal moves are generated once per move, not on every pickup and drop.
+        with self.profiler.stage("update_pieces"):
+            self.update_pieces_for_move(diff)
+
+        if self.journal is not None:
+            self.journal.append(move)
+
+    def resume_game(self, journal: movejournal.MoveJournal, moves: list[chess.Move]) -> None:
+        """Responsible for carrying on from an unfinished game recovered from its journal. Must be called before
+        'start_game'. The moves are already in the journal, so they are not recorded again."""
+
+        for move in moves:
+            self.board.push(move)
+        self.game_state.refresh()
+        self.move_index.refresh()
+        self.journal = journal
+
+    def update_computer(self) -> None:
+        """Responsible for starting the computer's search when it is its turn, showing its progress, and making its
+        move once the search has finished. Never waits for the search."""
+
+        if not self.engine_service.is_searching:
+            if self.board.turn == self.computer_colour:
+                self.engine_service.start_search(self.board, self.computer_think_time)
+            return
+
+        for kind, result in self.engine_service.poll():
+            # Shows the best move found so far, and how deep and fast the search is, in the title of the window.
+            result: SearchResult
+            if result.depth == 0:
+                pyg.display.set_caption(f"Computer: book move {result.move}")
+            else:
+                pyg.display.set_caption(f"Computer: best move {result.move} ({result.score / 100:+.2f}), "
+                                        f"depth {result.depth}, {result.nps} nodes/sec")
+
+            if kind == DONE and result.move is not None:
+                self.push_move(result.move)
+
+    def update_client(self) -> None:
+        """Responsible for making the other player's moves as they arrive from the server, and showing the state of the
+        connection in the title of the window. Never waits for the server."""
+
+        for message in self.client.poll():
+            if message["type"] == "joined":
+                # The board is turned around so that this window's pieces are at the bottom.
+                self.flipped = self.client.colour == chess.BLACK
+                self.resize(self.SCREEN_RESOLUTION)
+                pyg.display.set_caption(f"Game {self.client.game_id}: waiting for an opponent")
+
+            elif message["type"] == "start":
+                self.display_users(message["w_name"], message["w_elo"], message["b_name"], message["b_elo"])
+                pyg.display.set_caption(f"Game {self.client.game_id}: playing "
+                                        f"{'White' if self.client.colour else 'Black'}")
+
+            elif message["type"] == "move" and message["ply"] == self.board.ply() + 1:
+                self.push_move(chess.Move.from_uci(message["move"]))  # This window's own moves are already made.
+
+            elif message["type"] == "refused":
+                pyg.display.set_caption(message["reason"])
+                self.load_moves([chess.Move.from_uci(move) for move in message["moves"]])
+
+            elif message["type"] in ("left", "closed") and self.is_playing and not self.game_state.is_over:
+                # The server disconnects both players at the end of a game, which is shown by 'end_game' instead.
+                self.is_playing = False
+                pyg.display.set_caption("Your opponent has left the game" if message["type"] == "left" else
+                                        "Lost the connection to the server")
+
+    def load_moves(self, moves: list[chess.Move]) -> None:
+        """Responsible for setting the board to the position after 'moves', such as when the server has refused a
+        move."""
+
+        self.board.reset()
+        for move in moves:
+            self.board.push(move)
+        self.game_state.refresh()
+        self.move_index.refresh()
+        self.update_pieces()
+
+    def update_profiler_overlay(self) -> None:
+        """Responsible for redrawing the profiler overlay, a few times a second so that it can be read."""
+
+        now: float = time.perf_counter()
+        if now - self.last_overlay_update >= 0.25:
+            self.last_overlay_update = now
+            self.profiler_overlay.set_text(self.profiler.summary())
+            self.mark_dirty(self.profiler_overlay.rect)
+
     def add_sprite(self, *sprites: any) -> None:
         """Responsible for adding sprites into their designated groups."""
 
         [self.tile_group.add(sprite) for sprite in sprites
          if type(sprite) == spr.Tile]
 
+        [self.highlight_group.add(sprite) for sprite in sprites
+         if type(sprite) == spr.MoveHighlight]
+
         [self.piece_group.add(sprite) for sprite in sprites
          if type(sprite) == spr.Piece]
 
         [self.other_sprites_group.add(sprite) for sprite in sprites
-         if type(sprite) != spr.Piece and type(sprite) != spr.Tile]
+         if type(sprite) not in (spr.Piece, spr.Tile, spr.MoveHighlight)]
+
+        # New sprites need to be drawn on the next frame.
+        self.mark_dirty(*[sprite.rect for sprite in sprites])
+
+    def remove_sprite(self, *sprites: pyg.sprite.Sprite) -> None:
+        """Responsible for removing sprites from their groups, and repainting where they were."""
+
+        for sprite in sprites:
+            self.mark_dirty(sprite.rect)
+            sprite.kill()
 
-    def update_screen(self, bg_colour: tuple, *sprite_groups: pyg.sprite.Group) -> None:
-        """Responsible for updating the screen."""
+    def mark_dirty(self, *rects: pyg.Rect) -> None:
+        """Responsible for marking areas of the screen that must be repainted on the next frame."""
 
-        self.screen.fill(bg_colour)  # Fills the background.
+        # Copies are stored, as sprites move their rects in place.
+        self.dirty_rects.extend(pyg.Rect(rect) for rect in rects)
 
-        # Updates the sprite groups and draws them on the screen.
+    def update_screen(self, bg_colour: tuple, *sprite_groups: pyg.sprite.Group) -> bool:
+        """Responsible for updating the screen. Returns whether anything was drawn."""
+
+        # Updates the sprite groups.
         [sprite_group.update() for sprite_group in sprite_groups]
-        [sprite_group.draw(self.screen) for sprite_group in sprite_groups]
-        
-        pyg.display.flip()  # Refreshes the display.
+
+        if self.full_redraw or not self.dirty_rendering:
+            with self.profiler.stage("draw"):
+                self.screen.fill(bg_colour)  # Fills the background.
+
+                # Draws the sprite groups on the screen.
+                [sprite_group.draw(self.screen) for sprite_group in sprite_groups]
+
+            with self.profiler.stage("display"):
+                pyg.display.flip()  # Refreshes the display.
+
+        elif self.dirty_rects:
+            with self.profiler.stage("draw"):
+                # Only repaints the areas that have changed, by clipping all drawing to each dirty rect in turn.
+                for rect in self.dirty_rects:
+                    self.screen.set_clip(rect)
+                    self.screen.fill(bg_colour, rect)
+                    [sprite_group.draw(self.screen) for sprite_group in sprite_groups]
+                self.screen.set_clip(None)
+
+            with self.profiler.stage("display"):
+                pyg.display.update(self.dirty_rects)  # Refreshes only the changed areas of the display.
+
+        else:
+            return False  # Nothing has changed, so nothing is drawn.
+
+        self.full_redraw = False
+        self.dirty_rects = []
+        return True
 
     def event_handler(self, event) -> None:
         """Responsible for handling all events during runtime."""
@@ -144,99 +484,271 @@ class Chess:
         if event.type == pyg.QUIT:
             self.is_running = False  # Ends the mainloop.
 
+        # When the window is resized. Only the newest size is kept, and the board is laid out once per frame.
+        elif event.type == pyg.VIDEORESIZE:
+            self.pending_resize = event.size
+
+        # When the window needs repainting, for example after being uncovered or restored.
+        elif event.type in (pyg.VIDEOEXPOSE, pyg.WINDOWEXPOSED, pyg.WINDOWRESTORED):
+            self.full_redraw = True
+
+        # When F is pressed, during a game or a replay.
+        elif event.type == pyg.KEYDOWN and event.key == pyg.K_f:
+            self.search_position()
+
+        # When a stored game is being replayed.
+        elif self.replay is not None:
+            if event.type == pyg.KEYDOWN:
+                self.replay_key_event(event.key)
+
+            elif event.type == pyg.MOUSEBUTTONDOWN and event.button == 1 and \
+                    self.replay_bar.rect.collidepoint(event.pos):
+                self.seek_replay(round(self.replay_bar.fraction_at(event.pos) * len(self.replay.moves)))
+
         # If the game has not ended.
         elif self.is_playing:
+            # When LMB is clicked while a promotion is being chosen.
+            if event.type == pyg.MOUSEBUTTONDOWN and event.button == 1 and self.promotion_picker is not None:
+                self.choose_promotion(event.pos)
+
             # When LMB is clicked.
-            if event.type == pyg.MOUSEBUTTONDOWN and event.button == 1:
-                self.lmb_down_event()
+            elif event.type == pyg.MOUSEBUTTONDOWN and event.button == 1:
+                self.lmb_down_event(event.pos)
 
             # When LMB is released.
             elif event.type == pyg.MOUSEBUTTONUP and event.button == 1:
-                self.lmb_up_event()
-
-    def lmb_down_event(self) -> None:
-        """Responsible for handling the 'left mouse button down' event."""
-        mouse_pos: tuple = pyg.mouse.get_pos()
-        for tile in self.piece_dictionary:
-            if self.piece_dictionary[tile] is not None:
-                # Only allows a piece to move if it is that team's turn.
-                if self.piece_dictionary[tile].piece.isupper() and self.board.turn or \
-                   self.piece_dictionary[tile].piece.islower() and not self.board.turn:
-                    # If any piece in the dict is colliding with the mouse pos.
-                    if self.piece_dictionary[tile].rect.collidepoint(mouse_pos):
-                        self.piece_dictionary[tile].clicked = True
-
-    def lmb_up_event(self) -> None:
-        """Responsible for handling the 'left mouse button up' event."""
-
-        for piece_tile in self.piece_dictionary:
-            # If the tile is not empty.
-            if self.piece_dictionary[piece_tile] is not None:
-                if self.piece_dictionary[piece_tile].clicked:
-                    self.piece_dictionary[piece_tile].clicked = False  # Unbinds the piece from the mouse.
-                    mouse_pos: tuple = pyg.mouse.get_pos()
-                    for tiledict_tile in self.tile_dictionary:
-                        if self.tile_dictionary[tiledict_tile].rect.collidepoint(mouse_pos):
-                            # Moves the pieces. If an illegal move is made, the exception will be handled.
-                            try:
-                                move = chess.Move.from_uci(self.piece_dictionary[piece_tile].tile +
-                                                           tiledict_tile)
-
-                                if self.piece_dictionary[piece_tile].piece == 'P' and \
-                                     piece_tile[1] == "7" or \
-                                     self.piece_dictionary[piece_tile].piece == 'p' and \
-                                     piece_tile[1] == "2":
-                                    move = chess.Move.from_uci(self.piece_dictionary[piece_tile].tile +
-                                                               tiledict_tile + "q")
-
-                                if move in self.board.legal_moves:
-                                    self.board.push(move)
-
-                            except ValueError:
-                                pass
-
-                            break  # Exits the inner loop.
-
-                    self.update_pieces()  # Updates the piece sprites.
-                    break  # Exits the outer loop.
+                self.lmb_up_event(event.pos)
+
+            # When the mouse moves.
+            elif event.type == pyg.MOUSEMOTION:
+                self.drag_piece(event.pos)
+
+    def lmb_down_event(self, mouse_pos: tuple | None = None) -> None:
+        """Responsible for handling the 'left mouse button down' event. Uses the current mouse position if
+        'mouse_pos' is not given."""
+        if mouse_pos is None:
+            mouse_pos = pyg.mouse.get_pos()
+
+        # Finds the tile under the mouse directly from its position, rather than checking every piece.
+        square: int | None = self.geometry.square_at(mouse_pos)
+        if square is None:
+            return
+
+        # When playing the computer, its pieces cannot be moved while it is thinking.
+        if self.computer_colour is not None and self.board.turn == self.computer_colour:
+            return
+
+        # When playing over the server, only this window's side can be moved, once both players have joined.
+        if self.client is not None and (not self.client.is_started or self.board.turn != self.client.colour):
+            return
+
+        piece: spr.Piece | None = self.piece_dictionary.get(chess.square_name(square))
+        if piece is not None:
+            # Only allows a piece to move if it is that team's turn.
+            if piece.piece.isupper() and self.board.turn or piece.piece.islower() and not self.board.turn:
+                self.dragged_piece = piece  # Binds the piece to the mouse.
+                self.drag_piece(mouse_pos)
+
+                self.highlight_moves(square)
+
+    def highlight_moves(self, square: int) -> None:
+        """Responsible for highlighting the squares the piece on 'square' can move to."""
+
+        for destination in self.move_index.destinations_from(square):
+            self.add_sprite(spr.MoveHighlight(self.tile_size, self.geometry.tile_topleft(destination)))
+
+    def drag_piece(self, mouse_pos: tuple) -> None:
+        """Responsible for moving the piece held by the mouse, if there is one, to the mouse position."""
+
+        if self.dragged_piece is not None and self.dragged_piece.rect.center != mouse_pos:
+            # Repaints where the piece was and where it has moved to.
+            self.mark_dirty(self.dragged_piece.rect)
+            self.dragged_piece.rect.center = mouse_pos
+            self.mark_dirty(self.dragged_piece.rect)
+
+    def lmb_up_event(self, mouse_pos: tuple | None = None) -> None:
+        """Responsible for handling the 'left mouse button up' event. Uses the current mouse position if
+        'mouse_pos' is not given."""
+
+        if self.dragged_piece is None:
+            return
+
+        dropped_piece: spr.Piece = self.dragged_piece
+        self.dragged_piece = None  # Unbinds the piece from the mouse.
+        self.remove_sprite(*self.highlight_group)
+
+        if mouse_pos is None:
+            mouse_pos = pyg.mouse.get_pos()
+        square: int | None = self.geometry.square_at(mouse_pos)
+
+        # Checks the drop against the legal moves worked out when the position was reached.
+        moves: list[chess.Move] = []
+        if square is not None:
+            moves = self.move_index.moves_between(chess.parse_square(dropped_piece.tile), square)
+
+        if len(moves) == 1:
+            self.make_player_move(moves[0])
+
+        elif moves:
+            # A pawn has reached the last rank. The piece waits on that square while the player picks what it
+            # promotes to.
+            self.mark_dirty(dropped_piece.rect)
+            dropped_piece.rect.topleft = self.geometry.tile_topleft(square)
+            self.mark_dirty(dropped_piece.rect)
+
+            self.promoting_piece = dropped_piece
+            self.promotion_moves = moves
+            self.open_promotion_picker(square)
+
+        else:
+            self.return_piece(dropped_piece)
+
+    def open_promotion_picker(self, square: int) -> None:
+        """Responsible for showing the pieces the promoting pawn can become, over the square it is promoting on."""
+
+        self.promotion_picker = spr.PromotionPicker(self.tile_size, self.geometry.tile_center(square),
+                                                    self.promoting_piece.team == "w")
+        self.promotion_picker.rect.clamp_ip(self.screen.get_rect())  # Keeps the picker on the screen.
+        self.add_sprite(self.promotion_picker)
+
+    def choose_promotion(self, mouse_pos: tuple) -> None:
+        """Responsible for making the promotion picked from the promotion picker. Clicking anywhere else cancels the
+        move."""
+
+        choice: str | None = self.promotion_picker.choice_at(mouse_pos)
+        self.remove_sprite(self.promotion_picker)
+        self.promotion_picker = None
+
+        if choice is None:
+            self.return_piece(self.promoting_piece)
+        else:
+            piece_type: chess.PieceType = chess.Piece.from_symbol(choice).piece_type
+            self.make_player_move(next(move for move in self.promotion_moves if move.promotion == piece_type))
+
+        self.promoting_piece = None
+        self.promotion_moves = []
+
+    def make_player_move(self, move: chess.Move) -> None:
+        """Responsible for making a move the player has chosen."""
+
+        if self.engine_service is not None:
+            self.engine_service.cancel()  # Anything the computer was thinking about is out of date.
+        if self.client is not None:
+            self.client.send_move(self.board.ply(), move)  # Made straight away, as the server will accept it.
+        self.push_move(move)
+
+    def return_piece(self, piece: spr.Piece) -> None:
+        """Responsible for putting a piece back on its tile after it has been dropped somewhere it cannot move to."""
+
+        self.mark_dirty(piece.rect)
+        piece.rect.topleft = self.tile_dictionary[piece.tile].rect.topleft
+        self.mark_dirty(piece.rect)
+
+    def load_replay(self, moves: list[chess.Move]) -> None:
+        """Responsible for showing a stored game instead of playing a new one. Must be called before 'start_game'.
+        The arrow keys step through the game, Page Up and Page Down jump 10 moves, Home and End jump to the start
+        and end, and clicking the bar at the bottom of the screen jumps to that point in the game."""
+
+        self.replay = GameReplay(self.board, moves)
+        self.create_replay_bar()
+        pyg.key.set_repeat(300, 50)  # Holding an arrow key steps through the game.
+
+    def create_replay_bar(self) -> None:
+        """Creates the bar along the bottom of the screen showing how far through the replay the board is."""
+
+        self.replay_bar = spr.ReplayBar((self.SCREEN_RESOLUTION[0], REPLAY_BAR_HEIGHT),
+                                        (0, self.SCREEN_RESOLUTION[1] - REPLAY_BAR_HEIGHT))
+        self.add_sprite(self.replay_bar)
+        self.update_replay_bar()
+
+    def update_replay_bar(self) -> None:
+        """Responsible for showing the current ply on the replay bar and in the title of the window."""
+
+        self.replay_bar.set_progress(self.replay.ply / len(self.replay.moves) if self.replay.moves else 1.0)
+        self.mark_dirty(self.replay_bar.rect)
+        pyg.display.set_caption(f"Replay: move {self.replay.ply} of {len(self.replay.moves)}")
+
+    def replay_key_event(self, key: int) -> None:
+        """Responsible for stepping and seeking through the replay with the keyboard."""
+
+        if key == pyg.K_RIGHT:
+            self.step_replay(self.replay.step_forward())
+        elif key == pyg.K_LEFT:
+            self.step_replay(self.replay.step_backward())
+        elif key == pyg.K_PAGEDOWN:
+            self.seek_replay(self.replay.ply + REPLAY_PAGE)
+        elif key == pyg.K_PAGEUP:
+            self.seek_replay(self.replay.ply - REPLAY_PAGE)
+        elif key == pyg.K_HOME:
+            self.seek_replay(0)
+        elif key == pyg.K_END:
+            self.seek_replay(len(self.replay.moves))
+
+    def step_replay(self, diff: MoveDiff | None) -> None:
+        """Responsible for showing a single step through the replay, by only updating the pieces it changed."""
+
+        if diff is not None:
+            self.update_pieces_for_move(diff)
+            self.update_replay_bar()
+
+    def seek_replay(self, ply: int) -> None:
+        """Responsible for jumping to any point in the replay."""
+
+        self.replay.seek(ply)
+        self.update_pieces()  # The whole board may have changed, so every piece is resynced.
+        self.update_replay_bar()
+
+    def search_position(self) -> None:
+        """Responsible for finding the stored games that reached the position on the board, and listing the first few
+        in the title of the window."""
+
+        # The database is only needed if a search is made, so it is not loaded at startup.
+        from dbmanager import ChessDatabase
+
+        db = ChessDatabase()
+        matches: list[tuple[int, int]] = db.find_position(self.board)
+        db.close()
+
+        if not matches:
+            pyg.display.set_caption("No stored games reached this position")
+            return
+
+        shown: str = ", ".join(f"game {game_id} after {ply} moves" for game_id, ply in matches[:POSITION_SEARCH_SHOWN])
+        more: str = f" and {len(matches) - POSITION_SEARCH_SHOWN} more" if len(matches) > POSITION_SEARCH_SHOWN else ""
+        pyg.display.set_caption(f"Position reached in {shown}{more}")
 
     def end_game(self) -> None:
         """Ends the game once checkmate or stalemate is reached."""
         self.is_playing = False
+        self.create_end_screen()
+
+        if self.client is None:
+            self.add_game_to_database()  # Games played over the server are stored by the server.
+
+    def create_end_screen(self) -> None:
+        """Shows how the game ended, across the middle of the screen."""
         endscreen_dimentions = (self.SCREEN_RESOLUTION[0], self.SCREEN_RESOLUTION[1] / 4)
         endscreen_center = (self.SCREEN_RESOLUTION[0] / 2, self.SCREEN_RESOLUTION[1] / 2)
 
-        self.add_sprite(spr.EndScreen(endscreen_dimentions, endscreen_center, self.board))
-
-        self.add_game_to_database()
+        self.end_screen = spr.EndScreen(endscreen_dimentions, endscreen_center, self.game_state)
+        self.add_sprite(self.end_screen)
 
     def add_game_to_database(self):
         """Called once the game has ended."""
 
-        all_moves = ""
-        count = 0.5
-        for move in self.board.move_stack:
-            count += 0.5
-            move = str(move)
-            if count.is_integer():
-                move = str(int(count)) + ". " + move[:2:] + " to " + move[2::]
-            else:
-                move = ", " + move[:2:] + " to " + move[2::] + ".\n"
-
-            all_moves += move
-
-        if self.board.is_stalemate() or self.board.can_claim_threefold_repetition() or \
-           self.board.can_claim_fifty_moves() or self.board.can_claim_fifty_moves():
-            winner = "Stalemate"
-        else:
-            if self.board.outcome().winner:
-                winner = "White"
-            else:
-                winner = "Black"
+        # The database and ratings are only needed once the game is over, so they are not loaded at startup.
+        import ratings
+        from dbmanager import ChessDatabase
 
         db = ChessDatabase()
-        db.add_entry(self.w_name, self.w_elo, self.b_name, self.b_elo, winner, all_moves)
-        db.save()
+        entry: tuple = self.game_state.database_entry(self.w_name, self.w_elo, self.b_name, self.b_elo)
+        if self.journal is not None:
+            self.journal.compact(db, entry)  # Stores the game and deletes its journal.
+            self.journal = None
+        else:
+            db.add_entry(*entry)
+            db.save()
+        ratings.rate_games(db)  # Only the new game is rated, starting from the players' current ratings.
         db.close()
 
     def display_users(self, w_name, w_elo, b_name, b_elo):
@@ -247,51 +759,121 @@ class Chess:
         self.b_name = b_name
         self.b_elo = b_elo
 
-        w_info = w_name + "(" + w_elo + ")"
-        b_info = b_name + "(" + b_elo + ")"
+        # The players are shown again when a game on the server starts.
+        self.remove_sprite(*self.player_info_sprites)
+        self.create_player_info()
+
+    def create_player_info(self):
+        """Creates the banners showing the players' details, above and below the board."""
 
-        top_tile_pos = self.tile_dictionary["d8"].rect.topright
-        bottom_tile_pos = self.tile_dictionary["d1"].rect.bottomright
+        w_info = self.w_name + "(" + self.w_elo + ")"
+        b_info = self.b_name + "(" + self.b_elo + ")"
 
-        b_info_location = (top_tile_pos[0], top_tile_pos[1] / 2)
-        w_info_location = (bottom_tile_pos[0], self.SCREEN_RESOLUTION[1] - (top_tile_pos[1] / 2))
+        top_tile_pos = self.geometry.board_top_center()
+        bottom_tile_pos = self.geometry.board_bottom_center()
+
+        top_info_location = (top_tile_pos[0], top_tile_pos[1] / 2)
+        bottom_info_location = (bottom_tile_pos[0], self.SCREEN_RESOLUTION[1] - (top_tile_pos[1] / 2))
+
+        # White is shown at the bottom of the screen, unless the board is flipped.
+        if self.flipped:
+            w_info_location, b_info_location = top_info_location, bottom_info_location
+        else:
+            w_info_location, b_info_location = bottom_info_location, top_info_location
 
         info_dimentions = (self.SCREEN_RESOLUTION[0], top_tile_pos[1])
 
         w_info_sprite = spr.PlayerInfo(info_dimentions, w_info_location, w_info)
         b_info_sprite = spr.PlayerInfo(info_dimentions, b_info_location, b_info)
 
+        self.player_info_sprites = [w_info_sprite, b_info_sprite]
         self.add_sprite(w_info_sprite, b_info_sprite)
 
     def start_game(self) -> None:
         """Creates the sprites and starts the mainloop of the game."""
 
-        self.update_pieces()
+        if self.journal is None and self.journal_path is not None and self.replay is None and self.client is None:
+            self.journal = movejournal.MoveJournal.create(self.journal_path, {
+                "w_name": self.w_name, "w_elo": self.w_elo, "b_name": self.b_name, "b_elo": self.b_elo,
+                "computer_colour": self.computer_colour, "flipped": self.flipped})
+
+        with self.profiler.stage("update_pieces"):
+            self.update_pieces()
+
+        if self.show_profiler_overlay:
+            self.profiler_overlay = spr.ProfilerOverlay(self.SCREEN_RESOLUTION[0], (0, 0))
+            self.add_sprite(self.profiler_overlay)
 
         self.is_running = True
-        self.is_playing = True
+        self.is_playing = self.replay is None  # A replayed game is only watched.
+        is_idle: bool = False
+        idle_wait_ms: int = 1000 // self.idle_fps
+        if self.client is not None:
+            idle_wait_ms = min(idle_wait_ms, NETWORK_POLL_MS)
+        first_frame: bool = True
         while self.is_running:
-            # Checks for events.
-            for event in pyg.event.get():
-                # Passes the event to the event handler.
-                self.event_handler(event)
+            # Checks for events. When nothing is happening on the board, the loop sleeps until an event arrives
+            # (or until the idle timeout), rather than spinning.
+            if is_idle:
+                events: list[pyg.event.Event] = [pyg.event.wait(idle_wait_ms)] + pyg.event.get()
+            else:
+                events = pyg.event.get()
+
+            self.profiler.start_frame()  # Time spent waiting for events is not part of the frame.
+
+            with self.profiler.stage("event_handler"):
+                for event in events:
+                    # Passes the event to the event handler.
+                    self.event_handler(event)
+
+                # Dragging the edge of the window sends many resize events, but the board is only laid out once.
+                if self.pending_resize is not None:
+                    self.resize(self.pending_resize)
+                    self.pending_resize = None
 
             if self.is_playing:
-                if self.board.is_checkmate():
-                    self.end_game()
+                # The game state is only recalculated when a move is made, so this check is cheap.
+                with self.profiler.stage("termination"):
+                    if self.game_state.is_over:
+                        self.end_game()
+
+            if self.profiler_overlay is not None:
+                self.update_profiler_overlay()
+
+            is_idle = not self.update_screen((0, 0, 0), *self.sprite_groups)
+            if first_frame:
+                startupprofile.mark("first frame drawn")
+                first_frame = False
+
+            # Checks on the computer's search. The loop keeps running at the full frame rate while it is thinking,
+            # so that its move is picked up as soon as it is ready.
+            if self.engine_service is not None and self.is_playing and not self.game_state.is_over:
+                with self.profiler.stage("computer"):
+                    self.update_computer()
+                if self.engine_service.is_searching:
+                    is_idle = False
+
+            # Collects the other player's moves from the server.
+            if self.client is not None:
+                with self.profiler.stage("network"):
+                    self.update_client()
+
+            self.profiler.end_frame(len(self.tile_group) + len(self.piece_group) + len(self.other_sprites_group))
+
+            # Caps the frame rate.
+            self.clock.tick(self.fps)
+
+        if self.engine_service is not None:
+            self.engine_service.close()  # Stops the computer's search when the window is closed.
 
-                elif self.board.is_stalemate() or self.board.can_claim_threefold_repetition() or \
-                     self.board.can_claim_fifty_moves() or self.board.can_claim_fifty_moves():
-                    self.end_game()
+        if self.client is not None:
+            self.client.close()  # Leaving an unfinished game abandons it.
 
-                # Updates the position of clicked pieces.
-                for tile in self.piece_dictionary:
-                    if self.piece_dictionary[tile] is not None:
-                        if self.piece_dictionary[tile].clicked:
-                            mouse_pos: tuple = pyg.mouse.get_pos()
-                            self.piece_dictionary[tile].rect.centerx = mouse_pos[0]
-                            self.piece_dictionary[tile].rect.centery = mouse_pos[1]
+        if self.journal is not None:
+            self.journal.close()  # The game has not finished, so its journal is kept to be resumed.
 
-            self.update_screen((0, 0, 0), *self.sprite_groups)
+        if self.profiler.enabled:
+            self.profiler.dump(self.profile_output)
 
         pyg.quit()
+        assets.clear()  # The cached surfaces and fonts are no longer valid once pygame has quit.
@@ -2,6 +2,8 @@
 
 import pygame as pyg
 
+import assets
+
 
 class InvalidPieceException(Exception):
     """Raised when a piece passed to 'Piece' is not recognized."""
@@ -17,23 +19,22 @@ class Tile(pyg.sprite.Sprite):
         super().__init__()
 
         self.ID: str = tile_id  # Holds a value such as 'A1' or 'G6'.
+        self.colour: tuple[int, int, int] = colour
+        self.show_id: bool = show_id
+
+        self.resize(size, pos)
 
-        # Creates a square.
-        self.image: pyg.Surface = pyg.Surface((size, size))
-        pyg.draw.rect(self.image, colour, [0, 0, size, size])
+    def resize(self, size: int, pos: tuple[int, int]) -> None:
+        """Changes the size and position of the tile."""
+
+        # Creates a square, with the tile ID on it if needed. The surface is shared with other tiles that look the same.
+        self.image: pyg.Surface = assets.get_tile_image(size, self.colour, self.ID if self.show_id else "")
 
         # Puts the tile in the correct position.
         self.rect: pyg.rect = self.image.get_rect()
         self.rect.x = pos[0]
         self.rect.y = pos[1]
 
-        if show_id:
-            # Adds the tile ID to the tile.
-            font: pyg.font.SysFont = pyg.font.SysFont('Arial', 20)
-            text_surf: pyg.image = font.render(self.ID, True, (0, 0, 0))
-            text_rect: pyg.rect = text_surf.get_rect(center=(10, size - 10))
-            self.image.blit(text_surf, text_rect)
-
 
 class Piece(pyg.sprite.Sprite):
     def __init__(self, piece: str, tile: str, pos: tuple, size: int):
@@ -50,16 +51,70 @@ class Piece(pyg.sprite.Sprite):
         else:
             self.team = "b"
 
-        # Sets up the sprite.
-        self.image: pyg.image = pyg.image.load(f"sprites/{self.team}{self.piece}.png").convert_alpha()
-        self.image = pyg.transform.scale(self.image, (size, size))
+        self.tile: str = tile
+
+        self.resize(size, pos)
+
+    def resize(self, size: int, pos: tuple[int, int]) -> None:
+        """Changes the size and position of the piece."""
+
+        # Sets up the sprite. The image is shared with every other piece of the same type and size.
+        self.image: pyg.image = assets.get_piece_image(self.piece, size)
 
         self.rect: pyg.rect = self.image.get_rect()
         self.rect.x = pos[0]
         self.rect.y = pos[1]
 
-        self.tile: str = tile
-        self.clicked: bool = False
+
+class MoveHighlight(pyg.sprite.Sprite):
+    def __init__(self, size: int, pos: tuple[int, int]):
+        """Creates a marker showing that the held piece can move to the tile at 'pos'."""
+        super().__init__()
+        self.image: pyg.Surface = assets.get_highlight_image(size)
+        self.rect: pyg.Rect = self.image.get_rect()
+        self.rect.topleft = pos
+
+
+class PromotionPicker(pyg.sprite.Sprite):
+    # The pieces a pawn can promote to, in the order they are shown.
+    CHOICES: str = "qrnb"
+
+    def __init__(self, size: int, center: tuple[int, int], white: bool):
+        """Creates a row of the pieces a pawn can promote to, each 'size' pixels wide, for the player to pick from."""
+        super().__init__()
+        self.size: int = size
+        self.image: pyg.Surface = pyg.Surface((size * len(self.CHOICES), size))
+        self.image.fill((40, 40, 40))
+
+        for i, choice in enumerate(self.CHOICES):
+            self.image.blit(assets.get_piece_image(choice.upper() if white else choice, size), (i * size, 0))
+
+        self.rect: pyg.Rect = self.image.get_rect()
+        self.rect.center = center
+
+    def choice_at(self, pos: tuple[int, int]) -> str | None:
+        """Returns the piece (such as 'q' or 'n') under 'pos', or None if 'pos' is outside the picker."""
+
+        if not self.rect.collidepoint(pos):
+            return None
+        return self.CHOICES[(pos[0] - self.rect.x) // self.size]
+
+
+class ReplayBar(pyg.sprite.Sprite):
+    def __init__(self, dimensions: tuple[int, int], pos: tuple[int, int]):
+        """Creates a bar showing how far through a replayed game the board is. Clicking it seeks through the game."""
+        super().__init__()
+        self.image: pyg.Surface = pyg.Surface(dimensions)
+        self.rect: pyg.Rect = self.image.get_rect()
+        self.rect.topleft = pos
+
+    def set_progress(self, fraction: float) -> None:
+        self.image.fill((60, 60, 60))
+        self.image.fill((220, 220, 220), (0, 0, round(self.rect.width * fraction), self.rect.height))
+
+    def fraction_at(self, pos: tuple[int, int]) -> float:
+        """Returns how far along the bar 'pos' is, from 0 to 1."""
+        return min(max((pos[0] - self.rect.x) / self.rect.width, 0.0), 1.0)
 
 
 class PlayerInfo(pyg.sprite.Sprite):
@@ -69,8 +124,7 @@ class PlayerInfo(pyg.sprite.Sprite):
         self.image.fill((0, 0, 0))
 
         # To add text.
-        pyg.font.init()
-        font = pyg.font.SysFont('Monospace', 40)
+        font = assets.get_font('Monospace', 40)
         text_surface = font.render(info, True, (255, 255, 255))
         text_rect = text_surface.get_rect()
         text_rect.center = (dimensions[0] / 2, dimensions[1] / 2)
@@ -81,39 +135,23 @@ class PlayerInfo(pyg.sprite.Sprite):
 
 
 class EndScreen(pyg.sprite.Sprite):
-    def __init__(self, dimensions: tuple[int, int], center: tuple[int, int], board):
+    def __init__(self, dimensions: tuple[int, int], center: tuple[int, int], game_state):
         super().__init__()
         self.image = pyg.Surface(dimensions)
         self.image.fill((0, 0, 0))
 
-        if board.is_checkmate():
-            title = "Checkmate"
-            if board.outcome().winner:
-                desc = "White wins via checkmate."
-            else:
-                desc = "Black wins via checkmate."
-
-        else:
-            title = "Stalemate"
-            if board.is_stalemate():
-                if board.turn:
-                    desc = "White is out of playable moves."
-                else:
-                    desc = "Black is out of playable moves."
-            elif board.can_claim_threefold_repetition():
-                desc = "The position has been repeated 3 times."
-            elif board.can_claim_fifty_moves():
-                desc = "50 non-pawn moves have been made without a piece being captured."
+        # The outcome has already been worked out by the game state, so it is not recalculated here.
+        title = game_state.title
+        desc = game_state.desc
 
         # To add text.
-        pyg.font.init()
-        font = pyg.font.SysFont('CAD:', 100)
+        font = assets.get_font('CAD:', 100)
         title_text_surface = font.render(title, True, (255, 255, 255))
         title_text_rect = title_text_surface.get_rect()
         title_text_rect.center = (dimensions[0] / 2, dimensions[1] / 4)
         self.image.blit(title_text_surface, title_text_rect)
 
-        font = pyg.font.SysFont('CAD:', 40)
+        font = assets.get_font('CAD:', 40)
         desc_text_surface = font.render(desc, True, (255, 255, 255))
         desc_text_rect = desc_text_surface.get_rect()
         desc_text_rect.center = (dimensions[0] / 2, dimensions[1] - (dimensions[1] / 3))
@@ -122,3 +160,16 @@ class EndScreen(pyg.sprite.Sprite):
         self.rect = self.image.get_rect()
         self.rect.center = center
 
+
+class ProfilerOverlay(pyg.sprite.Sprite):
+    def __init__(self, width: int, pos: tuple[int, int]):
+        """Creates a strip of text showing how long frames are taking."""
+        super().__init__()
+        self.font = assets.get_font('Monospace', 14)
+        self.image = pyg.Surface((width, self.font.get_linesize()))
+        self.rect = self.image.get_rect()
+        self.rect.topleft = pos
+
+    def set_text(self, text: str) -> None:
+        self.image.fill((0, 0, 0))
+        self.image.blit(self.font.render(text, True, (255, 255, 0)), (0, 0))
@@ -1,55 +1,644 @@
+import atexit
+import os
 import sqlite3 as sql
+import sys
+
+import movecodec
+import positionindex
+
+DEFAULT_PATH: str = 'games.db'
+
+# Open connections, keyed by (process ID, database path). Connections are kept open for the life of the process,
+# so that every 'ChessDatabase' shares one instead of connecting to the file each time. The process ID is part of
+# the key, as a connection must not be shared with a forked child process.
+_connections: dict[tuple[int, str], sql.Connection] = {}
+
+
+def _create_games_table(con: sql.Connection) -> None:
+    """Schema version 1. 'id' is an alias for the rowid, so SQLite assigns it when a game is inserted."""
+
+    con.execute("""
+                CREATE TABLE IF NOT EXISTS games (
+                    id integer PRIMARY KEY,
+                    w_name text NOT NULL,
+                    w_elo text NOT NULL,
+                    b_name text NOT NULL,
+                    b_elo text NOT NULL,
+                    winner text NOT NULL,
+                    moves text NOT NULL);
+                """)
+
+
+def _store_moves_as_blobs(con: sql.Connection) -> None:
+    """Schema version 2. Rebuilds the games table with 'moves' stored as a BLOB of 16 bit move codes (see movecodec),
+    converting the text of every existing game."""
+
+    con.execute("""
+                CREATE TABLE games_new (
+                    id integer PRIMARY KEY,
+                    w_name text NOT NULL,
+                    w_elo text NOT NULL,
+                    b_name text NOT NULL,
+                    b_elo text NOT NULL,
+                    winner text NOT NULL,
+                    moves blob NOT NULL);
+                """)
+
+    old_games = con.execute("SELECT id, w_name, w_elo, b_name, b_elo, winner, moves FROM games;")
+    con.executemany("INSERT INTO games_new VALUES (?, ?, ?, ?, ?, ?, ?);",
+                    (game[:6] + (movecodec.encode_moves(movecodec.text_to_moves(game[6])),)
+                     for game in old_games))
+
+    con.execute("DROP TABLE games;")
+    con.execute("ALTER TABLE games_new RENAME TO games;")
+
+
+def _create_positions_table(con: sql.Connection) -> None:
+    """Schema version 3. Adds a table holding the Zobrist key of every position reached in every game, ordered by key
+    so that the games reaching a position can be found with an index lookup. Existing games are indexed."""
+
+    con.execute("""
+                CREATE TABLE positions (
+                    key integer NOT NULL,
+                    game_id integer NOT NULL,
+                    ply integer NOT NULL,
+                    PRIMARY KEY (key, game_id, ply)) WITHOUT ROWID;
+                """)
+
+    for game_id, moves in con.execute("SELECT id, moves FROM games;").fetchall():
+        _index_positions(con, game_id, moves)
+
+
+def _index_positions(con: sql.Connection, game_id: int, moves: bytes, position_keys=None) -> None:
+    """Adds every position reached in a game to the positions table. 'position_keys' can be passed if the
+    (ply, key) pairs have already been worked out, otherwise they are worked out from the moves."""
+
+    if position_keys is None:
+        position_keys = positionindex.game_position_keys(movecodec.decode_moves(moves))
+
+    con.executemany("INSERT OR IGNORE INTO positions (key, game_id, ply) VALUES (?, ?, ?);",
+                    ((key, game_id, ply) for ply, key in position_keys))
+
+
+def _create_import_progress_table(con: sql.Connection) -> None:
+    """Schema version 4. Adds a table recording how far through each PGN file an import has got, so that an
+    interrupted import can carry on from where it stopped."""
+
+    con.execute("""
+                CREATE TABLE import_progress (
+                    source text PRIMARY KEY,
+                    offset integer NOT NULL,
+                    games integer NOT NULL);
+                """)
+
+
+def _create_player_tables(con: sql.Connection) -> None:
+    """Schema version 5. Adds a table of players, each player's win/draw/loss record, and the games each player took
+    part in. They are kept up to date as games are added and deleted, so a player's record is read from one row
+    rather than counted from every game. Existing games are added to them."""
+
+    con.execute("""
+                CREATE TABLE players (
+                    id integer PRIMARY KEY,
+                    name text NOT NULL UNIQUE);
+                """)
+
+    # 'score' is two for each win and one for each draw, so the leaderboard can be read in order from its index.
+    con.execute("""
+                CREATE TABLE player_stats (
+                    player_id integer PRIMARY KEY REFERENCES players (id),
+                    games integer NOT NULL DEFAULT 0,
+                    wins integer NOT NULL DEFAULT 0,
+                    draws integer NOT NULL DEFAULT 0,
+                    losses integer NOT NULL DEFAULT 0,
+                    score integer NOT NULL DEFAULT 0);
+                """)
+    con.execute("CREATE INDEX player_stats_by_score ON player_stats (score DESC, games);")
+
+    con.execute("""
+                CREATE TABLE player_games (
+                    player_id integer NOT NULL,
+                    game_id integer NOT NULL,
+                    colour text NOT NULL,
+                    PRIMARY KEY (player_id, game_id, colour)) WITHOUT ROWID;
+                """)
+
+    for game_id, w_name, b_name, winner in con.execute("SELECT id, w_name, b_name, winner FROM games;").fetchall():
+        _record_player_games(con, game_id, w_name, b_name, winner)
+
+
+def _record_player_games(con: sql.Connection, game_id: int, w_name: str, b_name: str, winner: str,
+                         change: int = 1) -> None:
+    """Adds a game to both players' records, creating the players if they are new. Pass a 'change' of -1 to take
+    the game back out of their records when it is deleted.
+    A game a player played against themselves, such as a self-play game between two random players, is added to
+    their record once, as white. It is counted as a draw, as they both won and lost it."""
+
+    if w_name == b_name:
+        _record_player_game(con, game_id, w_name, "White", "Stalemate", change)
+    else:
+        _record_player_game(con, game_id, w_name, "White", winner, change)
+        _record_player_game(con, game_id, b_name, "Black", winner, change)
+
+
+def _record_player_game(con: sql.Connection, game_id: int, name: str, colour: str, winner: str, change: int) -> None:
+    """Adds a game to one player's record. See '_record_player_games'."""
+
+    con.execute("INSERT OR IGNORE INTO players (name) VALUES (?);", (name,))
+    player_id: int = con.execute("SELECT id FROM players WHERE name=?;", (name,)).fetchone()[0]
+
+    win: int = winner == colour
+    draw: int = winner == "Stalemate"
+    loss: int = not win and not draw
+
+    con.execute("INSERT OR IGNORE INTO player_stats (player_id) VALUES (?);", (player_id,))
+    con.execute("""
+                UPDATE player_stats
+                SET games=games+?, wins=wins+?, draws=draws+?, losses=losses+?, score=score+?
+                WHERE player_id=?;
+                """, (change, change * win, change * draw, change * loss, change * (2 * win + draw), player_id))
+
+    if change > 0:
+        con.execute("INSERT OR IGNORE INTO player_games (player_id, game_id, colour) VALUES (?, ?, ?);",
+                    (player_id, game_id, colour))
+    else:
+        con.execute("DELETE FROM player_games WHERE player_id=? AND game_id=? AND colour=?;",
+                    (player_id, game_id, colour))
+
+
+def _add_player_ratings(con: sql.Connection) -> None:
+    """Schema version 6. Adds each player's Elo rating, which is NULL until it has been worked out by ratings.py, and
+    the ID of the last game included in the ratings, so that later games can be added without starting again."""
+
+    con.execute("ALTER TABLE players ADD COLUMN rating real;")
+    con.execute("CREATE TABLE rating_progress (last_game_id integer NOT NULL);")
+    con.execute("INSERT INTO rating_progress (last_game_id) VALUES (0);")
+
+
+def _add_query_columns(con: sql.Connection) -> None:
+    """Schema version 7. Rebuilds the games table with the ELOs stored as integers, so that they can be searched by
+    range, and the number of plies in each game stored alongside its moves. ELOs that are not numbers, such as "?"
+    from PGN files, become 0. Adds the indexes used by 'ChessDatabase.find_games', and a full text index of the
+    players' names if SQLite was built with FTS5."""
+
+    con.execute("""
+                CREATE TABLE games_new (
+                    id integer PRIMARY KEY,
+                    w_name text NOT NULL,
+                    w_elo integer NOT NULL,
+                    b_name text NOT NULL,
+                    b_elo integer NOT NULL,
+                    winner text NOT NULL,
+                    moves blob NOT NULL,
+                    plies integer NOT NULL);
+                """)
+    con.execute("""
+                INSERT INTO games_new
+                SELECT id, w_name, CAST(w_elo AS integer), b_name, CAST(b_elo AS integer), winner, moves,
+                       length(moves) / ?
+                FROM games;
+                """, (movecodec.BYTES_PER_MOVE,))
+    con.execute("DROP TABLE games;")
+    con.execute("ALTER TABLE games_new RENAME TO games;")
+
+    # Each index also holds the game's ID, so matching games are found in ID order for paging.
+    con.execute("CREATE INDEX games_by_w_elo ON games (w_elo);")
+    con.execute("CREATE INDEX games_by_b_elo ON games (b_elo);")
+    con.execute("CREATE INDEX games_by_winner ON games (winner);")
+    con.execute("CREATE INDEX games_by_plies ON games (plies);")
+
+    # Names are searched case-insensitively, so they are indexed ignoring case.
+    con.execute("CREATE INDEX players_by_name ON players (name COLLATE NOCASE);")
+
+    # Indexing the first one and two letters of each word as well makes searching for a short prefix quicker.
+    try:
+        con.execute("CREATE VIRTUAL TABLE player_names USING fts5 (name, content='players', content_rowid='id', "
+                    "prefix='1 2');")
+    except sql.OperationalError:
+        return  # This SQLite was built without FTS5, so names are searched without it.
+
+    # Players are never renamed or deleted, so new players are the only change the full text index needs.
+    con.execute("""
+                CREATE TRIGGER players_add_name AFTER INSERT ON players BEGIN
+                    INSERT INTO player_names (rowid, name) VALUES (new.id, new.name);
+                END;
+                """)
+    con.execute("INSERT INTO player_names (player_names) VALUES ('rebuild');")
+
+
+def _create_journal_compactions_table(con: sql.Connection) -> None:
+    """Schema version 8. Moves the records of which journals' games have been stored (see movejournal.py) out of
+    'import_progress', which is for PGN imports, into a table of their own."""
+
+    con.execute("CREATE TABLE journal_compactions (journal_id text PRIMARY KEY);")
+    con.execute("""
+                INSERT INTO journal_compactions (journal_id)
+                    SELECT substr(source, length('journal:') + 1) FROM import_progress WHERE source LIKE 'journal:%';
+                """)
+    con.execute("DELETE FROM import_progress WHERE source LIKE 'journal:%';")
+
+
+def _recount_self_games(con: sql.Connection) -> None:
+    """Schema version 9. Games a player played against themselves used to be added to their record once for each
+    side. The records of the players who have played one are counted again, adding each such game once."""
+
+    names: list[str] = [name for (name,) in con.execute("SELECT DISTINCT w_name FROM games WHERE w_name = b_name;")]
+    for name in names:
+        player_id: int = con.execute("SELECT id FROM players WHERE name=?;", (name,)).fetchone()[0]
+        con.execute("DELETE FROM player_stats WHERE player_id=?;", (player_id,))
+        con.execute("DELETE FROM player_games WHERE player_id=?;", (player_id,))
+
+        for game_id, w_name, b_name, winner in con.execute("SELECT id, w_name, b_name, winner FROM games "
+                                                           "WHERE w_name=? OR b_name=?;", (name, name)).fetchall():
+            if w_name == b_name:
+                _record_player_game(con, game_id, name, "White", "Stalemate", 1)
+            else:
+                _record_player_game(con, game_id, name, "White" if w_name == name else "Black", winner, 1)
+
+
+# Each function upgrades the database by one version. The version a database is at is stored in 'user_version'.
+_MIGRATIONS: list = [_create_games_table, _store_moves_as_blobs, _create_positions_table,
+                     _create_import_progress_table, _create_player_tables, _add_player_ratings, _add_query_columns,
+                     _create_journal_compactions_table, _recount_self_games]
+
+# The columns of a game, in the order they are returned. The games table has more columns, so it is not read with
+# "SELECT *".
+GAME_COLUMNS: str = "id, w_name, w_elo, b_name, b_elo, winner, moves"
+
+# Games searched for by a name that this many games or fewer were played under are looked up through the players'
+# games. Above this, it is quicker to check each game in turn until a page has been found.
+NAME_LOOKUP_LIMIT: int = 5000
+
+
+def _migrate(con: sql.Connection) -> None:
+    """Brings the database up to the latest schema version. Each upgrade is done in its own transaction, so an
+    interrupted upgrade leaves the database at the previous version."""
+
+    version: int = con.execute("PRAGMA user_version;").fetchone()[0]
+    for new_version in range(version + 1, len(_MIGRATIONS) + 1):
+        con.execute("BEGIN;")
+        try:
+            _MIGRATIONS[new_version - 1](con)
+            con.execute(f"PRAGMA user_version = {new_version};")
+            con.commit()
+        except BaseException:
+            con.rollback()
+            raise
+
+
+def get_connection(path: str = DEFAULT_PATH) -> sql.Connection:
+    """Returns the open connection to the database at 'path', connecting to it if this is the first use."""
+
+    key: tuple[int, str] = (os.getpid(), os.path.abspath(path))
+    if key not in _connections:
+        con: sql.Connection = sql.connect(path)
+
+        # Write-ahead logging lets readers carry on while a game is being written, and only needs the log synced
+        # at checkpoints rather than on every commit.
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.execute("PRAGMA synchronous=NORMAL;")
+
+        _migrate(con)
+        _connections[key] = con
+
+    return _connections[key]
+
+
+def close_all() -> None:
+    """Closes every open connection made by this process. SQLite is first asked to update the statistics it uses to
+    choose between indexes, if they have gone out of date."""
+
+    for key in [key for key in _connections if key[0] == os.getpid()]:
+        con: sql.Connection = _connections.pop(key)
+        con.execute("PRAGMA optimize;")
+        con.close()
+
+
+atexit.register(close_all)
+
+
+def elo_value(elo) -> int:
+    """Returns an ELO as it is stored: as an integer, with 0 for ELOs that are not numbers."""
+
+    elo = str(elo).strip()
+    return int(elo) if elo.isdigit() else 0
+
+
+class GameFilter:
+    """The games to find with 'ChessDatabase.find_games'. Each filter left as None matches every game.
+    'name' matches games where either player's name, or a word in it, starts with it, ignoring case. 'min_elo' and
+    'max_elo' match games where both players' ELOs are in the range, and 'min_plies' and 'max_plies' match the
+    number of moves made by either side. 'winner' is "White", "Black" or "Stalemate"."""
+
+    def __init__(self, name: str | None = None, min_elo: int | None = None, max_elo: int | None = None,
+                 winner: str | None = None, min_plies: int | None = None, max_plies: int | None = None):
+        self.name: str | None = name
+        self.min_elo: int | None = min_elo
+        self.max_elo: int | None = max_elo
+        self.winner: str | None = winner
+        self.min_plies: int | None = min_plies
+        self.max_plies: int | None = max_plies
 
 
 class ChessDatabase:
-    def __init__(self):
-        self.con = sql.connect('games.db')
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.con = get_connection(path)
         self.cur = self.con.cursor()
 
-        create_table = """
-                        CREATE TABLE IF NOT EXISTS games (
-                            id integer PRIMARY KEY,
-                            w_name text NOT NULL,
-                            w_elo text NOT NULL,
-                            b_name text NOT NULL,
-                            b_elo text NOT NULL,
-                            winner text NOT NULL,
-                            moves text NOT NULL);
-                       """
+    def get_entries(self):
+        return self.query(f"SELECT {GAME_COLUMNS} FROM games;")
 
-        self.query(create_table)
+    def get_page(self, after_id=0, limit=50):
+        """Returns up to 'limit' games with an ID greater than 'after_id', in ID order. Rather than the full list of
+        moves, only the encoded first two moves are returned, so each game is
+        (id, w_name, w_elo, b_name, b_elo, winner, first moves).
+        Passing the ID of the last game returned as 'after_id' fetches the next page, using the primary key index
+        instead of skipping over earlier rows."""
 
-    def get_entries(self):
-        return self.query("SELECT * FROM games;")
+        return self.find_games(GameFilter(), after_id, limit)
 
-    def add_entry(self, w_name, w_elo, b_name, b_elo, winner, moves):
-        if not self.get_entries():
-            game_id = 1
-        else:
-            game_id = self.query("SELECT max(id) FROM games;")[0][0] + 1
-        command = f"""
-                    INSERT INTO games
-                    (id, w_name, w_elo, b_name, b_elo, winner, moves) 
-                    VALUES 
-                    ({game_id}, '{w_name}', '{w_elo}', '{b_name}', '{b_elo}', '{winner}', '{moves}');
-                  """
+    def find_games(self, game_filter, after_id=0, limit=50):
+        """Returns up to 'limit' of the games matching 'game_filter' (a GameFilter) with an ID greater than
+        'after_id', in ID order, in the same format as 'get_page'. Passing the ID of the last game returned as
+        'after_id' fetches the next page.
+        Each filter can be answered from an index, and SQLite uses whichever one narrows the games down most."""
+
+        common_names = ""
+        common_names_params = []
+        conditions = ["id > ?"]
+        params = [after_id]
+
+        if game_filter.name:
+            players, players_params = self._matching_players(game_filter.name)
+
+            # A name shared by few games is looked up in the games each player took part in. A common one is checked
+            # against each game in ID order instead, which finds a page of them without reading them all.
+            games_played = self.query(f"SELECT total(games) FROM player_stats WHERE player_id IN ({players});",
+                                      players_params)[0][0]
+            if games_played <= NAME_LOOKUP_LIMIT:
+                conditions.append(f"id IN (SELECT game_id FROM player_games WHERE player_id IN ({players}))")
+                params += players_params
+            else:
+                common_names = f"WITH names AS MATERIALIZED (SELECT name FROM players WHERE id IN ({players}))"
+                common_names_params = players_params
+                conditions.append("(w_name IN names OR b_name IN names)")
+
+        if game_filter.min_elo is not None:
+            conditions.append("w_elo >= ? AND b_elo >= ?")
+            params += [game_filter.min_elo, game_filter.min_elo]
+        if game_filter.max_elo is not None:
+            conditions.append("w_elo <= ? AND b_elo <= ?")
+            params += [game_filter.max_elo, game_filter.max_elo]
+        if game_filter.winner is not None:
+            conditions.append("winner = ?")
+            params.append(game_filter.winner)
+        if game_filter.min_plies is not None:
+            conditions.append("plies >= ?")
+            params.append(game_filter.min_plies)
+        if game_filter.max_plies is not None:
+            conditions.append("plies <= ?")
+            params.append(game_filter.max_plies)
+
+        return self.query(f"""
+                          {common_names}
+                          SELECT id, w_name, w_elo, b_name, b_elo, winner,
+                                 substr(moves, 1, 2 * ?)
+                          FROM games
+                          WHERE {" AND ".join(conditions)}
+                          ORDER BY id
+                          LIMIT ?;
+                          """, common_names_params + [movecodec.BYTES_PER_MOVE] + params + [limit])
+
+    def _matching_players(self, name):
+        """Returns a query for the IDs of the players whose name, or a word in it, starts with 'name', ignoring case,
+        and its parameters."""
+
+        # Prefixes of the whole name are found with the NOCASE index on the players' names. '%' and '_' in the name
+        # are escaped so that they are matched literally.
+        prefix = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        players = "SELECT id FROM players WHERE name LIKE ? ESCAPE '\\'"
+
+        # Words later in the name are found with the full text index. It only holds words, so names containing
+        # anything else, or databases without the index, are searched by checking every player's name.
+        if not name.replace(" ", "").isalnum() or \
+                not self.query("SELECT 1 FROM sqlite_master WHERE name='player_names';"):
+            return players + " OR name LIKE ? ESCAPE '\\'", [prefix, "% " + prefix]
+        return (players + " UNION SELECT rowid FROM player_names WHERE player_names MATCH ?",
+                [prefix, '"' + name + '"*'])
+
+    def get_entry(self, game_id):
+        """Returns the game with the given ID, or None if there isn't one."""
+
+        games = self.query(f"SELECT {GAME_COLUMNS} FROM games WHERE id=?;", (game_id,))
+        if not games:
+            return None
+        return games[0]
+
+    def add_entry(self, w_name, w_elo, b_name, b_elo, winner, moves, position_keys=None):
+        """Adds a game and returns its ID. 'moves' must be encoded with 'movecodec.encode_moves'.
+        'position_keys' are the game's (ply, key) pairs from 'positionindex.game_position_keys', which can be passed
+        if they have already been worked out, for example by another process.
+        The change is not committed until 'save' is called."""
+
+        self.cur.execute("""
+                         INSERT INTO games
+                         (w_name, w_elo, b_name, b_elo, winner, moves, plies)
+                         VALUES
+                         (?, ?, ?, ?, ?, ?, ?);
+                         """, (w_name, elo_value(w_elo), b_name, elo_value(b_elo), winner, moves,
+                               movecodec.count_moves(moves)))
+        game_id = self.cur.lastrowid
+
+        _index_positions(self.con, game_id, moves, position_keys)
+        _record_player_games(self.con, game_id, w_name, b_name, winner)
+
+        return game_id
+
+    def add_entries(self, games):
+        """Adds many games in a single transaction, which is committed once they have all been inserted, along with
+        any other uncommitted changes. Each game is a tuple of the arguments to 'add_entry'.
+        Returns the IDs of the new games."""
+
+        with self.con:
+            return [self.add_entry(*game) for game in games]
 
-        self.query(command)
+    def iter_entries(self, batch_size=1000, after_id=0):
+        """Yields every game with an ID above 'after_id' in ID order, fetching 'batch_size' rows at a time so that the
+        whole table is never held in memory."""
+
+        cur = self.con.cursor()
+        cur.execute(f"SELECT {GAME_COLUMNS} FROM games WHERE id > ? ORDER BY id;", (after_id,))
+        while games := cur.fetchmany(batch_size):
+            yield from games
+        cur.close()
+
+    def get_import_progress(self, source):
+        """Returns (byte offset, number of games) for how far an import from the file 'source' has got."""
+
+        progress = self.query("SELECT offset, games FROM import_progress WHERE source=?;", (source,))
+        if not progress:
+            return 0, 0
+        return progress[0]
+
+    def set_import_progress(self, source, offset, games):
+        """Records how far an import from the file 'source' has got. Not committed until 'save' is called, so it can
+        be committed in the same transaction as the games it covers."""
+
+        self.query("INSERT OR REPLACE INTO import_progress (source, offset, games) VALUES (?, ?, ?);",
+                   (source, offset, games))
+
+    def is_journal_stored(self, journal_id):
+        """Returns whether the game from the journal with the ID 'journal_id' has been stored."""
+
+        return bool(self.query("SELECT 1 FROM journal_compactions WHERE journal_id=?;", (journal_id,)))
+
+    def set_journal_stored(self, journal_id, is_stored=True):
+        """Records whether the game from the journal with the ID 'journal_id' has been stored. Not committed until
+        'save' is called, so it can be committed in the same transaction as the game."""
+
+        if is_stored:
+            self.query("INSERT OR IGNORE INTO journal_compactions (journal_id) VALUES (?);", (journal_id,))
+        else:
+            self.query("DELETE FROM journal_compactions WHERE journal_id=?;", (journal_id,))
 
     def del_entry(self, game_id):
-        self.query(f"DELETE FROM games WHERE id={game_id}")
+        game = self.get_entry(game_id)
+        if game is None:
+            return
+
+        # Works out which positions the game reached, so that its rows can be removed using the positions index.
+        self.cur.executemany("DELETE FROM positions WHERE key=? AND game_id=? AND ply=?;",
+                             ((key, game_id, ply)
+                              for ply, key in positionindex.game_position_keys(movecodec.decode_moves(game[6]))))
+        _record_player_games(self.con, game_id, game[1], game[3], game[5], change=-1)
+        self.query("DELETE FROM games WHERE id=?;", (game_id,))
+
+    def get_leaderboard(self, limit=50):
+        """Returns the 'limit' players with the highest score, as (name, games, wins, draws, losses, score, rating)
+        rows. Read in order from the score index, so it does not grow slower as more games are added."""
+
+        return self.query("""
+                          SELECT name, games, wins, draws, losses, score, rating
+                          FROM player_stats JOIN players ON players.id = player_stats.player_id
+                          WHERE games > 0
+                          ORDER BY score DESC, games
+                          LIMIT ?;
+                          """, (limit,))
+
+    def get_player_stats(self, name):
+        """Returns (games, wins, draws, losses, score) for the player called 'name', or None if they have never
+        played."""
+
+        stats = self.query("""
+                           SELECT games, wins, draws, losses, score
+                           FROM player_stats JOIN players ON players.id = player_stats.player_id
+                           WHERE name=?;
+                           """, (name,))
+        return stats[0] if stats else None
+
+    def get_player_games(self, name, before_id=None, limit=50):
+        """Returns up to 'limit' of the games the player called 'name' took part in, newest first, as
+        (game ID, colour, opponent, winner) rows. Pass the last ID of the previous page as 'before_id' to get the
+        next page."""
+
+        return self.query("""
+                          SELECT games.id, player_games.colour,
+                                 CASE player_games.colour WHEN 'White' THEN games.b_name ELSE games.w_name END,
+                                 games.winner
+                          FROM player_games JOIN games ON games.id = player_games.game_id
+                          WHERE player_games.player_id = (SELECT id FROM players WHERE name=?)
+                                AND player_games.game_id < ?
+                          ORDER BY player_games.game_id DESC
+                          LIMIT ?;
+                          """, (name, before_id if before_id is not None else 1 << 62, limit))
+
+    def iter_rating_games(self, after_id=0, batch_size=10000):
+        """Yields (game ID, white's player ID, white's ELO, black's player ID, black's ELO, winner) for every game
+        with an ID above 'after_id', in the order they were played."""
+
+        cur = self.con.cursor()
+        cur.execute("""
+                    SELECT games.id, white.id, games.w_elo, black.id, games.b_elo, games.winner
+                    FROM games
+                    JOIN players AS white ON white.name = games.w_name
+                    JOIN players AS black ON black.name = games.b_name
+                    WHERE games.id > ?
+                    ORDER BY games.id;
+                    """, (after_id,))
+        while games := cur.fetchmany(batch_size):
+            yield from games
+        cur.close()
+
+    def get_ratings(self):
+        """Returns (player ID, rating) for every player that has a rating."""
+
+        return self.query("SELECT id, rating FROM players WHERE rating IS NOT NULL;")
+
+    def get_rating_progress(self):
+        """Returns the ID of the last game included in the ratings."""
+
+        return self.query("SELECT last_game_id FROM rating_progress;")[0][0]
+
+    def set_ratings(self, ratings, last_game_id):
+        """Stores (player ID, rating) pairs, and the ID of the last game they include. Not committed until 'save' is
+        called, so the ratings and the progress are committed together."""
+
+        self.cur.executemany("UPDATE players SET rating=? WHERE id=?;",
+                             ((rating, player_id) for player_id, rating in ratings))
+        self.query("UPDATE rating_progress SET last_game_id=?;", (last_game_id,))
+
+    def clear_ratings(self):
+        """Removes every rating, so that they can be worked out again from the first game. Not committed until 'save'
+        is called."""
+
+        self.query("UPDATE players SET rating=NULL;")
+        self.query("UPDATE rating_progress SET last_game_id=0;")
+
+    def find_position(self, position, limit=1000):
+        """Returns up to 'limit' (game ID, ply) pairs for games that reached 'position', which can be a
+        'chess.Board' or a FEN string. Raises ValueError if the FEN is not valid."""
+
+        key = positionindex.position_key(positionindex.to_board(position))
+        return self.query("SELECT game_id, ply FROM positions WHERE key=? ORDER BY game_id, ply LIMIT ?;",
+                          (key, limit))
+
+    def index_all_positions(self):
+        """Adds any games missing from the positions table to it, for example games written by an older version.
+        Every indexed game has a row for the starting position at ply 0, so that row is used to find the rest."""
+
+        with self.con:
+            missing_games = self.query("""
+                                       SELECT id, moves FROM games
+                                       WHERE NOT EXISTS (SELECT 1 FROM positions
+                                                         WHERE key=? AND game_id=games.id AND ply=0);
+                                       """, (positionindex.STARTING_KEY,))
+            for game_id, moves in missing_games:
+                _index_positions(self.con, game_id, moves)
+
+        return len(missing_games)
 
-    def query(self, command):
-        self.cur.execute(command)
+    def query(self, command, params=()):
+        self.cur.execute(command, params)
         return self.cur.fetchall()
 
     def save(self):
         self.con.commit()
 
     def close(self):
-        self.con.close()
+        """Closes this object's cursor. The connection itself stays open, to be reused by the next ChessDatabase."""
+        self.cur.close()
 
 
 if __name__ == "__main__":
-    db = ChessDatabase()
-    print(db.get_entries())
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        # Connecting brings the database up to date. VACUUM then shrinks the file to fit the smaller tables.
+        db = ChessDatabase(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PATH)
+        db.query("VACUUM;")
+        print("Database is at schema version", db.query("PRAGMA user_version;")[0][0])
+    elif len(sys.argv) > 1 and sys.argv[1] == "index-positions":
+        # Backfills the position index for any games that are missing from it.
+        db = ChessDatabase(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PATH)
+        print("Indexed", db.index_all_positions(), "games")
+    else:
+        db = ChessDatabase()
+        print(db.get_entries())
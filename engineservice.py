@@ -0,0 +1,122 @@
+"""This file is responsible for running the search engine in a separate process, so that the game window stays
+responsive while the computer is thinking."""
+
+import multiprocessing as mp
+import os
+import queue
+
+import chess
+
+from openingbook import OpeningBook
+from searchengine import SearchEngine, SearchResult
+
+# Message types sent back from the worker process.
+INFO: str = "info"  # A depth has been completed. The result is the best move found so far.
+DONE: str = "done"  # The search has finished. The result is the move to play.
+
+
+def _run_worker(requests: mp.Queue, results: mp.Queue, current_search: mp.Value, table_size: int,
+                book_path: str | None) -> None:
+    """The worker process. Searches each position it is sent, reporting every completed depth, until it is sent None.
+    A search is abandoned as soon as 'current_search' no longer holds its ID. Positions in the opening book are
+    answered from the book without searching."""
+
+    engine: SearchEngine = SearchEngine(table_size)
+    book: OpeningBook | None = OpeningBook(book_path) if book_path is not None else None
+    while True:
+        request: tuple | None = requests.get()
+        if request is None:
+            return
+
+        search_id, board, time_limit = request
+        if current_search.value != search_id:
+            continue  # Cancelled before it started.
+
+        book_move: chess.Move | None = book.choose_move(board) if book is not None else None
+        if book_move is not None:
+            results.put((DONE, search_id, SearchResult(book_move, 0, 0, 0, 0.0)))
+            continue
+
+        def should_stop() -> bool:
+            return current_search.value != search_id
+
+        def send_info(result: SearchResult) -> None:
+            results.put((INFO, search_id, result))
+
+        result: SearchResult = engine.search(board, time_limit, info_callback=send_info, should_stop=should_stop)
+        results.put((DONE, search_id, result))
+
+
+class EngineService:
+    """Runs searches in a worker process. Searches are started with 'start_search', and their progress is collected
+    without blocking by calling 'poll' every frame."""
+
+    def __init__(self, table_size: int = 1 << 18, book_path: str | None = None):
+        """'book_path' is the opening book to play from before searching. It is not used if the file does not exist."""
+
+        # A separate interpreter is started rather than forking, as the parent process has pygame running.
+        context = mp.get_context("spawn")
+        self.requests: mp.Queue = context.Queue()
+        self.results: mp.Queue = context.Queue()
+
+        # The ID of the search the worker should be running. Changing it cancels the search in progress.
+        self.current_search: mp.Value = context.Value("i", 0)
+        self.is_searching: bool = False
+
+        if book_path is not None and not os.path.exists(book_path):
+            book_path = None
+
+        self.process = context.Process(target=_run_worker,
+                                       args=(self.requests, self.results, self.current_search, table_size, book_path),
+                                       daemon=True)
+        self.process.start()
+
+    def start_search(self, board: chess.Board, time_limit: float) -> int:
+        """Starts searching 'board' for up to 'time_limit' seconds, cancelling any search already running.
+        Returns the ID of the new search."""
+
+        with self.current_search.get_lock():
+            self.current_search.value += 1
+            search_id: int = self.current_search.value
+
+        self.requests.put((search_id, board.copy(), time_limit))
+        self.is_searching = True
+        return search_id
+
+    def cancel(self) -> None:
+        """Stops the search in progress. Any results it has already sent are ignored."""
+
+        if self.is_searching:
+            with self.current_search.get_lock():
+                self.current_search.value += 1
+            self.is_searching = False
+
+    def poll(self) -> list[tuple[str, SearchResult]]:
+        """Returns the (INFO or DONE, result) messages the current search has sent since the last poll, without
+        waiting for any more."""
+
+        messages: list[tuple[str, SearchResult]] = []
+        while True:
+            try:
+                kind, search_id, result = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            # Ignores messages from searches that have since been cancelled or replaced.
+            if search_id != self.current_search.value or not self.is_searching:
+                continue
+
+            messages.append((kind, result))
+            if kind == DONE:
+                self.is_searching = False
+
+        return messages
+
+    def close(self) -> None:
+        """Stops the worker process."""
+
+        self.cancel()
+        self.requests.put(None)
+        self.process.join(timeout=1.0)
+        if self.process.is_alive():
+            self.process.terminate()
@@ -0,0 +1,109 @@
+"""This file is responsible for timing each stage of every frame, to find out where the time goes when the board
+stutters. When profiling is turned off, timing a stage does nothing."""
+
+import collections
+import contextlib
+import csv
+import json
+import time
+
+# The stages of a frame, in the order they happen.
+STAGES: list[str] = ["event_handler", "termination", "update_pieces", "computer", "network", "draw", "display"]
+
+# Returned when profiling is turned off, so that 'with profiler.stage(...)' costs almost nothing.
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class _StageTimer:
+    """Adds the time spent inside a 'with' block to its stage's total for the current frame. When stages are nested,
+    such as a move's 'update_pieces' inside 'event_handler', the time is only counted towards the inner stage."""
+
+    def __init__(self, profiler, stage: str):
+        self.profiler = profiler
+        self.stage: str = stage
+        self.start_time: float = 0.0
+
+    def __enter__(self):
+        now: float = time.perf_counter()
+        active_stages: list[_StageTimer] = self.profiler.active_stages
+        if active_stages:
+            # Pauses the outer stage.
+            outer_stage: _StageTimer = active_stages[-1]
+            self.profiler.current_frame[outer_stage.stage] += now - outer_stage.start_time
+
+        active_stages.append(self)
+        self.start_time = now
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        now: float = time.perf_counter()
+        self.profiler.current_frame[self.stage] += now - self.start_time
+
+        active_stages: list[_StageTimer] = self.profiler.active_stages
+        active_stages.pop()
+        if active_stages:
+            active_stages[-1].start_time = now  # Resumes the outer stage.
+
+
+class FrameProfiler:
+    """Records how long each stage took in each of the last 'history' frames, in a ring buffer."""
+
+    def __init__(self, enabled: bool = False, history: int = 1000):
+        self.enabled: bool = enabled
+        self.frames: collections.deque = collections.deque(maxlen=history)  # (frame seconds, sprite count, stages)
+
+        self.current_frame: dict[str, float] = dict.fromkeys(STAGES, 0.0)
+        self.frame_start: float = time.perf_counter()
+        self.active_stages: list[_StageTimer] = []
+        self._timers: dict[str, _StageTimer] = {stage: _StageTimer(self, stage) for stage in STAGES}
+
+    def stage(self, stage: str):
+        """Returns a context manager that times the code inside it as part of 'stage'."""
+
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._timers[stage]
+
+    def start_frame(self) -> None:
+        if self.enabled:
+            self.current_frame = dict.fromkeys(STAGES, 0.0)
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self, sprite_count: int) -> None:
+        if self.enabled:
+            self.frames.append((time.perf_counter() - self.frame_start, sprite_count, self.current_frame))
+
+    def percentile(self, fraction: float) -> float:
+        """Returns the frame time, in seconds, that 'fraction' of the recorded frames were quicker than."""
+
+        if not self.frames:
+            return 0.0
+        frame_times: list[float] = sorted(frame[0] for frame in self.frames)
+        return frame_times[min(len(frame_times) - 1, int(len(frame_times) * fraction))]
+
+    def summary(self) -> str:
+        """Returns one line describing the recent frames, for the on-screen overlay."""
+
+        if not self.frames:
+            return "No frames recorded"
+        last_frame_time, sprite_count, _ = self.frames[-1]
+        return f"frame {last_frame_time * 1000:.1f}ms  p95 {self.percentile(0.95) * 1000:.1f}ms  " \
+               f"p99 {self.percentile(0.99) * 1000:.1f}ms  sprites {sprite_count}"
+
+    def dump(self, path: str) -> None:
+        """Writes the recorded frames to 'path', as CSV if it ends in '.csv' and JSON otherwise. Times are in
+        milliseconds."""
+
+        rows: list[dict] = [{"frame_ms": frame_time * 1000, "sprites": sprite_count,
+                             **{f"{stage}_ms": seconds * 1000 for stage, seconds in stages.items()}}
+                            for frame_time, sprite_count, stages in self.frames]
+
+        with open(path, "w", newline="") as output_file:
+            if path.endswith(".csv"):
+                writer: csv.DictWriter = csv.DictWriter(output_file,
+                                                        ["frame_ms", "sprites"] + [f"{stage}_ms" for stage in STAGES])
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                json.dump({"p95_ms": self.percentile(0.95) * 1000, "p99_ms": self.percentile(0.99) * 1000,
+                           "frames": rows}, output_file, indent=1)
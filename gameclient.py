@@ -0,0 +1,85 @@
+"""This file is responsible for connecting the game window to a game server (see gameserver.py), so that it can play
+against someone on another window. The messages sent are described in gameprotocol.py."""
+
+import select
+import socket
+
+import chess
+
+import gameprotocol
+
+
+class GameClient:
+    """A connection to a game server. Messages from the server are collected without blocking by calling 'poll'
+    every frame."""
+
+    def __init__(self, name: str, elo: str, host: str = gameprotocol.DEFAULT_HOST,
+                 port: int = gameprotocol.DEFAULT_PORT, game_id: int | None = None):
+        """Connects to the server and asks to join the game 'game_id', or any game waiting for a second player if
+        it is None. Raises OSError if the server cannot be reached."""
+
+        self.sock: socket.socket = socket.create_connection((host, port), timeout=5)
+        self.sock.settimeout(None)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # Moves are sent as soon as they are made.
+        self.received: bytes = b""  # Data received that does not yet make up a whole message.
+        self.is_connected: bool = True
+
+        self.game_id: int | None = None
+        self.colour: chess.Color | None = None  # The side this window plays, once the game has been joined.
+        self.is_started: bool = False  # Set once both players have joined.
+
+        message: dict = {"type": "play", "name": name, "elo": elo}
+        if game_id is not None:
+            message["game"] = game_id
+        self.send(message)
+
+    def send(self, message: dict) -> None:
+        try:
+            self.sock.sendall(gameprotocol.encode_message(message))
+        except OSError:
+            self.is_connected = False
+
+    def send_move(self, ply: int, move: chess.Move) -> None:
+        """Sends a move made on this window. 'ply' is the number of moves made before it."""
+
+        self.send({"type": "move", "ply": ply, "move": move.uci()})
+
+    def poll(self) -> list[dict]:
+        """Returns the messages that have arrived since the last poll, without waiting for more. Once the connection
+        has been lost, or the server has sent something that is not a message, a {"type": "closed"} message is
+        returned."""
+
+        messages: list[dict] = []
+        while self.is_connected and select.select([self.sock], [], [], 0)[0]:
+            try:
+                data: bytes = self.sock.recv(1 << 16)
+            except OSError:
+                data = b""
+            if not data:
+                self.is_connected = False
+                messages.append({"type": "closed"})
+                break
+
+            *lines, self.received = (self.received + data).split(b"\n")
+            for line in lines:
+                try:
+                    message: dict = gameprotocol.decode_message(line)
+                except ValueError:
+                    # The server is not sending messages, so it is disconnected from, as if the connection was lost.
+                    self.close()
+                    messages.append({"type": "closed"})
+                    break
+                if message["type"] == "joined":
+                    self.game_id = message["game"]
+                    self.colour = message["colour"] == "White"
+                elif message["type"] == "start":
+                    self.is_started = True
+                messages.append(message)
+
+        return messages
+
+    def close(self) -> None:
+        """Disconnects from the server. An unfinished game is abandoned."""
+
+        self.is_connected = False
+        self.sock.close()
@@ -0,0 +1,47 @@
+"""This file is responsible for the messages sent between the game server (gameserver.py) and the players connected to
+it (gameclient.py). Each message is a JSON object on a line of its own, and moves are sent in UCI format ("e2e4").
+
+Sent by players:
+    {"type": "play", "name": str, "elo": str, "game": int}
+        Joins the game with the ID 'game' if it is waiting for a second player, or the game that has been waiting
+        longest if 'game' is left out. If no game is waiting, a new one is started.
+    {"type": "move", "ply": int, "move": str}
+        Makes a move. 'ply' is the number of moves made before it, so that a move sent after the game has moved on
+        is refused rather than played in the wrong position.
+
+Sent by the server:
+    {"type": "joined", "game": int, "colour": "White" | "Black"}
+        The player has joined a game, and plays 'colour'.
+    {"type": "start", "w_name": str, "w_elo": str, "b_name": str, "b_elo": str}
+        Both players have joined, so white can move.
+    {"type": "move", "ply": int, "move": str}
+        A move has been made. 'ply' is the number of moves made, including this one. Sent to both players, so the
+        player who made the move knows it was accepted.
+    {"type": "refused", "reason": str, "moves": [str]}
+        The player's move was not made. 'moves' is every move made so far, to put the player's board right.
+    {"type": "end", "winner": "White" | "Black" | "Stalemate"}
+        The game is over, and has been stored.
+    {"type": "left"}
+        The other player has disconnected, so the game has been abandoned."""
+
+import json
+
+DEFAULT_HOST: str = "127.0.0.1"
+DEFAULT_PORT: int = 8765
+
+COLOURS: tuple[str, str] = ("White", "Black")
+
+
+def encode_message(message: dict) -> bytes:
+    """Returns 'message' as a line to send."""
+
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def decode_message(line: bytes) -> dict:
+    """Returns the message sent as 'line'. Raises ValueError if it is not a message."""
+
+    message = json.loads(line)
+    if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+        raise ValueError(f"Not a message: {line!r}")
+    return message
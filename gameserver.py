@@ -0,0 +1,308 @@
+"""This file is responsible for hosting many games at once for players connecting over TCP, with the game window as a
+thin client (see gameclient.py). The messages sent are described in gameprotocol.py.
+
+Each game is held as its encoded moves and one packed board, rather than as a chess.Board and sprites, so thousands of
+games can wait for their next move in one process. Moves are checked on a single board shared by every game. Finished
+games are written to the database in batches, on a separate thread so that writing never holds up the games."""
+
+import argparse
+import asyncio
+import concurrent.futures
+
+import chess
+
+import dbmanager
+import gameprotocol
+import movecodec
+from gamestate import GameState
+from replay import pack_board, unpack_board
+
+# Finished games are written once this many are waiting to be written, or once the first of them has waited this
+# many seconds, whichever comes first.
+WRITE_BATCH_SIZE: int = 100
+WRITE_INTERVAL: float = 1.0
+
+# A player is disconnected if this many bytes are waiting to be sent to them, as they have stopped reading.
+MAX_WRITE_BUFFER: int = 1 << 16
+
+STARTING_POSITION: bytes = pack_board(chess.Board())
+
+
+def raise_open_file_limit() -> None:
+    """Lets the process have as many connections open as the system allows, as each player has their own."""
+
+    try:
+        import resource
+    except ImportError:
+        return  # Not available on Windows, which has no such limit.
+
+    soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard_limit, hard_limit))
+    except (ValueError, OSError):
+        pass  # The limit stays as it was.
+
+
+class GameSession:
+    """A game being played on the server. The position is kept as the packed board after the last capture or pawn
+    move, as no earlier position can be repeated, along with every move of the game."""
+
+    __slots__ = ("game_id", "players", "details", "moves", "base", "base_ply")
+
+    def __init__(self, game_id: int):
+        self.game_id: int = game_id
+        self.players: list[asyncio.StreamWriter | None] = [None, None]  # White's and black's connections.
+        self.details: list[str] = ["", "", "", ""]  # White's name and ELO, then black's.
+        self.moves: bytes = b""  # Encoded with movecodec.
+        self.base: bytes = STARTING_POSITION  # Packed with 'replay.pack_board'.
+        self.base_ply: int = 0  # The number of moves made before 'base'.
+
+    @property
+    def ply(self) -> int:
+        return movecodec.count_moves(self.moves)
+
+    def load(self, board: chess.Board) -> None:
+        """Sets 'board' to the current position. The moves since 'base' are pushed onto it, so that repetitions can
+        be spotted."""
+
+        unpack_board(self.base, board)
+        for move in movecodec.decode_moves(self.moves[self.base_ply * movecodec.BYTES_PER_MOVE:]):
+            board.push(move)
+
+    def make_move(self, board: chess.Board, move: chess.Move) -> None:
+        """Makes a legal move on 'board', which must have been loaded with 'load', and records it."""
+
+        is_zeroing: bool = board.is_zeroing(move)
+        board.push(move)
+        self.moves += movecodec.encode_moves([move])
+
+        if is_zeroing:
+            self.base = pack_board(board)
+            self.base_ply = self.ply
+
+
+class GameServer:
+    """Pairs up the players that connect, checks and passes on their moves, and stores each game once it is over."""
+
+    def __init__(self, db_path: str = dbmanager.DEFAULT_PATH):
+        self.db_path: str = db_path
+
+        self.next_game_id: int = 1
+        self.waiting: dict[int, GameSession] = {}  # Games with one player, in the order they were started.
+        self.board: chess.Board = chess.Board()  # Every game's moves are checked on this board.
+
+        # Games that have finished, as the arguments to 'ChessDatabase.add_entry', until they are written.
+        self.finished: list[tuple] = []
+        self.batch_ready: asyncio.Event = asyncio.Event()
+        self.write_task: asyncio.Task | None = None
+        # The database is only used from this thread, as its connection belongs to the thread that opened it.
+        self.write_executor: concurrent.futures.ThreadPoolExecutor = concurrent.futures.ThreadPoolExecutor(1)
+        self.games_written: int = 0
+
+    async def handle_player(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Runs for as long as a player is connected, handling each message they send."""
+
+        session: GameSession | None = None
+        colour: int = 0  # The player's index in 'session.players'.
+        try:
+            while line := await reader.readline():
+                try:
+                    message: dict = gameprotocol.decode_message(line)
+                except ValueError:
+                    break  # The player is not sending messages, so they are disconnected.
+
+                if message["type"] == "play" and session is None:
+                    session, colour = self.join(writer, message)
+                elif message["type"] == "move" and session is not None:
+                    self.receive_move(session, colour, message)
+        except (ConnectionError, ValueError):
+            pass  # The connection was lost, or the player sent a line that was too long.
+        finally:
+            if session is not None:
+                self.leave(session, colour)
+            writer.close()
+
+    def join(self, writer: asyncio.StreamWriter, message: dict) -> tuple[GameSession, int]:
+        """Adds a player to the game they asked for, or to the game that has waited longest for a second player,
+        or to a new game if none are waiting. Returns the game and the player's index in its players."""
+
+        requested_id = message.get("game")
+        if isinstance(requested_id, int) and requested_id in self.waiting:
+            session: GameSession = self.waiting.pop(requested_id)
+        elif requested_id is None and self.waiting:
+            session = self.waiting.pop(next(iter(self.waiting)))
+        else:
+            session = GameSession(self.next_game_id)
+            self.next_game_id += 1
+            self.waiting[session.game_id] = session
+
+        # The player who started the game plays white.
+        colour: int = 0 if session.players[0] is None else 1
+        session.players[colour] = writer
+        session.details[2 * colour] = str(message.get("name", "?"))[:20]
+        session.details[2 * colour + 1] = str(message.get("elo", "0"))[:4]
+
+        self.send(writer, {"type": "joined", "game": session.game_id, "colour": gameprotocol.COLOURS[colour]})
+        if colour == 1:
+            w_name, w_elo, b_name, b_elo = session.details
+            self.broadcast(session, {"type": "start", "w_name": w_name, "w_elo": w_elo,
+                                     "b_name": b_name, "b_elo": b_elo})
+
+        return session, colour
+
+    def receive_move(self, session: GameSession, colour: int, message: dict) -> None:
+        """Makes the move a player has sent, if it is legal and their turn, and passes it on to both players."""
+
+        if session.players[colour] is None:
+            return  # The game has finished, and the player is being disconnected.
+        if session.players[0] is None:
+            return  # White has left, so the game has been abandoned, and black is being disconnected.
+
+        try:
+            move: chess.Move | None = chess.Move.from_uci(message["move"])
+        except (KeyError, TypeError, ValueError):
+            move = None
+
+        session.load(self.board)
+
+        reason: str | None = None
+        if session.players[1] is None:
+            reason = "The game has not started."
+        elif message.get("ply") != session.ply:
+            reason = "The game has moved on."
+        elif self.board.turn != (colour == 0):
+            reason = "It is not your turn."
+        elif move is None or not self.board.is_legal(move):
+            reason = "That move is not legal."
+
+        if reason is not None:
+            self.send(session.players[colour], {"type": "refused", "reason": reason,
+                                                "moves": [move.uci() for move in movecodec.decode_moves(session.moves)]})
+            return
+
+        session.make_move(self.board, move)
+        self.broadcast(session, {"type": "move", "ply": session.ply, "move": move.uci()})
+
+        game_state: GameState = GameState(self.board)
+        if game_state.is_over:
+            self.finish(session, game_state.winner)
+
+    def leave(self, session: GameSession, colour: int) -> None:
+        """Removes a player who has disconnected. A game that has not finished is abandoned, and not stored."""
+
+        session.players[colour] = None
+        self.waiting.pop(session.game_id, None)
+
+        other_player: asyncio.StreamWriter | None = session.players[1 - colour]
+        if other_player is not None:
+            self.send(other_player, {"type": "left"})
+            other_player.close()  # The other player's connection is closed, so their handler leaves too.
+
+    def finish(self, session: GameSession, winner: str) -> None:
+        """Queues a finished game to be stored, and disconnects its players."""
+
+        self.finished.append((*session.details, winner, session.moves))
+        if len(self.finished) >= WRITE_BATCH_SIZE:
+            self.batch_ready.set()
+        if self.write_task is None or self.write_task.done():
+            self.write_task = asyncio.create_task(self.write_games())
+
+        self.broadcast(session, {"type": "end", "winner": winner})
+        for player in session.players:
+            if player is not None:  # A player may have disconnected just before the other's last move.
+                player.close()
+        session.players = [None, None]  # Neither player is told the other has left.
+
+    async def write_games(self) -> None:
+        """Writes the finished games to the database, a batch at a time, until none are left."""
+
+        while self.finished:
+            try:
+                await asyncio.wait_for(self.batch_ready.wait(), WRITE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+            games: list[tuple] = self.finished
+            self.finished = []
+            self.batch_ready.clear()
+            await asyncio.get_running_loop().run_in_executor(self.write_executor, self.store_games, games)
+
+    def store_games(self, games: list[tuple]) -> None:
+        """Stores a batch of finished games in one transaction, and rates them. Runs on the writing thread."""
+
+        import ratings
+        from dbmanager import ChessDatabase
+
+        db = ChessDatabase(self.db_path)
+        db.add_entries(games)
+        ratings.rate_games(db)
+        db.close()
+        self.games_written += len(games)
+
+    async def open(self) -> None:
+        """Opens the database, bringing it up to date, before any player connects. Any problem with it is then found
+        straight away, rather than when the first game finishes."""
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.write_executor, dbmanager.get_connection, self.db_path)
+
+    async def close(self) -> None:
+        """Writes any games that have finished but not been stored yet, then closes the database."""
+
+        self.batch_ready.set()  # Writes them now, rather than waiting for the batch to fill.
+        if self.write_task is not None:
+            await self.write_task
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.write_executor, dbmanager.close_all)
+        self.write_executor.shutdown()
+
+    def send(self, writer: asyncio.StreamWriter, message: dict) -> None:
+        """Sends a message to a player without waiting for it to be sent."""
+
+        if writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            writer.close()
+            return
+        writer.write(gameprotocol.encode_message(message))
+
+    def broadcast(self, session: GameSession, message: dict) -> None:
+        """Sends a message to both of a game's players."""
+
+        for player in session.players:
+            if player is not None:
+                self.send(player, message)
+
+
+async def serve(host: str, port: int, db_path: str) -> None:
+    """Runs the server until it is interrupted."""
+
+    game_server: GameServer = GameServer(db_path)
+    await game_server.open()
+    server: asyncio.Server = await asyncio.start_server(game_server.handle_player, host, port)
+
+    # The port is printed rather than 'port', as port 0 picks any free port.
+    print(f"Listening on {host}:{server.sockets[0].getsockname()[1]}", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        server.close()
+        await game_server.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Host games for remote players.")
+    parser.add_argument("--host", default=gameprotocol.DEFAULT_HOST,
+                        help="The address to listen on. Only this computer can connect by default.")
+    parser.add_argument("--port", type=int, default=gameprotocol.DEFAULT_PORT, help="The port to listen on.")
+    parser.add_argument("--db", default=dbmanager.DEFAULT_PATH, help="The database finished games are stored in.")
+    args = parser.parse_args(argv)
+
+    raise_open_file_limit()
+    try:
+        asyncio.run(serve(args.host, args.port, args.db))
+    except KeyboardInterrupt:
+        pass  # Finished games have been stored by the time this is reached.
+
+
+if __name__ == "__main__":
+    main()
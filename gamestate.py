@@ -0,0 +1,70 @@
+"""This file is responsible for tracking whether the game has ended, and why."""
+
+import chess
+
+import movecodec
+
+
+class GameState:
+    """Holds the termination status of a board, only recalculating it when the position changes."""
+
+    def __init__(self, board: chess.Board):
+        self.board: chess.Board = board
+
+        # The position the cached status belongs to, in the format (ply, fen).
+        self.key: tuple[int, str] | None = None
+
+        self.is_over: bool = False
+        self.title: str = ""  # Either "Checkmate" or "Stalemate".
+        self.desc: str = ""  # Describes how the game ended.
+        self.winner: str = ""  # Either "White", "Black" or "Stalemate".
+
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Recalculates the termination status, if the board has changed since it was last calculated.
+        Should be called after every 'board.push'."""
+
+        key: tuple[int, str] = (self.board.ply(), self.board.fen())
+        if key == self.key:
+            return
+
+        self.key = key
+        self.is_over = True
+
+        if self.board.is_checkmate():
+            self.title = "Checkmate"
+            # The side to move is the side that has been checkmated.
+            if self.board.turn == chess.BLACK:
+                self.winner = "White"
+                self.desc = "White wins via checkmate."
+            else:
+                self.winner = "Black"
+                self.desc = "Black wins via checkmate."
+
+        elif self.board.is_stalemate():
+            self.title = self.winner = "Stalemate"
+            if self.board.turn:
+                self.desc = "White is out of playable moves."
+            else:
+                self.desc = "Black is out of playable moves."
+
+        # A position can only be seen 3 times after 8 moves without a capture or pawn move, so the costly check, which
+        # tries every legal move, is skipped until one move short of that.
+        elif self.board.halfmove_clock >= 7 and self.board.can_claim_threefold_repetition():
+            self.title = self.winner = "Stalemate"
+            self.desc = "The position has been repeated 3 times."
+
+        elif self.board.can_claim_fifty_moves():
+            self.title = self.winner = "Stalemate"
+            self.desc = "50 non-pawn moves have been made without a piece being captured."
+
+        else:
+            self.is_over = False
+            self.title = self.desc = self.winner = ""
+
+    def database_entry(self, w_name: str, w_elo: str, b_name: str, b_elo: str) -> tuple:
+        """Returns the finished game as the arguments to 'ChessDatabase.add_entry'."""
+
+        # Moves are stored in a compact binary format, and only turned into text when they are viewed.
+        return w_name, w_elo, b_name, b_elo, self.winner, movecodec.encode_moves(self.board.move_stack)
@@ -1,15 +1,29 @@
+import os
 import tkinter as tk
-from tkinter import ttk
+from tkinter import messagebox, ttk
 
-from chessengine import Chess
-from dbmanager import ChessDatabase
+import startupprofile
+
+# The game and the database pull in pygame, python-chess and SQLite, which take longer to load than the setup window
+# takes to appear. They are imported by the methods that use them, so the window is shown first.
 
 
 class ChessGUI:
     """Responsible for handling the Tkinter GUI."""
-    def __init__(self):
+
+    # The number of games loaded into the database viewer at a time.
+    PAGE_SIZE: int = 100
+
+    # The details shown for the computer when it plays a side.
+    COMPUTER_NAME: str = "Computer"
+    COMPUTER_ELO: str = "1500"
+
+    def __init__(self, chess_options: dict | None = None):
+        """'chess_options' are extra keyword arguments passed to 'Chess' when a game is started."""
+        self.chess_options: dict = chess_options or {}
+
         self.init_window = tk.Tk()
-        self.init_window.geometry("220x250")
+        self.init_window.geometry("220x340")
 
         # Handling white's widgets.
         white_label = tk.Label(self.init_window, text="White", font=("CAD:", 20))
@@ -46,9 +60,27 @@ class ChessGUI:
         self.invalid_data_label = tk.Label(self.init_window, foreground="#F0F0F0", text=err)
         self.invalid_data_label.grid(row=4, column=0)
 
+        # Choosing whether the computer plays one of the sides.
+        computer_frame = tk.Frame(self.init_window)
+        computer_frame.grid(row=5, column=0)
+        computer_label = tk.Label(computer_frame, text="Computer plays: ")
+        computer_label.grid(row=0, column=0)
+        self.computer_side = tk.StringVar(self.init_window, value="Nobody")
+        computer_menu = tk.OptionMenu(computer_frame, self.computer_side, "Nobody", "White", "Black")
+        computer_menu.grid(row=0, column=1)
+
+        # The game server to connect to when playing online, as "host:port".
+        server_frame = tk.Frame(self.init_window)
+        server_frame.grid(row=6, column=0)
+        server_label = tk.Label(server_frame, text="Server: ")
+        server_label.grid(row=0, column=0)
+        self.server_entry = tk.Entry(server_frame)
+        self.server_entry.insert(0, "localhost:8765")
+        self.server_entry.grid(row=0, column=1)
+
         # Buttons.
         button_frame = tk.Frame(self.init_window)
-        button_frame.grid(row = 5, column=0)
+        button_frame.grid(row = 7, column=0)
 
         start_game_button = tk.Button(button_frame, text="Start Game", command=self.start_chess_game)
         start_game_button.grid(row=0, column=0)
@@ -59,8 +91,67 @@ class ChessGUI:
         quit_button = tk.Button(button_frame, text="Quit", command=self.init_window.destroy)
         quit_button.grid(row=0, column=2)
 
+        leaderboard_button = tk.Button(button_frame, text="Leaderboard", command=self.view_leaderboard)
+        leaderboard_button.grid(row=1, column=1)
+
+        play_online_button = tk.Button(button_frame, text="Play Online", command=self.play_online)
+        play_online_button.grid(row=1, column=0)
+
+        # Runs once the window has been drawn and is ready for input.
+        self.init_window.after_idle(startupprofile.mark, "setup window shown")
+        self.init_window.after_idle(self.recover_unfinished_game)
         self.init_window.mainloop()
 
+    def recover_unfinished_game(self):
+        """Offers to carry on a game that was left unfinished, if its journal is still on disk. A game that had
+        finished but was not stored, because the program stopped first, is stored without asking."""
+
+        import chess
+        import movejournal
+        from gamestate import GameState
+
+        path = self.chess_options.get("journal_path", movejournal.DEFAULT_PATH)
+        if path is None or not os.path.exists(path):
+            return
+
+        recovered = movejournal.MoveJournal.resume(path)
+        if recovered is None:
+            return  # The journal could not be read.
+        journal, moves = recovered
+        details = journal.details
+
+        board = chess.Board()
+        for move in moves:
+            board.push(move)
+        game_state = GameState(board)
+
+        if game_state.is_over:
+            import ratings
+            from dbmanager import ChessDatabase
+
+            db = ChessDatabase()
+            journal.compact(db, game_state.database_entry(details["w_name"], details["w_elo"], details["b_name"],
+                                                          details["b_elo"]))
+            ratings.rate_games(db)
+            db.close()
+            return
+
+        question = f"Carry on the unfinished game between {details['w_name']} and {details['b_name']}, " \
+                   f"{len(moves)} moves in? If not, it will be deleted."
+        if not messagebox.askyesno("Unfinished game", question, parent=self.init_window):
+            journal.discard()
+            return
+
+        self.init_window.destroy()
+
+        from chessengine import Chess
+
+        chess_game = Chess(computer_colour=details["computer_colour"], flipped=details["flipped"],
+                           **self.chess_options)
+        chess_game.display_users(details["w_name"], details["w_elo"], details["b_name"], details["b_elo"])
+        chess_game.resume_game(journal, moves)
+        chess_game.start_game()
+
     def start_chess_game(self):
         """Starts the chess game, if the details entered are valid."""
         w_name = self.white_name_entry.get().strip()
@@ -68,24 +159,70 @@ class ChessGUI:
         b_name = self.black_name_entry.get().strip()
         b_elo = self.black_elo_entry.get().strip()
 
-        if len(w_name) == 0 or len(w_name) > 20 or len(b_name) == 0 or len(b_name) > 20 or \
-           not w_elo.isdigit() or not b_elo.isdigit():
+        # The computer's details don't need to be entered.
+        computer_side = self.computer_side.get()
+        if computer_side == "White":
+            w_name, w_elo = self.COMPUTER_NAME, self.COMPUTER_ELO
+        elif computer_side == "Black":
+            b_name, b_elo = self.COMPUTER_NAME, self.COMPUTER_ELO
+
+        if not self.is_valid_player(w_name, w_elo) or not self.is_valid_player(b_name, b_elo):
             self.invalid_data_label.configure(fg="red")
             return
 
-        if int(w_elo) < 1 or int(w_elo) > 5000 or int(b_elo) < 1 or int(b_elo) > 5000:
+        self.init_window.destroy()
+
+        from chessengine import Chess
+        startupprofile.mark("chessengine imported")
+
+        if computer_side == "White":
+            # The board is flipped so that the human's pieces are at the bottom.
+            chess = Chess(computer_colour=True, flipped=True, **self.chess_options)
+        elif computer_side == "Black":
+            chess = Chess(computer_colour=False, **self.chess_options)
+        else:
+            chess = Chess(**self.chess_options)
+        chess.display_users(w_name, w_elo, b_name, b_elo)
+        chess.start_game()
+
+    @staticmethod
+    def is_valid_player(name: str, elo: str) -> bool:
+        """Returns whether a player's details are valid: their name is 1 to 20 characters long, and their ELO is a
+        whole number from 1 to 5000."""
+
+        return 0 < len(name) <= 20 and elo.isdigit() and 1 <= int(elo) <= 5000
+
+    def play_online(self):
+        """Joins a game on the game server, playing as the player entered under White. The server pairs them with
+        the next player to connect, or with a player already waiting."""
+
+        name = self.white_name_entry.get().strip()
+        elo = self.white_elo_entry.get().strip()
+        if not self.is_valid_player(name, elo):
             self.invalid_data_label.configure(fg="red")
             return
 
+        from gameclient import GameClient
+
+        server = self.server_entry.get().strip()
+        host, _, port = server.rpartition(":")
+        try:
+            client = GameClient(name, elo, host, int(port))
+        except (OSError, ValueError):
+            messagebox.showerror("Play Online", f"Could not connect to the server at {server}.")
+            return
+
         self.init_window.destroy()
 
-        chess = Chess()
-        chess.display_users(w_name, w_elo, b_name, b_elo)
+        from chessengine import Chess
+
+        # The server stores the game, so it is not journalled here.
+        chess = Chess(client=client, **dict(self.chess_options, journal_path=None))
         chess.start_game()
 
     def view_database(self):
         view_database_window = tk.Tk()
-        view_database_window.geometry("700x300")
+        view_database_window.geometry("700x520")
 
         table_frame = tk.Frame(view_database_window)
         table_frame.pack()
@@ -93,9 +230,22 @@ class ChessGUI:
         scroll_bar = tk.Scrollbar(table_frame)
         scroll_bar.pack(side=tk.RIGHT, fill=tk.Y)
 
-        table = ttk.Treeview(table_frame, yscrollcommand=scroll_bar.set)
+        table = ttk.Treeview(table_frame)
         table.pack()
 
+        # Games are loaded one page at a time. 'last_id' is the ID of the last game in the table, and 'finished' is
+        # set once there are no more games to load. 'filter' is the GameFilter the games were searched with, or None
+        # to show every game.
+        page_state = {"last_id": 0, "finished": False, "filter": None}
+
+        def on_scroll(first, last):
+            scroll_bar.set(first, last)
+            # Loads the next page once the user has scrolled near the bottom of the table.
+            if float(last) > 0.9 and not page_state["finished"]:
+                self.load_next_page(table, page_state)
+
+        table.configure(yscrollcommand=on_scroll)
+
         scroll_bar.config(command=table.yview)
 
         table['columns'] = ('game_id', 'w_name', 'w_elo', 'b_name', 'b_elo', 'winner', 'moves')
@@ -118,17 +268,31 @@ class ChessGUI:
         table.heading("winner", text="Winner", anchor=tk.CENTER)
         table.heading("moves", text="Moves played", anchor=tk.CENTER)
 
-        db = ChessDatabase()
-        games = db.get_entries()
-        db.close()
-        for i, game in enumerate(games):
-            moves = game[6].split("\n")[0] + ".."
-            table.insert(parent='', index='end', iid=i, text='',
-                         values=(game[0], game[1], game[2], game[3], game[4],
-                                 game[5], moves))
+        self.load_next_page(table, page_state)
 
         table.pack()
 
+        # The filters for searching the games. Any left empty match every game.
+        filter_frame = tk.Frame(view_database_window)
+        filter_frame.pack()
+
+        filter_entries = {}
+        for column, (key, text) in enumerate((("name", "Name: "), ("min_elo", "ELO from: "), ("max_elo", "to: "),
+                                              ("min_plies", "Half-moves from: "), ("max_plies", "to: "))):
+            filter_label = tk.Label(filter_frame, text=text)
+            filter_label.grid(row=0, column=2 * column)
+            filter_entries[key] = tk.Entry(filter_frame, width=12 if key == "name" else 5)
+            filter_entries[key].grid(row=0, column=2 * column + 1)
+
+        winner_filter = tk.StringVar(view_database_window, value="Any winner")
+        winner_menu = tk.OptionMenu(filter_frame, winner_filter, "Any winner", "White", "Black", "Stalemate")
+        winner_menu.grid(row=0, column=10)
+
+        filter_button = tk.Button(filter_frame, text='Filter',
+                                  command=lambda : self.filter_games(table, page_state, filter_entries,
+                                                                     winner_filter.get()))
+        filter_button.grid(row=0, column=11)
+
         enter_game_id_label = tk.Label(view_database_window, text='Enter game ID to view the full list of moves:')
         enter_game_id_label.pack()
         game_id_entry = tk.Entry(view_database_window)
@@ -136,28 +300,244 @@ class ChessGUI:
         view_moves_button = tk.Button(view_database_window, text='View',
                                       command=lambda : self.view_moves_of_game(game_id_entry.get()))
         view_moves_button.pack()
+        replay_button = tk.Button(view_database_window, text='Replay',
+                                  command=lambda : self.replay_game(game_id_entry.get()))
+        replay_button.pack()
+
+        enter_fen_label = tk.Label(view_database_window, text='Enter a FEN to find the games that reached it:')
+        enter_fen_label.pack()
+        fen_entry = tk.Entry(view_database_window, width=60)
+        fen_entry.pack()
+        find_position_button = tk.Button(view_database_window, text='Search',
+                                         command=lambda : self.view_games_with_position(fen_entry.get()))
+        find_position_button.pack()
 
         view_database_window.mainloop()
 
+    def load_next_page(self, table: ttk.Treeview, page_state: dict) -> None:
+        """Adds the next page of games to the database viewer's table."""
+
+        import movecodec
+        from dbmanager import ChessDatabase
+
+        db = ChessDatabase()
+        if page_state["filter"] is None:
+            games = db.get_page(page_state["last_id"], self.PAGE_SIZE)
+        else:
+            games = db.find_games(page_state["filter"], page_state["last_id"], self.PAGE_SIZE)
+        db.close()
+
+        if len(games) < self.PAGE_SIZE:
+            page_state["finished"] = True
+        if not games:
+            return
+
+        for game in games:
+            moves = movecodec.moves_to_text(movecodec.decode_moves(game[6])).split("\n")[0] + ".."
+            table.insert(parent='', index='end', iid=game[0], text='',
+                         values=(game[0], game[1], game[2], game[3], game[4],
+                                 game[5], moves))
+
+        page_state["last_id"] = games[-1][0]
+
+    def filter_games(self, table: ttk.Treeview, page_state: dict, filter_entries: dict, winner: str) -> None:
+        """Empties the database viewer's table and fills it with the games matching the filters entered. Numbers
+        that are not valid are ignored."""
+
+        from dbmanager import GameFilter
+
+        numbers = {key: int(entry.get().strip()) if entry.get().strip().isdigit() else None
+                   for key, entry in filter_entries.items() if key != "name"}
+        page_state["filter"] = GameFilter(name=filter_entries["name"].get().strip() or None,
+                                          winner=None if winner == "Any winner" else winner, **numbers)
+        page_state["last_id"] = 0
+        page_state["finished"] = False
+
+        table.delete(*table.get_children())
+        self.load_next_page(table, page_state)
+
+    def view_games_with_position(self, fen: str):
+        """Shows the ID of every game that reached the position, and the ply it was reached on."""
+
+        from dbmanager import ChessDatabase
+
+        db = ChessDatabase()
+        try:
+            matches = db.find_position(fen)
+        except ValueError:
+            return  # The FEN entered was not valid.
+        finally:
+            db.close()
+
+        view_matches_window = tk.Tk()
+        view_matches_window.geometry("250x400")
+
+        matches_label = tk.Label(view_matches_window, text=f"{len(matches)} matching positions found:")
+        matches_label.pack()
+
+        matches_frame = tk.Frame(view_matches_window)
+        matches_frame.pack(fill=tk.BOTH, expand=True)
+
+        scroll_bar = tk.Scrollbar(matches_frame)
+        scroll_bar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        matches_list = tk.Listbox(matches_frame, yscrollcommand=scroll_bar.set)
+        for game_id, ply in matches:
+            matches_list.insert(tk.END, f"Game {game_id}, after {ply} moves")
+        matches_list.pack(fill=tk.BOTH, expand=True)
+
+        scroll_bar.config(command=matches_list.yview)
+
+        view_matches_window.mainloop()
+
+    def view_leaderboard(self):
+        """Shows the players with the highest scores. Double clicking a player shows the games they have played."""
+
+        from dbmanager import ChessDatabase
+
+        db = ChessDatabase()
+        players = db.get_leaderboard(self.PAGE_SIZE)
+        db.close()
+
+        view_leaderboard_window = tk.Tk()
+        view_leaderboard_window.geometry("580x400")
+
+        table_frame = tk.Frame(view_leaderboard_window)
+        table_frame.pack(fill=tk.BOTH, expand=True)
+
+        scroll_bar = tk.Scrollbar(table_frame)
+        scroll_bar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        table = ttk.Treeview(table_frame, yscrollcommand=scroll_bar.set)
+        table.pack(fill=tk.BOTH, expand=True)
+        scroll_bar.config(command=table.yview)
+
+        table['columns'] = ('rank', 'name', 'games', 'wins', 'draws', 'losses', 'points', 'rating')
+
+        table.column("#0", width=0, stretch=tk.NO)
+        table.column("rank", anchor=tk.CENTER, width=40)
+        table.column("name", anchor=tk.CENTER, width=140)
+        for column in ('games', 'wins', 'draws', 'losses', 'points', 'rating'):
+            table.column(column, anchor=tk.CENTER, width=60)
+
+        table.heading("#0", text="", anchor=tk.CENTER)
+        table.heading("rank", text="Rank", anchor=tk.CENTER)
+        table.heading("name", text="Name", anchor=tk.CENTER)
+        table.heading("games", text="Games", anchor=tk.CENTER)
+        table.heading("wins", text="Wins", anchor=tk.CENTER)
+        table.heading("draws", text="Draws", anchor=tk.CENTER)
+        table.heading("losses", text="Losses", anchor=tk.CENTER)
+        table.heading("points", text="Points", anchor=tk.CENTER)
+        table.heading("rating", text="Rating", anchor=tk.CENTER)
+
+        # The score counts two for a win and one for a draw, so it is halved to show points.
+        # Ratings are blank until ratings.py has been run on the games the player has played.
+        for rank, (name, games, wins, draws, losses, score, rating) in enumerate(players, start=1):
+            table.insert(parent='', index='end', iid=name, text='',
+                         values=(rank, name, games, wins, draws, losses, score / 2,
+                                 "" if rating is None else round(rating)))
+
+        def on_double_click(event):
+            name = table.identify_row(event.y)
+            if name:
+                self.view_player_history(name)
+
+        table.bind("<Double-1>", on_double_click)
+
+        view_leaderboard_window.mainloop()
+
+    def view_player_history(self, name: str):
+        """Shows a player's record and the games they have played, newest first."""
+
+        from dbmanager import ChessDatabase
+
+        db = ChessDatabase()
+        stats = db.get_player_stats(name)
+        db.close()
+
+        if stats is None:
+            return
+
+        view_history_window = tk.Tk()
+        view_history_window.geometry("400x400")
+
+        games, wins, draws, losses, _ = stats
+        stats_label = tk.Label(view_history_window,
+                               text=f"{name}: {games} games, {wins} wins, {draws} draws, {losses} losses")
+        stats_label.pack()
+
+        table_frame = tk.Frame(view_history_window)
+        table_frame.pack(fill=tk.BOTH, expand=True)
+
+        scroll_bar = tk.Scrollbar(table_frame)
+        scroll_bar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        table = ttk.Treeview(table_frame)
+        table.pack(fill=tk.BOTH, expand=True)
+
+        # Games are loaded one page at a time, like in the database viewer. 'last_id' is the ID of the last game in
+        # the table, which is the oldest as the newest games are shown first.
+        page_state = {"last_id": None, "finished": False}
+
+        def load_next_page():
+            db = ChessDatabase()
+            player_games = db.get_player_games(name, page_state["last_id"], self.PAGE_SIZE)
+            db.close()
+
+            if len(player_games) < self.PAGE_SIZE:
+                page_state["finished"] = True
+
+            for game_id, colour, opponent, winner in player_games:
+                result = "Draw" if winner == "Stalemate" else "Won" if winner == colour else "Lost"
+                table.insert(parent='', index='end', iid=f"{game_id}{colour}", text='',
+                             values=(game_id, colour, opponent, result))
+
+            if player_games:
+                page_state["last_id"] = player_games[-1][0]
+
+        def on_scroll(first, last):
+            scroll_bar.set(first, last)
+            # Loads the next page once the user has scrolled near the bottom of the table.
+            if float(last) > 0.9 and not page_state["finished"]:
+                load_next_page()
+
+        table.configure(yscrollcommand=on_scroll)
+        scroll_bar.config(command=table.yview)
+
+        table['columns'] = ('game_id', 'colour', 'opponent', 'result')
+
+        table.column("#0", width=0, stretch=tk.NO)
+        table.column("game_id", anchor=tk.CENTER, width=60)
+        table.column("colour", anchor=tk.CENTER, width=80)
+        table.column("opponent", anchor=tk.CENTER, width=140)
+        table.column("result", anchor=tk.CENTER, width=80)
+
+        table.heading("#0", text="", anchor=tk.CENTER)
+        table.heading("game_id", text="ID", anchor=tk.CENTER)
+        table.heading("colour", text="Played as", anchor=tk.CENTER)
+        table.heading("opponent", text="Opponent", anchor=tk.CENTER)
+        table.heading("result", text="Result", anchor=tk.CENTER)
+
+        load_next_page()
+
+        view_history_window.mainloop()
+
     def view_moves_of_game(self, game_id: str):
+        import movecodec
+        from dbmanager import ChessDatabase
+
         if not game_id.isdigit():
             return
 
         db = ChessDatabase()
-        games = db.get_entries()
+        game = db.get_entry(int(game_id))
         db.close()
 
-        game_id = int(game_id)
-        found = False
-        for game in games:
-            if game_id == game[0]:
-                found = True
-                break
-
-        if not found:
+        if game is None:
             return
 
-        text = game[6] + "\n" + "WINNER: " + game[5]
+        # The moves are stored in binary, so they are turned into text here.
+        text = movecodec.moves_to_text(movecodec.decode_moves(game[6])) + "\n" + "WINNER: " + game[5]
 
         view_moves_window = tk.Tk()
         view_moves_window.geometry("250x400")
@@ -166,3 +546,26 @@ class ChessGUI:
         moves_label.pack()
 
         view_moves_window.mainloop()
+
+    def replay_game(self, game_id: str):
+        """Opens the board to step through a stored game, move by move."""
+
+        import movecodec
+        from dbmanager import ChessDatabase
+
+        if not game_id.isdigit():
+            return
+
+        db = ChessDatabase()
+        game = db.get_entry(int(game_id))
+        db.close()
+
+        if game is None:
+            return
+
+        from chessengine import Chess
+
+        chess = Chess(**self.chess_options)
+        chess.display_users(game[1], str(game[2]), game[3], str(game[4]))
+        chess.load_replay(movecodec.decode_moves(game[6]))
+        chess.start_game()
@@ -1,4 +1,27 @@
-from gui import ChessGUI
+import argparse
+
+import startupprofile
 
 if __name__ == '__main__':
-    ChessGUI()
+    parser = argparse.ArgumentParser(description="Play chess.")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Time how long each module takes to import and each stage of starting up takes, and "
+                             "print the timings when the program exits.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time each stage of every frame, and write the timings out when the game is closed.")
+    parser.add_argument("--profile-overlay", action="store_true",
+                        help="Show the frame timings on the screen. Turns on --profile.")
+    parser.add_argument("--profile-output", default="frame_profile.json",
+                        help="Where the frame timings are written. Written as CSV if it ends in '.csv'.")
+    parser.add_argument("--resizable", action="store_true",
+                        help="Let the game window be resized, with the board laid out again to fit it.")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        startupprofile.enable()
+
+    # Imported after the profiler is started, so that the time taken to import it is measured.
+    from gui import ChessGUI
+
+    ChessGUI({"profile": args.profile, "profile_overlay": args.profile_overlay,
+              "profile_output": args.profile_output, "resizable": args.resizable})
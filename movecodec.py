@@ -0,0 +1,84 @@
+"""This file is responsible for packing moves into the compact binary format they are stored in.
+
+Each move takes 16 bits: the from square in bits 0-5, the to square in bits 6-11, and the piece a pawn promotes to
+in bits 12-14 (0 when the move is not a promotion, otherwise the python-chess piece type). Moves are stored as
+little-endian 16 bit integers, one after the other, so a game of n plies takes 2n bytes."""
+
+import re
+import struct
+
+import chess
+
+BYTES_PER_MOVE: int = 2
+
+
+def encode_move(move: chess.Move) -> int:
+    """Returns the 16 bit code for 'move'."""
+
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def decode_move(code: int) -> chess.Move:
+    """Returns the move represented by the 16 bit 'code'."""
+
+    promotion: int = (code >> 12) & 7
+    return chess.Move(code & 63, (code >> 6) & 63, promotion or None)
+
+
+def encode_moves(moves) -> bytes:
+    """Packs a list of moves, such as 'board.move_stack', into bytes."""
+
+    codes: list[int] = [encode_move(move) for move in moves]
+    return struct.pack(f"<{len(codes)}H", *codes)
+
+
+def decode_moves(data: bytes) -> list[chess.Move]:
+    """Unpacks bytes made by 'encode_moves' back into a list of moves."""
+
+    return [decode_move(code) for code in struct.unpack(f"<{len(data) // BYTES_PER_MOVE}H", data)]
+
+
+def count_moves(data: bytes) -> int:
+    """Returns the number of plies in an encoded game, without decoding it."""
+
+    return len(data) // BYTES_PER_MOVE
+
+
+def moves_to_text(moves: list[chess.Move]) -> str:
+    """Returns the moves as a human readable list, in the format "1. e2 to e4, e7 to e5.\\n"."""
+
+    all_moves: list[str] = []
+    for ply, move in enumerate(moves):
+        move_text: str = chess.square_name(move.from_square) + " to " + chess.square_name(move.to_square)
+        if move.promotion:
+            move_text += "=" + chess.piece_symbol(move.promotion).upper()
+
+        if ply % 2 == 0:
+            all_moves.append(str(ply // 2 + 1) + ". " + move_text)
+        else:
+            all_moves.append(", " + move_text + ".\n")
+
+    return "".join(all_moves)
+
+
+def text_to_moves(text: str) -> list[chess.Move]:
+    """Reads moves from the old text format that games used to be stored in, such as "1. e2 to e4, e7 to e5.\\n".
+    The old format did not record promotions, but pawns always promoted to a queen, so a queen is assumed.
+    Stops at the first move that is not legal."""
+
+    board: chess.Board = chess.Board()
+    moves: list[chess.Move] = []
+    for from_tile, to_tile in re.findall(r"([a-h][1-8]) to ([a-h][1-8])", text):
+        move: chess.Move = chess.Move.from_uci(from_tile + to_tile)
+
+        # Adds the missing promotion to pawns moving onto the last rank.
+        if board.piece_type_at(move.from_square) == chess.PAWN and chess.square_rank(move.to_square) in (0, 7):
+            move.promotion = chess.QUEEN
+
+        if not board.is_legal(move):
+            break
+
+        board.push(move)
+        moves.append(move)
+
+    return moves
@@ -0,0 +1,61 @@
+"""This file is responsible for working out which pieces a move adds, removes or relocates on the board."""
+
+import chess
+
+
+class MoveDiff:
+    """The changes a single move makes to the pieces on the board. Tiles are in the format "e4"."""
+
+    def __init__(self):
+        self.removed: list[tuple[str, str]] = []  # (tile, piece) of each piece taken off the board.
+        self.moved: list[tuple[str, str]] = []  # (from tile, to tile) of each piece that changes tile.
+        self.added: list[tuple[str, str]] = []  # (tile, piece) of each piece put onto the board.
+
+    def reversed(self) -> "MoveDiff":
+        """Returns the changes that undo this move, for stepping backwards through a game."""
+
+        diff: MoveDiff = MoveDiff()
+        diff.removed = list(self.added)
+        diff.moved = [(to_tile, from_tile) for from_tile, to_tile in self.moved]
+        diff.added = list(self.removed)
+        return diff
+
+
+def get_move_diff(board: chess.Board, move: chess.Move) -> MoveDiff:
+    """Returns the changes 'move' will make to the board. Must be called before the move is pushed."""
+
+    diff: MoveDiff = MoveDiff()
+    from_tile: str = chess.square_name(move.from_square)
+    to_tile: str = chess.square_name(move.to_square)
+
+    if board.is_castling(move):
+        # The king moves two tiles towards the rook, and the rook jumps over it.
+        back_rank: int = chess.square_rank(move.from_square)
+        if board.is_kingside_castling(move):
+            king_file, rook_from_file, rook_to_file = 6, 7, 5
+        else:
+            king_file, rook_from_file, rook_to_file = 2, 0, 3
+
+        diff.moved.append((from_tile, chess.square_name(chess.square(king_file, back_rank))))
+        diff.moved.append((chess.square_name(chess.square(rook_from_file, back_rank)),
+                           chess.square_name(chess.square(rook_to_file, back_rank))))
+        return diff
+
+    if board.is_en_passant(move):
+        # The captured pawn is beside the moving pawn, not on the tile it moves to.
+        captured_square: int = chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square))
+        diff.removed.append((chess.square_name(captured_square), board.piece_at(captured_square).symbol()))
+    else:
+        captured: chess.Piece | None = board.piece_at(move.to_square)
+        if captured is not None:
+            diff.removed.append((to_tile, captured.symbol()))
+
+    if move.promotion:
+        # The pawn is replaced with the piece it promotes to.
+        moving_piece: chess.Piece = board.piece_at(move.from_square)
+        diff.removed.append((from_tile, moving_piece.symbol()))
+        diff.added.append((to_tile, chess.Piece(move.promotion, moving_piece.color).symbol()))
+    else:
+        diff.moved.append((from_tile, to_tile))
+
+    return diff
@@ -0,0 +1,51 @@
+"""This file is responsible for indexing the legal moves of a position by the square they start on, so that picking up
+and dropping a piece does not generate the legal moves again."""
+
+import chess
+
+
+class LegalMoveIndex:
+    """Holds the legal moves of a board, grouped by their from and to squares, only regenerating them when the
+    position changes."""
+
+    def __init__(self, board: chess.Board):
+        self.board: chess.Board = board
+
+        # The position the index belongs to, in the format (ply, fen).
+        self.key: tuple[int, str] | None = None
+
+        # The squares each piece can move to, keyed by the square it is on.
+        self.destinations: dict[int, set[int]] = {}
+        # The moves between two squares. There is more than one only when a pawn promotes, one for each piece.
+        self.moves: dict[tuple[int, int], list[chess.Move]] = {}
+
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Rebuilds the index, if the board has changed since it was last built. Should be called after every
+        'board.push'."""
+
+        key: tuple[int, str] = (self.board.ply(), self.board.fen())
+        if key == self.key:
+            return
+
+        self.key = key
+        self.destinations = {}
+        self.moves = {}
+
+        for move in self.board.legal_moves:
+            self.destinations.setdefault(move.from_square, set()).add(move.to_square)
+            self.moves.setdefault((move.from_square, move.to_square), []).append(move)
+
+    def destinations_from(self, square: int) -> set[int]:
+        """Returns the squares the piece on 'square' can legally move to."""
+
+        return self.destinations.get(square, set())
+
+    def moves_between(self, from_square: int, to_square: int) -> list[chess.Move]:
+        """Returns the legal moves from 'from_square' to 'to_square'. This is empty if there are none, and has one
+        move for each piece a pawn can promote to if the move is a promotion."""
+
+        if to_square not in self.destinations_from(from_square):
+            return []
+        return self.moves[(from_square, to_square)]
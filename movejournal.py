@@ -0,0 +1,166 @@
+"""This file is responsible for recording the game in progress one move at a time, so that it can be recovered if the
+window is closed or the program crashes before the game ends.
+
+A journal is a header holding the players' details, followed by one fixed-size record for each ply. Records are
+appended with a single write each, so a crash can only lose the last few moves, and are synced to disk in batches
+rather than one at a time. Once the game has finished it is compacted into the database in one write, and the journal
+is deleted."""
+
+import json
+import os
+import struct
+import time
+import uuid
+
+import chess
+
+import movecodec
+
+DEFAULT_PATH: str = 'games.journal'
+
+MAGIC: bytes = b"CHJ1"
+HEADER_LENGTH_STRUCT: struct.Struct = struct.Struct("<I")
+
+# A ply record: the ply number, counting from 1, and the move as a 16 bit code (see movecodec).
+RECORD_STRUCT: struct.Struct = struct.Struct("<HH")
+
+# Records are synced to disk once this many have been written, or once this many seconds have passed since the last
+# sync, whichever comes first.
+SYNC_EVERY: int = 8
+SYNC_INTERVAL: float = 1.0
+
+
+def read_journal(path: str) -> tuple[dict, list[chess.Move], int] | None:
+    """Returns the details, the moves and the length in bytes of the readable part of the journal at 'path', or None
+    if there is no journal or its header cannot be read. Reading stops at the first record that is incomplete, out
+    of order or not a legal move, which is where a crash interrupted the journal."""
+
+    try:
+        with open(path, "rb") as journal_file:
+            data: bytes = journal_file.read()
+    except FileNotFoundError:
+        return None
+
+    # Reads the header.
+    header_start: int = len(MAGIC) + HEADER_LENGTH_STRUCT.size
+    if len(data) < header_start or not data.startswith(MAGIC):
+        return None
+    header_end: int = header_start + HEADER_LENGTH_STRUCT.unpack_from(data, len(MAGIC))[0]
+    try:
+        details: dict = json.loads(data[header_start:header_end])
+    except ValueError:
+        return None
+
+    # Reads the records, replaying them to check that each one is legal.
+    board: chess.Board = chess.Board()
+    moves: list[chess.Move] = []
+    length: int = header_end
+    while length + RECORD_STRUCT.size <= len(data):
+        ply, code = RECORD_STRUCT.unpack_from(data, length)
+        if ply != len(moves) + 1:
+            break
+        move: chess.Move = movecodec.decode_move(code)
+        if not board.is_legal(move):
+            break
+
+        board.push(move)
+        moves.append(move)
+        length += RECORD_STRUCT.size
+
+    return details, moves, length
+
+
+class MoveJournal:
+    """An open journal, which each move of the game is appended to."""
+
+    def __init__(self, path: str, details: dict, plies: int = 0):
+        """Opens the journal at 'path' to add to it. Use 'create' or 'resume' rather than calling this directly."""
+
+        self.path: str = path
+        self.details: dict = details
+        self.plies: int = plies
+
+        self.fd: int = os.open(path, os.O_WRONLY | os.O_APPEND)
+        self.unsynced: int = 0  # The number of records written since the last sync.
+        self.last_sync: float = time.perf_counter()
+
+    @classmethod
+    def create(cls, path: str, details: dict) -> "MoveJournal":
+        """Starts a new journal at 'path', replacing any journal already there. 'details' describes the game, such as
+        the players' names, and is given back when the journal is read. A unique 'id' is added to it."""
+
+        details = dict(details, id=uuid.uuid4().hex)
+        header: bytes = json.dumps(details).encode()
+
+        # The header is written to a temporary file first, so the old journal is never left half overwritten.
+        temp_path: str = path + ".tmp"
+        with open(temp_path, "wb") as journal_file:
+            journal_file.write(MAGIC + HEADER_LENGTH_STRUCT.pack(len(header)) + header)
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        os.replace(temp_path, path)
+
+        return cls(path, details)
+
+    @classmethod
+    def resume(cls, path: str) -> tuple["MoveJournal", list[chess.Move]] | None:
+        """Opens the journal at 'path' to carry on adding to it, returning it along with the moves already made, or
+        None if there is no readable journal. Anything after the last readable record is cut off."""
+
+        contents: tuple[dict, list[chess.Move], int] | None = read_journal(path)
+        if contents is None:
+            return None
+
+        details, moves, length = contents
+        os.truncate(path, length)
+        return cls(path, details, len(moves)), moves
+
+    def append(self, move: chess.Move) -> None:
+        """Records the next move of the game."""
+
+        self.plies += 1
+        os.write(self.fd, RECORD_STRUCT.pack(self.plies, movecodec.encode_move(move)))
+
+        self.unsynced += 1
+        if self.unsynced >= SYNC_EVERY or time.perf_counter() - self.last_sync >= SYNC_INTERVAL:
+            self.sync()
+
+    def sync(self) -> None:
+        """Makes sure every record written so far is on disk."""
+
+        if self.unsynced:
+            os.fsync(self.fd)
+            self.unsynced = 0
+        self.last_sync = time.perf_counter()
+
+    def close(self) -> None:
+        """Syncs and closes the journal, leaving it on disk so that the game can be resumed."""
+
+        if self.fd >= 0:
+            self.sync()
+            os.close(self.fd)
+            self.fd = -1
+
+    def discard(self) -> None:
+        """Closes and deletes the journal."""
+
+        self.close()
+        os.remove(self.path)
+
+    def compact(self, db, entry: tuple) -> None:
+        """Stores the finished game in 'db' (a ChessDatabase) in one transaction, and deletes the journal. 'entry' is
+        the arguments to 'ChessDatabase.add_entry', from 'GameState.database_entry'.
+        The journal is marked as stored in the same transaction as the game, so that if the program stops before
+        the journal is deleted, the game is not stored a second time when the journal is recovered. The mark is
+        removed once the journal has been deleted, as it can no longer be recovered."""
+
+        journal_id: str = self.details["id"]
+        if not db.is_journal_stored(journal_id):
+            with db.con:
+                db.add_entry(*entry)
+                db.set_journal_stored(journal_id)
+
+        self.discard()
+
+        with db.con:
+            db.set_journal_stored(journal_id, False)
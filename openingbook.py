@@ -0,0 +1,182 @@
+"""This file is responsible for compiling the games in the database into an opening book, and for looking up book
+moves. The book is a Polyglot file: a list of 16 byte entries sorted by position key, each holding a position's
+Zobrist key, a move, the move's weight and a 'learn' value. Lookups memory-map the file and binary search it, so
+opening a book costs nothing and every process using it shares the same pages.
+
+Usage:
+    python openingbook.py build [--db games.db] [--book book.bin] [--plies 20] [--rebuild]
+    python openingbook.py probe [--book book.bin] [FEN]"""
+
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+
+import chess
+import chess.polyglot
+
+import movecodec
+from dbmanager import DEFAULT_PATH as DEFAULT_DB_PATH, ChessDatabase
+
+DEFAULT_PATH: str = 'book.bin'
+
+# The number of plies from the start of each game that are added to the book.
+DEFAULT_PLIES: int = 20
+
+# Games with these players are left out of the book. "Random" is the name self-play (see selfplay.py) stores the player
+# making random moves under, and its openings would otherwise be played by the computer as book moves.
+EXCLUDED_PLAYERS: tuple[str, ...] = ("Random",)
+
+# A Polyglot entry: key, move, weight and learn, all big-endian.
+ENTRY_STRUCT: struct.Struct = struct.Struct(">QHHI")
+
+# Polyglot weights are 16 bit, so the full number of times a move was played is kept in the 32 bit 'learn' field.
+# This is what lets new games be added to the counts without re-reading the games already in the book.
+MAX_WEIGHT: int = 0xFFFF
+MAX_COUNT: int = 0xFFFFFFFF
+
+
+def encode_move(board: chess.Board, move: chess.Move) -> int:
+    """Returns 'move' in the Polyglot format. Castling is written as the king moving onto its own rook, and
+    promotions as 1 to 4 for a knight, bishop, rook or queen."""
+
+    to_square: int = move.to_square
+    if board.is_castling(move):
+        rook_file: int = 7 if board.is_kingside_castling(move) else 0
+        to_square = chess.square(rook_file, chess.square_rank(move.from_square))
+
+    promotion: int = move.promotion - 1 if move.promotion else 0
+    return to_square | move.from_square << 6 | promotion << 12
+
+
+def read_counts(path: str) -> dict[tuple[int, int], int]:
+    """Returns how many times each (key, move) in the book at 'path' has been played."""
+
+    counts: dict[tuple[int, int], int] = {}
+    with open(path, "rb") as book_file:
+        data: bytes = book_file.read()
+
+    for key, move, _, learn in ENTRY_STRUCT.iter_unpack(data):
+        counts[(key, move)] = learn
+
+    return counts
+
+
+def write_book(path: str, counts: dict[tuple[int, int], int]) -> None:
+    """Writes 'counts' to 'path' as a sorted Polyglot book. The file is replaced in one step, so a reader never sees
+    half a book."""
+
+    temp_path: str = path + ".tmp"
+    with open(temp_path, "wb") as book_file:
+        # Entries are sorted by key, and a position's moves from most to least played.
+        for (key, move), count in sorted(counts.items(), key=lambda item: (item[0][0], -item[1], item[0][1])):
+            book_file.write(ENTRY_STRUCT.pack(key, move, min(count, MAX_WEIGHT), count))
+
+    os.replace(temp_path, path)
+
+
+def build_book(db_path: str = DEFAULT_DB_PATH, book_path: str = DEFAULT_PATH, plies: int = DEFAULT_PLIES,
+               rebuild: bool = False) -> int:
+    """Adds the first 'plies' plies of every game in the database to the book at 'book_path', returning the number of
+    games added. Games with a player in 'EXCLUDED_PLAYERS' are skipped. Only games stored since the book was last
+    built are read, unless 'rebuild' is True or the book was built from a different database, number of plies or
+    list of excluded players."""
+
+    # What the book has been built from is stored next to it.
+    state_path: str = book_path + ".json"
+    state: dict = {"database": os.path.abspath(db_path), "plies": plies, "excluded_players": list(EXCLUDED_PLAYERS),
+                   "last_game_id": 0, "games": 0}
+    counts: dict[tuple[int, int], int] = {}
+
+    if not rebuild and os.path.exists(book_path) and os.path.exists(state_path):
+        with open(state_path) as state_file:
+            old_state: dict = json.load(state_file)
+        if all(old_state.get(setting) == state[setting] for setting in ("database", "plies", "excluded_players")):
+            state = old_state
+            counts = read_counts(book_path)
+
+    db: ChessDatabase = ChessDatabase(db_path)
+    added: int = 0
+    for game in db.iter_entries(after_id=state["last_game_id"]):
+        game_id, w_name, b_name, moves = game[0], game[1], game[3], game[6]
+        state["last_game_id"] = game_id
+        if w_name in EXCLUDED_PLAYERS or b_name in EXCLUDED_PLAYERS:
+            continue
+
+        board: chess.Board = chess.Board()
+        for move in movecodec.decode_moves(moves)[:plies]:
+            entry: tuple[int, int] = (chess.polyglot.zobrist_hash(board), encode_move(board, move))
+            counts[entry] = min(counts.get(entry, 0) + 1, MAX_COUNT)
+            board.push(move)
+
+        added += 1
+    db.close()
+
+    state["games"] += added
+    write_book(book_path, counts)
+    with open(state_path, "w") as state_file:
+        json.dump(state, state_file)
+
+    return added
+
+
+class OpeningBook:
+    """Looks up moves in a Polyglot book. The file is memory-mapped rather than read, so opening it is instant."""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.reader: chess.polyglot.MemoryMappedReader = chess.polyglot.open_reader(path)
+
+    def entries(self, board: chess.Board) -> list[chess.polyglot.Entry]:
+        """Returns the book's moves for the position on 'board', most played first."""
+
+        return sorted(self.reader.find_all(board), key=lambda entry: entry.weight, reverse=True)
+
+    def choose_move(self, board: chess.Board, generator: random.Random | None = None) -> chess.Move | None:
+        """Returns a book move for 'board', picked at random in proportion to how often each was played, or None if
+        the position is not in the book."""
+
+        entries: list[chess.polyglot.Entry] = self.entries(board)
+        if not entries:
+            return None
+        return (generator or random).choices([entry.move for entry in entries],
+                                             weights=[entry.weight for entry in entries])[0]
+
+    def close(self) -> None:
+        self.reader.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Build and query the opening book.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="Add the games in the database to the book.")
+    build_parser.add_argument("--db", default=DEFAULT_DB_PATH, help="The database to read games from.")
+    build_parser.add_argument("--book", default=DEFAULT_PATH, help="The book to write.")
+    build_parser.add_argument("--plies", type=int, default=DEFAULT_PLIES,
+                              help="The number of plies from the start of each game to add.")
+    build_parser.add_argument("--rebuild", action="store_true",
+                              help="Rebuild the book from every game, rather than only the new ones.")
+
+    probe_parser = commands.add_parser("probe", help="List the book moves for a position.")
+    probe_parser.add_argument("--book", default=DEFAULT_PATH, help="The book to read.")
+    probe_parser.add_argument("fen", nargs="?", default=chess.STARTING_FEN,
+                              help="The position to look up. Defaults to the starting position.")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        added: int = build_book(args.db, args.book, args.plies, args.rebuild)
+        print(f"Added {added} games to {args.book}", file=sys.stderr)
+
+    else:
+        board: chess.Board = chess.Board(args.fen)
+        book: OpeningBook = OpeningBook(args.book)
+        for entry in book.entries(board):
+            print(f"{board.san(entry.move)}\t{entry.learn}")
+        book.close()
+
+
+if __name__ == '__main__':
+    main()
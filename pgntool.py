@@ -0,0 +1,231 @@
+"""This file is responsible for importing games from PGN files into the database, and exporting them back out.
+
+Usage:
+    python pgntool.py import games.pgn [--db games.db] [--workers N] [--batch-size N] [--restart]
+    python pgntool.py export games.pgn [--db games.db]
+
+Imports stream the file one game at a time, parse the games across a pool of processes, and write them to the
+database in batches. How far the import has got is committed along with each batch, so running the same import
+again after it was interrupted carries on from the last batch written."""
+
+import argparse
+import collections
+import concurrent.futures
+import io
+import os
+import sys
+import time
+
+import chess
+import chess.pgn
+
+import movecodec
+import positionindex
+from dbmanager import DEFAULT_PATH, ChessDatabase
+
+# Games are sent to the worker processes in chunks, so that the cost of passing them between processes is shared.
+GAMES_PER_CHUNK: int = 200
+
+# How often, in seconds, the throughput is reported while importing or exporting.
+REPORT_INTERVAL: float = 5.0
+
+RESULT_TO_WINNER: dict[str, str] = {"1-0": "White", "0-1": "Black", "1/2-1/2": "Stalemate"}
+WINNER_TO_RESULT: dict[str, str] = {winner: result for result, winner in RESULT_TO_WINNER.items()}
+
+# The 'Variant' headers, in lower case, of games of standard chess. Games of any other variant, such as Chess960, are
+# not imported.
+STANDARD_VARIANTS: set[str] = {"standard", "chess"}
+
+
+def read_pgn_games(path: str, start_offset: int = 0):
+    """Yields (end offset, text) for each game in a PGN file, starting 'start_offset' bytes into it.
+    'end offset' is the byte offset just after the game, which is where an import would resume from."""
+
+    with open(path, "rb") as pgn_file:
+        pgn_file.seek(start_offset)
+        offset: int = start_offset
+        lines: list[bytes] = []
+        seen_moves: bool = False
+
+        for line in pgn_file:
+            # A header line after the moves of a game means a new game has started.
+            if line.startswith(b"[") and seen_moves:
+                yield offset, b"".join(lines).decode("utf-8", errors="replace")
+                lines = []
+                seen_moves = False
+
+            lines.append(line)
+            offset += len(line)
+            if line.strip() and not line.startswith(b"["):
+                seen_moves = True
+
+        if seen_moves:
+            yield offset, b"".join(lines).decode("utf-8", errors="replace")
+
+
+def parse_games(texts: list[str]) -> tuple[list[tuple], int]:
+    """Parses and validates the text of some PGN games. Runs in a worker process.
+    Returns the games as database rows, and the number of games that were rejected because they were unfinished,
+    not standard chess, or contained an illegal move."""
+
+    rows: list[tuple] = []
+    rejected: int = 0
+    for text in texts:
+        game: chess.pgn.Game | None = chess.pgn.read_game(io.StringIO(text))
+        winner: str | None = RESULT_TO_WINNER.get(game.headers.get("Result", "*")) if game else None
+        if (game is None or game.errors or winner is None or "FEN" in game.headers
+                or game.headers.get("Variant", "Standard").lower() not in STANDARD_VARIANTS):
+            rejected += 1
+            continue
+
+        # The position keys are worked out here too, so that the process writing to the database only has to write.
+        moves: list[chess.Move] = list(game.mainline_moves())
+        rows.append((game.headers.get("White", "?"), game.headers.get("WhiteElo", "0"),
+                     game.headers.get("Black", "?"), game.headers.get("BlackElo", "0"),
+                     winner, movecodec.encode_moves(moves), positionindex.game_position_keys(moves)))
+
+    return rows, rejected
+
+
+def chunk_games(games, size: int):
+    """Groups (end offset, text) pairs into lists of at most 'size' games, yielding (end offset, texts)."""
+
+    texts: list[str] = []
+    end_offset: int = 0
+    for end_offset, text in games:
+        texts.append(text)
+        if len(texts) >= size:
+            yield end_offset, texts
+            texts = []
+
+    if texts:
+        yield end_offset, texts
+
+
+class ThroughputReporter:
+    """Prints how many games per second are being processed, every 'REPORT_INTERVAL' seconds."""
+
+    def __init__(self, action: str):
+        self.action: str = action
+        self.start_time: float = time.perf_counter()
+        self.last_report: float = self.start_time
+        self.games: int = 0
+
+    def add(self, games: int) -> None:
+        self.games += games
+        now: float = time.perf_counter()
+        if now - self.last_report >= REPORT_INTERVAL:
+            self.last_report = now
+            self.report()
+
+    def report(self) -> None:
+        elapsed: float = max(time.perf_counter() - self.start_time, 1e-9)
+        print(f"{self.action} {self.games} games in {elapsed:.1f}s ({self.games / elapsed:.0f} games/sec)",
+              file=sys.stderr)
+
+
+def import_pgn(path: str, db_path: str = DEFAULT_PATH, workers: int | None = None, batch_size: int = 1000,
+               restart: bool = False) -> int:
+    """Imports every finished game in the PGN file at 'path' into the database, returning the number imported.
+    Resumes from where a previous import of the same file stopped, unless 'restart' is True."""
+
+    db: ChessDatabase = ChessDatabase(db_path)
+    source: str = os.path.abspath(path)
+    start_offset, imported = (0, 0) if restart else db.get_import_progress(source)
+    if start_offset:
+        print(f"Resuming {path} from byte {start_offset} ({imported} games already imported)", file=sys.stderr)
+
+    workers = workers or os.cpu_count() or 1
+    reporter: ThroughputReporter = ThroughputReporter("Imported")
+    rejected: int = 0
+    pending_rows: list[tuple] = []
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        # Only a few chunks per worker are in flight at once, so memory use does not grow with the size of the file.
+        # Results are collected in the order they were submitted, so the offset recorded only ever moves forwards.
+        in_flight: collections.deque = collections.deque()
+        chunks = chunk_games(read_pgn_games(path, start_offset), GAMES_PER_CHUNK)
+
+        def collect_oldest() -> None:
+            nonlocal imported, rejected
+            end_offset, future = in_flight.popleft()
+            rows, chunk_rejected = future.result()
+            pending_rows.extend(rows)
+            rejected += chunk_rejected
+
+            if len(pending_rows) >= batch_size or not in_flight:
+                imported += len(pending_rows)
+                db.set_import_progress(source, end_offset, imported)
+                db.add_entries(pending_rows)  # Commits the batch and the progress together.
+                reporter.add(len(pending_rows))
+                pending_rows.clear()
+
+        for end_offset, texts in chunks:
+            in_flight.append((end_offset, executor.submit(parse_games, texts)))
+            if len(in_flight) >= workers * 2:
+                collect_oldest()
+
+        while in_flight:
+            collect_oldest()
+
+    reporter.report()
+    if rejected:
+        print(f"Skipped {rejected} unfinished, invalid or non-standard games", file=sys.stderr)
+    db.close()
+    return reporter.games
+
+
+def export_pgn(path: str, db_path: str = DEFAULT_PATH) -> int:
+    """Writes every game in the database to a PGN file, streaming them so that memory use stays constant.
+    Returns the number of games written."""
+
+    db: ChessDatabase = ChessDatabase(db_path)
+    reporter: ThroughputReporter = ThroughputReporter("Exported")
+
+    with open(path, "w", encoding="utf-8") as pgn_file:
+        for game_id, w_name, w_elo, b_name, b_elo, winner, moves in db.iter_entries():
+            game: chess.pgn.Game = chess.pgn.Game()
+            game.headers["Event"] = f"Game {game_id}"
+            game.headers["White"] = w_name
+            game.headers["Black"] = b_name
+            # Unknown ELOs are stored as 0, and written as "?" as PGN expects.
+            game.headers["WhiteElo"] = str(w_elo) if w_elo else "?"
+            game.headers["BlackElo"] = str(b_elo) if b_elo else "?"
+            game.headers["Result"] = WINNER_TO_RESULT.get(winner, "*")
+            game.add_line(movecodec.decode_moves(moves))
+
+            print(game, file=pgn_file, end="\n\n")
+            reporter.add(1)
+
+    reporter.report()
+    db.close()
+    return reporter.games
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Import and export games as PGN.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import games from a PGN file into the database.")
+    import_parser.add_argument("pgn", help="The PGN file to read.")
+    import_parser.add_argument("--db", default=DEFAULT_PATH, help="The database to write to.")
+    import_parser.add_argument("--workers", type=int, default=None,
+                               help="The number of processes parsing games. Defaults to the number of cores.")
+    import_parser.add_argument("--batch-size", type=int, default=1000,
+                               help="The number of games written to the database in each transaction.")
+    import_parser.add_argument("--restart", action="store_true",
+                               help="Start from the beginning of the file, even if it was partly imported before.")
+
+    export_parser = subparsers.add_parser("export", help="Export every game in the database to a PGN file.")
+    export_parser.add_argument("pgn", help="The PGN file to write.")
+    export_parser.add_argument("--db", default=DEFAULT_PATH, help="The database to read from.")
+
+    args = parser.parse_args(argv)
+    if args.command == "import":
+        import_pgn(args.pgn, args.db, args.workers, args.batch_size, args.restart)
+    else:
+        export_pgn(args.pgn, args.db)
+
+
+if __name__ == '__main__':
+    main()
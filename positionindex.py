@@ -0,0 +1,38 @@
+"""This file is responsible for turning positions into the 64 bit keys used to index them in the database."""
+
+import chess
+import chess.polyglot
+
+
+def position_key(board: chess.Board) -> int:
+    """Returns the Zobrist hash of the position on 'board', as a signed 64 bit integer so that SQLite can store it."""
+
+    key: int = chess.polyglot.zobrist_hash(board)
+    if key >= 1 << 63:
+        key -= 1 << 64
+    return key
+
+
+# The key of the position every game starts from.
+STARTING_KEY: int = position_key(chess.Board())
+
+
+def game_position_keys(moves: list[chess.Move]) -> list[tuple[int, int]]:
+    """Returns (ply, key) for every position reached in a game, including the starting position at ply 0."""
+
+    board: chess.Board = chess.Board()
+    keys: list[tuple[int, int]] = [(0, position_key(board))]
+    for ply, move in enumerate(moves, start=1):
+        board.push(move)
+        keys.append((ply, position_key(board)))
+
+    return keys
+
+
+def to_board(position: chess.Board | str) -> chess.Board:
+    """Returns 'position' as a board, whether it is already a board or a FEN string.
+    Raises ValueError if the FEN is not valid."""
+
+    if isinstance(position, chess.Board):
+        return position
+    return chess.Board(position.strip())
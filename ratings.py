@@ -0,0 +1,155 @@
+"""This file is responsible for working out every player's Elo rating from the results of the games in the database.
+
+Elo has to be worked out in the order games were played, as each game depends on both players' ratings after their
+previous games. Games are therefore split into rounds in which no player plays twice, with every game put in the
+round after the later of its players' previous games. The games in a round do not depend on each other, so each
+round is worked out at once with NumPy, and the ratings come out the same as going through the games one by one.
+
+Usage:
+    python ratings.py [--db games.db] [--full]"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from dbmanager import DEFAULT_PATH, ChessDatabase
+
+# The rating given to a player whose first game did not have a valid ELO typed in for them.
+DEFAULT_RATING: float = 1500.0
+
+# How far one game can move a rating.
+K_FACTOR: float = 32.0
+
+# Rounds with fewer games than this are worked out without NumPy, as it is slower for a handful of games.
+MIN_VECTOR_ROUND: int = 16
+
+# The score white gets for each result.
+WHITE_SCORES: dict[str, float] = {"White": 1.0, "Black": 0.0, "Stalemate": 0.5}
+
+
+def typed_rating(elo: str) -> float:
+    """Returns the ELO typed in for a player as a rating, or the default if it is not a valid ELO."""
+
+    elo = str(elo).strip()
+    if elo.isdigit() and 1 <= int(elo) <= 5000:
+        return float(elo)
+    return DEFAULT_RATING
+
+
+def assign_rounds(white: list[int], black: list[int]) -> np.ndarray:
+    """Returns the round each game is played in, given the player IDs of each game in the order they were played.
+    Every game comes one round after the latest round either of its players has already played in."""
+
+    last_round: dict[int, int] = {}
+    rounds: list[int] = []
+    for white_id, black_id in zip(white, black):
+        game_round: int = max(last_round.get(white_id, -1), last_round.get(black_id, -1)) + 1
+        last_round[white_id] = last_round[black_id] = game_round
+        rounds.append(game_round)
+
+    return np.array(rounds, dtype=np.int64)
+
+
+def update_ratings(ratings: np.ndarray, white: np.ndarray, black: np.ndarray, scores: np.ndarray) -> None:
+    """Applies the results of games, none of which share a player, to 'ratings' in place."""
+
+    expected: np.ndarray = 1.0 / (1.0 + 10.0 ** ((ratings[black] - ratings[white]) / 400.0))
+    change: np.ndarray = K_FACTOR * (scores - expected)
+
+    # 'add.at' is used so that a player playing themselves gets both changes, which cancel out.
+    np.add.at(ratings, white, change)
+    np.add.at(ratings, black, -change)
+
+
+def compute_ratings(ratings: np.ndarray, white: np.ndarray, black: np.ndarray, scores: np.ndarray) -> None:
+    """Applies the results of games, in the order they were played, to 'ratings' in place. 'ratings' is indexed by
+    player ID, and 'white' and 'black' hold the player IDs of each game."""
+
+    if not len(white):
+        return
+
+    rounds: np.ndarray = assign_rounds(white.tolist(), black.tolist())
+
+    # Groups the games by round, keeping them in the order they were played within each round.
+    order: np.ndarray = np.argsort(rounds, kind="stable")
+    boundaries: np.ndarray = np.flatnonzero(np.diff(rounds[order])) + 1
+    starts: list[int] = [0] + boundaries.tolist()
+    ends: list[int] = boundaries.tolist() + [len(order)]
+
+    for start, end in zip(starts, ends):
+        games: np.ndarray = order[start:end]
+        if end - start >= MIN_VECTOR_ROUND:
+            update_ratings(ratings, white[games], black[games], scores[games])
+            continue
+
+        for game in games.tolist():
+            white_id, black_id = white[game], black[game]
+            expected: float = 1.0 / (1.0 + 10.0 ** ((ratings[black_id] - ratings[white_id]) / 400.0))
+            change: float = K_FACTOR * (scores[game] - expected)
+            ratings[white_id] += change
+            ratings[black_id] -= change
+
+
+def rate_games(db: ChessDatabase, full: bool = False) -> int:
+    """Adds the games stored since the ratings were last worked out to every player's rating, and writes the ratings
+    back to the database. If 'full' is True every rating is worked out again from the first game, which is needed
+    after games have been deleted. Returns the number of games rated."""
+
+    if full:
+        db.clear_ratings()
+
+    last_game_id: int = db.get_rating_progress()
+    game_ids: list[int] = []
+    white: list[int] = []
+    black: list[int] = []
+    scores: list[float] = []
+    first_ratings: dict[int, float] = {}  # The ELO typed in for each player in their first game.
+
+    for game_id, white_id, w_elo, black_id, b_elo, winner in db.iter_rating_games(last_game_id):
+        game_ids.append(game_id)
+        white.append(white_id)
+        black.append(black_id)
+        scores.append(WHITE_SCORES[winner])
+        first_ratings.setdefault(white_id, typed_rating(w_elo))
+        first_ratings.setdefault(black_id, typed_rating(b_elo))
+
+    if not game_ids:
+        return 0
+
+    # Players are looked up by ID, so the array is big enough for the highest ID. Players without a rating yet
+    # start from the ELO typed in for them.
+    ratings: np.ndarray = np.full(max(first_ratings) + 1, np.nan)
+    for player_id, rating in db.get_ratings():
+        if player_id < len(ratings):
+            ratings[player_id] = rating
+
+    for player_id, rating in first_ratings.items():
+        if np.isnan(ratings[player_id]):
+            ratings[player_id] = rating
+
+    compute_ratings(ratings, np.array(white, dtype=np.int64), np.array(black, dtype=np.int64),
+                    np.array(scores, dtype=np.float64))
+
+    db.set_ratings(((player_id, float(ratings[player_id])) for player_id in first_ratings), game_ids[-1])
+    db.save()
+    return len(game_ids)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Work out every player's Elo rating.")
+    parser.add_argument("--db", default=DEFAULT_PATH, help="The database to rate the games of.")
+    parser.add_argument("--full", action="store_true",
+                        help="Work out every rating again from the first game, rather than only adding new games.")
+    args = parser.parse_args(argv)
+
+    start_time: float = time.perf_counter()
+    db: ChessDatabase = ChessDatabase(args.db)
+    rated: int = rate_games(db, args.full)
+    db.close()
+    print(f"Rated {rated} games in {time.perf_counter() - start_time:.2f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""This file is responsible for stepping and seeking through a stored game. A packed copy of the board is kept every
+few plies, so that jumping to any ply only replays the moves since the nearest one, rather than the whole game."""
+
+import struct
+
+import chess
+
+from movediff import MoveDiff, get_move_diff
+
+# The number of plies between packed boards. Seeking replays at most this many moves.
+KEYFRAME_INTERVAL: int = 16
+
+# A packed board: the six piece bitboards, each side's pieces, the promoted pieces and the castling rights, then the
+# en passant square (-1 for none), the side to move, the halfmove clock and the fullmove number.
+BOARD_STRUCT: struct.Struct = struct.Struct("<10QbBHH")
+
+
+def pack_board(board: chess.Board) -> bytes:
+    """Returns the position on 'board' as bytes. The move stack is not included."""
+
+    return BOARD_STRUCT.pack(board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings,
+                             board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK], board.promoted,
+                             board.castling_rights, -1 if board.ep_square is None else board.ep_square, board.turn,
+                             board.halfmove_clock, board.fullmove_number)
+
+
+def unpack_board(data: bytes, board: chess.Board) -> None:
+    """Sets 'board' to the position packed by 'pack_board', clearing its move stack."""
+
+    (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings, white, black, board.promoted,
+     board.castling_rights, ep_square, turn, board.halfmove_clock, board.fullmove_number) = BOARD_STRUCT.unpack(data)
+
+    board.occupied_co[chess.WHITE] = white
+    board.occupied_co[chess.BLACK] = black
+    board.occupied = white | black
+    board.ep_square = None if ep_square < 0 else ep_square
+    board.turn = bool(turn)
+    board.clear_stack()
+
+
+class GameReplay:
+    """Moves 'board' through the plies of a stored game. Stepping returns the changes to the pieces, so that only the
+    sprites that change need updating, while seeking changes the whole board."""
+
+    def __init__(self, board: chess.Board, moves: list[chess.Move], keyframe_interval: int = KEYFRAME_INTERVAL):
+        self.board: chess.Board = board
+        self.moves: list[chess.Move] = moves
+        self.keyframe_interval: int = keyframe_interval
+        self.ply: int = 0  # The number of moves that have been made on the board.
+
+        # Plays through the game once, packing the board every 'keyframe_interval' plies.
+        self.keyframes: list[bytes] = []
+        board.reset()
+        for ply, move in enumerate(moves):
+            if ply % keyframe_interval == 0:
+                self.keyframes.append(pack_board(board))
+            board.push(move)
+
+        self.seek(0)
+
+    def seek(self, ply: int) -> None:
+        """Moves the board to how it was after 'ply' moves, which is clamped to the length of the game."""
+
+        ply = max(0, min(ply, len(self.moves)))
+
+        # Starts from the latest packed board before the ply, unless that would leave no moves to undo when stepping
+        # backwards, and replays the moves since.
+        keyframe: int = min((ply - 1) // self.keyframe_interval if ply else 0, len(self.keyframes) - 1)
+        if keyframe < 0:
+            self.board.reset()  # A game without any moves.
+        else:
+            unpack_board(self.keyframes[keyframe], self.board)
+            for move in self.moves[keyframe * self.keyframe_interval:ply]:
+                self.board.push(move)
+
+        self.ply = ply
+
+    def step_forward(self) -> MoveDiff | None:
+        """Makes the next move, returning the changes it made to the pieces, or None at the end of the game."""
+
+        if self.ply >= len(self.moves):
+            return None
+
+        move: chess.Move = self.moves[self.ply]
+        diff: MoveDiff = get_move_diff(self.board, move)
+        self.board.push(move)
+        self.ply += 1
+        return diff
+
+    def step_backward(self) -> MoveDiff | None:
+        """Takes back the last move, returning the changes it made to the pieces, or None at the start of the game."""
+
+        if self.ply == 0:
+            return None
+
+        # The board only holds the moves made since the last packed board it was restored from.
+        if not self.board.move_stack:
+            self.seek(self.ply)
+
+        move: chess.Move = self.board.pop()
+        self.ply -= 1
+        return get_move_diff(self.board, move).reversed()
@@ -0,0 +1,414 @@
+"""This file is responsible for the computer opponent: an iterative deepening alpha-beta search over python-chess's
+bitboards, with a size-bounded transposition table.
+
+Running this file searches a few standard positions and prints the depth reached and nodes per second, so that the
+engine's speed can be compared between versions:
+    python searchengine.py [seconds per position]"""
+
+import sys
+import time
+
+import chess
+
+# Piece values, in centipawns, indexed by piece type (index 0 is unused).
+PIECE_VALUES: list[int] = [0, 100, 320, 330, 500, 900, 0]
+
+MATE_SCORE: int = 100000
+# Scores at least this far from 0 are mates, scored 'MATE_SCORE' less the number of plies until mate.
+MATE_BOUND: int = MATE_SCORE - 1000
+INFINITY: int = 1000000
+
+# Piece-square tables, from white's point of view, with a8 first so that they read like the board.
+# A white piece on 'square' uses index 'square ^ 56', and a black piece uses index 'square'.
+_PAWN_TABLE: list[int] = [
+    0,   0,   0,   0,   0,   0,   0,   0,
+    50,  50,  50,  50,  50,  50,  50,  50,
+    10,  10,  20,  30,  30,  20,  10,  10,
+    5,   5,   10,  25,  25,  10,  5,   5,
+    0,   0,   0,   20,  20,  0,   0,   0,
+    5,   -5,  -10, 0,   0,   -10, -5,  5,
+    5,   10,  10,  -20, -20, 10,  10,  5,
+    0,   0,   0,   0,   0,   0,   0,   0]
+_KNIGHT_TABLE: list[int] = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0,   0,   0,   0,   -20, -40,
+    -30, 0,   10,  15,  15,  10,  0,   -30,
+    -30, 5,   15,  20,  20,  15,  5,   -30,
+    -30, 0,   15,  20,  20,  15,  0,   -30,
+    -30, 5,   10,  15,  15,  10,  5,   -30,
+    -40, -20, 0,   5,   5,   0,   -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50]
+_BISHOP_TABLE: list[int] = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0,   0,   0,   0,   0,   0,   -10,
+    -10, 0,   5,   10,  10,  5,   0,   -10,
+    -10, 5,   5,   10,  10,  5,   5,   -10,
+    -10, 0,   10,  10,  10,  10,  0,   -10,
+    -10, 10,  10,  10,  10,  10,  10,  -10,
+    -10, 5,   0,   0,   0,   0,   5,   -10,
+    -20, -10, -10, -10, -10, -10, -10, -20]
+_ROOK_TABLE: list[int] = [
+    0,   0,   0,   0,   0,   0,   0,   0,
+    5,   10,  10,  10,  10,  10,  10,  5,
+    -5,  0,   0,   0,   0,   0,   0,   -5,
+    -5,  0,   0,   0,   0,   0,   0,   -5,
+    -5,  0,   0,   0,   0,   0,   0,   -5,
+    -5,  0,   0,   0,   0,   0,   0,   -5,
+    -5,  0,   0,   0,   0,   0,   0,   -5,
+    0,   0,   0,   5,   5,   0,   0,   0]
+_QUEEN_TABLE: list[int] = [
+    -20, -10, -10, -5,  -5,  -10, -10, -20,
+    -10, 0,   0,   0,   0,   0,   0,   -10,
+    -10, 0,   5,   5,   5,   5,   0,   -10,
+    -5,  0,   5,   5,   5,   5,   0,   -5,
+    0,   0,   5,   5,   5,   5,   0,   -5,
+    -10, 5,   5,   5,   5,   5,   0,   -10,
+    -10, 0,   5,   0,   0,   0,   0,   -10,
+    -20, -10, -10, -5,  -5,  -10, -10, -20]
+_KING_TABLE: list[int] = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20,  20,  0,   0,   0,   0,   20,  20,
+    20,  30,  10,  0,   0,   10,  30,  20]
+
+# For each piece type, the value of the piece plus its piece-square bonus on every square, for each colour.
+# Indexed as _SQUARE_VALUES[colour][piece type][square].
+_SQUARE_VALUES: list[list[list[int]]] = [[[0] * 64], [[0] * 64]]
+for _piece_type, _table in enumerate([_PAWN_TABLE, _KNIGHT_TABLE, _BISHOP_TABLE, _ROOK_TABLE, _QUEEN_TABLE,
+                                      _KING_TABLE], start=1):
+    _SQUARE_VALUES[chess.WHITE].append([PIECE_VALUES[_piece_type] + _table[square ^ 56] for square in chess.SQUARES])
+    _SQUARE_VALUES[chess.BLACK].append([PIECE_VALUES[_piece_type] + _table[square] for square in chess.SQUARES])
+
+# Transposition table entry flags, saying how the stored score relates to the true score.
+EXACT: int = 0
+LOWER_BOUND: int = 1
+UPPER_BOUND: int = 2
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when it runs out of time, to unwind back to the root."""
+
+
+class SearchResult:
+    """The outcome of a search, including the statistics used to track the engine's speed."""
+
+    def __init__(self, move: chess.Move | None, score: int, depth: int, nodes: int, seconds: float):
+        self.move: chess.Move | None = move
+        self.score: int = score  # In centipawns, from the point of view of the side to move.
+        self.depth: int = depth  # The deepest search that was completed.
+        self.nodes: int = nodes
+        self.seconds: float = seconds
+
+    @property
+    def nps(self) -> int:
+        """Nodes searched per second."""
+        return int(self.nodes / self.seconds) if self.seconds > 0 else 0
+
+    def __repr__(self) -> str:
+        return f"SearchResult(move={self.move}, score={self.score}, depth={self.depth}, nodes={self.nodes}, " \
+               f"nps={self.nps})"
+
+
+class TranspositionTable:
+    """A fixed-size hash table of search results. Each key can only go in one slot, so when two positions want the
+    same slot the entry from the deeper search is kept, unless the existing entry is from an earlier search."""
+
+    def __init__(self, size: int = 1 << 18):
+        self.size: int = size
+        self.entries: list[tuple | None] = [None] * size
+        self.generation: int = 0  # Increased for every new search, so that stale entries can be replaced.
+
+    def new_search(self) -> None:
+        self.generation += 1
+
+    def get(self, key: int, ply: int = 0) -> tuple | None:
+        """Returns (depth, flag, score, move) for 'key', reached 'ply' plies from the root, or None if it is not
+        stored."""
+
+        entry: tuple | None = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            depth, flag, score, move = entry[1:5]
+            # Mate scores are stored counting from the position itself, as it can be reached at any ply.
+            if score >= MATE_BOUND:
+                score -= ply
+            elif score <= -MATE_BOUND:
+                score += ply
+            return depth, flag, score, move
+        return None
+
+    def store(self, key: int, depth: int, flag: int, score: int, move: chess.Move | None, ply: int = 0) -> None:
+        """Stores the result of searching 'key', reached 'ply' plies from the root, to 'depth'."""
+
+        index: int = key % self.size
+        entry: tuple | None = self.entries[index]
+        if entry is None or entry[0] == key or depth >= entry[1] or entry[5] != self.generation:
+            # Mate scores count the plies to mate from the root, so they are changed to count from this position.
+            if score >= MATE_BOUND:
+                score += ply
+            elif score <= -MATE_BOUND:
+                score -= ply
+            self.entries[index] = (key, depth, flag, score, move, self.generation)
+
+    def clear(self) -> None:
+        self.entries = [None] * self.size
+
+
+def position_hash(board: chess.Board) -> int:
+    """Returns a hash of everything that makes two positions the same, built from the board's bitboards."""
+
+    return hash((board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings,
+                 board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK], board.turn,
+                 board.castling_rights, board.ep_square))
+
+
+def evaluate(board: chess.Board) -> int:
+    """Returns the material and piece-square score of the position, from the point of view of the side to move."""
+
+    score: int = 0
+    for colour, sign in ((chess.WHITE, 1), (chess.BLACK, -1)):
+        colour_mask: int = board.occupied_co[colour]
+        values: list[list[int]] = _SQUARE_VALUES[colour]
+        for piece_type, piece_mask in ((chess.PAWN, board.pawns), (chess.KNIGHT, board.knights),
+                                       (chess.BISHOP, board.bishops), (chess.ROOK, board.rooks),
+                                       (chess.QUEEN, board.queens), (chess.KING, board.kings)):
+            square_values: list[int] = values[piece_type]
+            for square in chess.scan_forward(piece_mask & colour_mask):
+                score += sign * square_values[square]
+
+    return score if board.turn == chess.WHITE else -score
+
+
+class SearchEngine:
+    """Chooses moves using iterative deepening negamax alpha-beta search, with quiescence search, transposition
+    table and killer move ordering, and most valuable victim / least valuable attacker capture ordering."""
+
+    # How many nodes are searched between checks of the clock.
+    NODES_PER_TIME_CHECK: int = 1024
+
+    def __init__(self, table_size: int = 1 << 18, max_depth: int = 64):
+        self.table: TranspositionTable = TranspositionTable(table_size)
+        self.max_depth: int = max_depth
+
+        self.nodes: int = 0
+        self.deadline: float = 0.0
+        self.should_stop = None  # Optional function that returns True when the search should be abandoned.
+        self.killers: list[list[chess.Move | None]] = []
+        self.history: set[int] = set()  # Hashes of positions already reached, to score repetitions as draws.
+
+    def search(self, board: chess.Board, time_limit: float = 1.0, depth: int | None = None,
+               info_callback=None, should_stop=None) -> SearchResult:
+        """Searches 'board' for up to 'time_limit' seconds, or until 'depth' plies have been searched.
+        'info_callback' is called with a SearchResult each time a depth is completed, and 'should_stop' is an
+        optional function that is polled during the search and ends it early if it returns True.
+        The board passed in is not changed."""
+
+        board = board.copy()  # The search pushes and pops moves, so it works on a copy.
+        start_time: float = time.perf_counter()
+        self.deadline = start_time + time_limit
+        self.should_stop = should_stop
+        self.nodes = 0
+        self.killers = [[None, None] for _ in range(self.max_depth + 1)]
+        self.table.new_search()
+
+        # Every position in the game so far counts towards repetitions.
+        self.history = set()
+        replay: chess.Board = board.copy()
+        while replay.move_stack:
+            replay.pop()
+            self.history.add(position_hash(replay))
+
+        legal_moves: list[chess.Move] = list(board.legal_moves)
+        if not legal_moves:
+            return SearchResult(None, -MATE_SCORE if board.is_check() else 0, 0, 0, 0.0)
+
+        result: SearchResult = SearchResult(legal_moves[0], 0, 0, 0, 0.0)
+        for current_depth in range(1, min(depth or self.max_depth, self.max_depth) + 1):
+            try:
+                score, move = self.search_root(board, current_depth)
+            except SearchTimeout:
+                break
+
+            result = SearchResult(move, score, current_depth, self.nodes, time.perf_counter() - start_time)
+            if info_callback is not None:
+                info_callback(result)
+
+            # There is no point searching deeper once a forced mate has been found.
+            if abs(score) >= MATE_SCORE - self.max_depth:
+                break
+
+        result.nodes = self.nodes
+        result.seconds = time.perf_counter() - start_time
+        return result
+
+    def search_root(self, board: chess.Board, depth: int) -> tuple[int, chess.Move]:
+        """Searches every move from the root position to 'depth', returning the best score and move."""
+
+        alpha: int = -INFINITY
+        best_move: chess.Move | None = None
+        self.history.add(position_hash(board))
+
+        for move in self.order_moves(board, list(board.legal_moves), self.table_move(board), 0):
+            board.push(move)
+            score: int = -self.negamax(board, depth - 1, -INFINITY, -alpha, 1)
+            board.pop()
+
+            if score > alpha or best_move is None:
+                alpha = score
+                best_move = move
+
+        self.table.store(position_hash(board), depth, EXACT, alpha, best_move)
+        return alpha, best_move
+
+    def negamax(self, board: chess.Board, depth: int, alpha: int, beta: int, ply: int) -> int:
+        """Returns the score of the position, from the point of view of the side to move."""
+
+        self.nodes += 1
+        if self.nodes % self.NODES_PER_TIME_CHECK == 0:
+            self.check_time()
+
+        key: int = position_hash(board)
+        if key in self.history or board.halfmove_clock >= 100:
+            return 0  # A repeated position, or the fifty move rule, is a draw.
+
+        if depth <= 0:
+            return self.quiescence(board, alpha, beta)
+
+        # Uses the stored result if it was searched at least as deeply.
+        table_move: chess.Move | None = None
+        entry: tuple | None = self.table.get(key, ply)
+        if entry is not None:
+            entry_depth, flag, score, table_move = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return score
+                if flag == LOWER_BOUND and score >= beta:
+                    return score
+                if flag == UPPER_BOUND and score <= alpha:
+                    return score
+
+        legal_moves: list[chess.Move] = list(board.legal_moves)
+        if not legal_moves:
+            # Checkmate is scored so that quicker mates are preferred. Stalemate is a draw.
+            return -MATE_SCORE + ply if board.is_check() else 0
+
+        original_alpha: int = alpha
+        best_score: int = -INFINITY
+        best_move: chess.Move | None = None
+
+        self.history.add(key)
+        for move in self.order_moves(board, legal_moves, table_move, ply):
+            board.push(move)
+            score: int = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.pop()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        # Quiet moves that cause a cutoff are tried early in sibling positions.
+                        if not board.is_capture(move) and move != self.killers[ply][0]:
+                            self.killers[ply][1] = self.killers[ply][0]
+                            self.killers[ply][0] = move
+                        break
+        self.history.discard(key)
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.table.store(key, depth, flag, best_score, best_move, ply)
+
+        return best_score
+
+    def quiescence(self, board: chess.Board, alpha: int, beta: int) -> int:
+        """Searches captures only, until the position is quiet, so that the evaluation is not made mid-exchange."""
+
+        self.nodes += 1
+        if self.nodes % self.NODES_PER_TIME_CHECK == 0:
+            self.check_time()
+
+        stand_pat: int = evaluate(board)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        for move in self.order_moves(board, list(board.generate_legal_captures()), None, None):
+            board.push(move)
+            score: int = -self.quiescence(board, -beta, -alpha)
+            board.pop()
+
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        return alpha
+
+    def order_moves(self, board: chess.Board, moves: list[chess.Move], table_move: chess.Move | None,
+                    ply: int | None) -> list[chess.Move]:
+        """Sorts moves so that those most likely to be best are searched first: the transposition table's move,
+        then captures and promotions (most valuable victim, least valuable attacker), then killer moves."""
+
+        killers: list[chess.Move | None] = self.killers[ply] if ply is not None else [None, None]
+        occupied: int = board.occupied
+
+        def move_score(move: chess.Move) -> int:
+            if move == table_move:
+                return 1000000
+            score: int = 0
+            if occupied & chess.BB_SQUARES[move.to_square]:
+                score = 10000 + 10 * PIECE_VALUES[board.piece_type_at(move.to_square)] - \
+                        PIECE_VALUES[board.piece_type_at(move.from_square)] // 10
+            elif move == killers[0]:
+                score = 5000
+            elif move == killers[1]:
+                score = 4000
+            if move.promotion:
+                score += PIECE_VALUES[move.promotion]
+            return score
+
+        return sorted(moves, key=move_score, reverse=True)
+
+    def table_move(self, board: chess.Board) -> chess.Move | None:
+        """Returns the best move stored for the position, if there is one."""
+
+        entry: tuple | None = self.table.get(position_hash(board))
+        return entry[3] if entry is not None else None
+
+    def check_time(self) -> None:
+        """Ends the search if it has run out of time, or has been asked to stop."""
+
+        if time.perf_counter() >= self.deadline or (self.should_stop is not None and self.should_stop()):
+            raise SearchTimeout()
+
+
+# Positions searched when this file is run, to measure the engine's speed.
+BENCHMARK_POSITIONS: list[str] = [
+    chess.STARTING_FEN,
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+]
+
+if __name__ == "__main__":
+    seconds_per_position: float = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    total_nodes: int = 0
+    total_seconds: float = 0.0
+    for fen in BENCHMARK_POSITIONS:
+        engine: SearchEngine = SearchEngine()
+        search_result: SearchResult = engine.search(chess.Board(fen), seconds_per_position)
+        total_nodes += search_result.nodes
+        total_seconds += search_result.seconds
+        print(f"{fen}\n    best move {search_result.move}, score {search_result.score}, "
+              f"depth {search_result.depth}, {search_result.nodes} nodes, {search_result.nps} nodes/sec")
+
+    print(f"Total: {total_nodes} nodes, {int(total_nodes / total_seconds)} nodes/sec")
@@ -0,0 +1,140 @@
+"""This file is responsible for playing games between computer players without opening a window, and storing them in
+the database. Games are spread across a pool of processes, one per core by default.
+
+Usage:
+    python selfplay.py --games 1000 [--white random|engine] [--black random|engine] [--think-time 0.1] [--depth N]
+                       [--workers N] [--batch-size 500] [--db games.db] [--seed 0] [--max-plies 1000]"""
+
+import argparse
+import collections
+import concurrent.futures
+import os
+import random
+import sys
+import time
+
+import chess
+
+import positionindex
+from dbmanager import DEFAULT_PATH, ChessDatabase
+from gamestate import GameState
+from searchengine import SearchEngine
+
+PLAYERS: list[str] = ["random", "engine"]
+
+# The number of games each task sent to a worker plays, so that the cost of passing results back is shared.
+GAMES_PER_TASK: int = 10
+
+# How often, in seconds, progress is reported.
+REPORT_INTERVAL: float = 5.0
+
+
+def play_games(seed: int, games: int, white: str, black: str, think_time: float, depth: int | None,
+               max_plies: int) -> tuple[list[tuple], int]:
+    """Plays 'games' games in a worker process. Returns the finished games as rows for 'ChessDatabase.add_entries',
+    and the number of plies played, including those of games abandoned for reaching 'max_plies'."""
+
+    generator: random.Random = random.Random(seed)
+    engine: SearchEngine | None = SearchEngine(table_size=1 << 16) if "engine" in (white, black) else None
+    players: dict[chess.Color, str] = {chess.WHITE: white, chess.BLACK: black}
+
+    rows: list[tuple] = []
+    plies: int = 0
+    for _ in range(games):
+        board: chess.Board = chess.Board()
+        game_state: GameState = GameState(board)  # Decides when the game is over, just as in the game window.
+
+        while not game_state.is_over and board.ply() < max_plies:
+            if players[board.turn] == "engine":
+                move: chess.Move = engine.search(board, think_time, depth).move
+            else:
+                move = generator.choice(list(board.legal_moves))
+
+            board.push(move)
+            game_state.refresh()
+
+        plies += board.ply()
+        if game_state.is_over:
+            # The position keys are worked out here, so that the process writing to the database only has to write.
+            rows.append(game_state.database_entry(white.title(), "0", black.title(), "0") +
+                        (positionindex.game_position_keys(board.move_stack),))
+
+    return rows, plies
+
+
+def run(games: int, white: str = "random", black: str = "random", think_time: float = 0.1, depth: int | None = None,
+        workers: int | None = None, batch_size: int = 500, db_path: str = DEFAULT_PATH, seed: int = 0,
+        max_plies: int = 1000) -> None:
+    """Plays 'games' games, writing the finished ones to the database in batches and reporting the throughput."""
+
+    workers = workers or os.cpu_count() or 1
+    db: ChessDatabase = ChessDatabase(db_path)
+    pending_rows: list[tuple] = []
+    stored: int = 0
+    plies: int = 0
+    start_time: float = time.perf_counter()
+    last_report: float = start_time
+
+    def report() -> None:
+        elapsed: float = max(time.perf_counter() - start_time, 1e-9)
+        print(f"Stored {stored} games, {plies} plies in {elapsed:.1f}s "
+              f"({stored / elapsed:.1f} games/sec, {plies / elapsed:.0f} plies/sec)", file=sys.stderr)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        # Only a few tasks per worker are in flight at once, so memory use does not grow with the number of games.
+        in_flight: collections.deque = collections.deque()
+
+        def collect_oldest() -> None:
+            nonlocal stored, plies, last_report
+            rows, task_plies = in_flight.popleft().result()
+            pending_rows.extend(rows)
+            plies += task_plies
+
+            if len(pending_rows) >= batch_size or not in_flight:
+                db.add_entries(pending_rows)
+                stored += len(pending_rows)
+                pending_rows.clear()
+
+            if time.perf_counter() - last_report >= REPORT_INTERVAL:
+                last_report = time.perf_counter()
+                report()
+
+        # Each task gets its own seed, so that the games differ between tasks but a run can be repeated.
+        for task in range((games + GAMES_PER_TASK - 1) // GAMES_PER_TASK):
+            task_games: int = min(GAMES_PER_TASK, games - task * GAMES_PER_TASK)
+            in_flight.append(executor.submit(play_games, seed + task, task_games, white, black, think_time, depth,
+                                             max_plies))
+            if len(in_flight) >= workers * 2:
+                collect_oldest()
+
+        while in_flight:
+            collect_oldest()
+
+    report()
+    db.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Play computer vs computer games.")
+    parser.add_argument("--games", type=int, required=True, help="The number of games to play.")
+    parser.add_argument("--white", choices=PLAYERS, default="random", help="Who plays white.")
+    parser.add_argument("--black", choices=PLAYERS, default="random", help="Who plays black.")
+    parser.add_argument("--think-time", type=float, default=0.1,
+                        help="Seconds the engine searches for each move.")
+    parser.add_argument("--depth", type=int, default=None, help="The deepest the engine searches for each move.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="The number of processes playing games. Defaults to the number of cores.")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="The number of games written to the database in each transaction.")
+    parser.add_argument("--db", default=DEFAULT_PATH, help="The database to write to.")
+    parser.add_argument("--seed", type=int, default=0, help="Seeds the random players.")
+    parser.add_argument("--max-plies", type=int, default=1000,
+                        help="Games that reach this many plies are abandoned and not stored.")
+    args = parser.parse_args(argv)
+
+    run(args.games, args.white, args.black, args.think_time, args.depth, args.workers, args.batch_size, args.db,
+        args.seed, args.max_plies)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""This file is responsible for measuring how long the program takes to start: how long each module takes to import,
+and when each stage of starting up is reached. When it has not been enabled, marking a stage does nothing."""
+
+import atexit
+import builtins
+import sys
+import time
+
+# The time the profiler was enabled, which the stages are measured from.
+_start_time: float = 0.0
+_enabled: bool = False
+
+_import_times: dict[str, float] = {}  # The time spent importing each module, not counting the modules it imported.
+_import_stack: list[list[float]] = []  # [start time, time spent in nested imports] for each import in progress.
+_stages: list[tuple[str, float]] = []  # (stage, seconds since the profiler was enabled)
+_original_import = builtins.__import__
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """Imports a module as normal, timing it if this is the first time it has been imported."""
+
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    _import_stack.append([time.perf_counter(), 0.0])
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        start_time, nested_time = _import_stack.pop()
+        total_time: float = time.perf_counter() - start_time
+        _import_times[name] = _import_times.get(name, 0.0) + total_time - nested_time
+        if _import_stack:
+            _import_stack[-1][1] += total_time  # Not counted again towards the module that imported this one.
+
+
+def enable() -> None:
+    """Starts timing imports and stages. The report is printed when the program exits."""
+
+    global _start_time, _enabled
+    _start_time = time.perf_counter()
+    _enabled = True
+    builtins.__import__ = _timed_import
+    atexit.register(report)
+
+
+def mark(stage: str) -> None:
+    """Records that 'stage' of starting up has been reached."""
+
+    if _enabled:
+        _stages.append((stage, time.perf_counter() - _start_time))
+
+
+def report(limit: int = 15) -> None:
+    """Prints when each stage was reached, and the 'limit' modules that took longest to import."""
+
+    print("Startup stages:", file=sys.stderr)
+    for stage, seconds in _stages:
+        print(f"  {seconds * 1000:8.1f}ms  {stage}", file=sys.stderr)
+
+    print(f"Slowest imports (of {len(_import_times)} modules, {sum(_import_times.values()) * 1000:.1f}ms in total):",
+          file=sys.stderr)
+    for name, seconds in sorted(_import_times.items(), key=lambda item: item[1], reverse=True)[:limit]:
+        print(f"  {seconds * 1000:8.1f}ms  {name}", file=sys.stderr)